@@ -0,0 +1,654 @@
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from urllib.request import pathname2url
+from sqlalchemy import (
+    MetaData, create_engine, event, select, insert, delete, update, bindparam, literal, func,
+    exists, true, or_, and_, text
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, User, Post, PostStats, Reaction, Comment, Message, Notification, UserStats, ArchiveIndex
+from entities import unindex_posts
+from reactions import has_reaction, types_from_flags
+from counters import get_live_counts
+from pagination import encode_cursor, keyset_before, keyset_after
+from schema import missing_autoincrement
+
+ARCHIVE_FILE = re.compile(r'^chirp-archive-(\d{4})\.db$')
+
+# Every table with rows in the archives. A post is archived along with its stats,
+# reactions and comments; the mention and hashtag index only covers the hot database.
+ARCHIVED_TABLES = (
+    Post.__table__, PostStats.__table__, Reaction.__table__, Comment.__table__,
+    Message.__table__, Notification.__table__,
+)
+# The archived tables with their own ids. They use AUTOINCREMENT, so moving the newest
+# rows out never lets the hot database hand their ids out again.
+ID_TABLES = (Post.__table__, Comment.__table__, Message.__table__, Notification.__table__)
+
+def _position(row):
+    return row.timestamp, row.id
+
+def _owner_condition(kind, columns, owner_id, peer_id):
+    """Filter on the archived `kind` table (each ArchiveIndex.kind is a table name) for the rows of (owner_id, peer_id)."""
+    if kind == 'message':
+        return or_(
+            and_(columns.sender_id == owner_id, columns.recipient_id == peer_id),
+            and_(columns.sender_id == peer_id, columns.recipient_id == owner_id)
+        )
+    return columns.user_id == owner_id
+
+def _subtract(table, column, key, amounts):
+    """Subtracts {key: amount} from table.column with one executemany UPDATE (see purge._subtract_counts)."""
+    rows = [{'target_id': target, 'amount': amount} for target, amount in amounts.items() if amount]
+    if not rows:
+        return
+
+    db.session.connection().execute(
+        update(table).where(table.c[key] == bindparam('target_id')).values({column: table.c[column] - bindparam('amount')}),
+        rows
+    )
+
+def _detach_archives(dbapi_connection, connection_record):
+    # Archives attached for writing stay attached until the transaction ends; drop them
+    # before the connection goes back to the pool
+    for name in connection_record.info.pop('archives', ()):
+        dbapi_connection.execute(f'DETACH DATABASE {name}')
+
+class ArchiveStore:
+    """
+    Cold storage for old posts, messages and notifications.
+
+    `flask archive --older-than DAYS` moves rows older than that out of the main
+    database, batch_size at a time, into one SQLite file per year in ARCHIVE_FOLDER
+    (chirp-archive-2023.db holds the rows timestamped in 2023), so the main database's
+    tables and indexes only hold the recent, hot rows. Posts that still see activity
+    (a reaction or comment since the cutoff) or that someone has bookmarked stay hot.
+    Archived posts are read-only: they can be read and deleted but not reacted to or
+    commented on. Archived notifications are stored as read.
+
+    Rows are moved with the archive ATTACHed to the session's connection, so the copy
+    and the delete commit together. Reads ATTACH the archives read-only, one at a
+    time, on a connection of their own, and only when a page reaches back past the
+    newest archived row for that user (or pair of users) according to ArchiveIndex:
+    the profile's posts, message history and the comments of an archived post.
+    """
+
+    def __init__(self, folder=None, batch_size=500, pause=0.05):
+        self.folder = folder
+        self.batch_size = batch_size
+        self.pause = pause
+        self._tables = {}
+        self._prepared = set()
+
+    def init_app(self, app):
+        """Reads ARCHIVE_* settings from the app config and makes pooled connections drop their archives."""
+        self.folder = app.config.get('ARCHIVE_FOLDER') or os.path.join(app.instance_path, 'archive')
+        self.batch_size = app.config.get('ARCHIVE_BATCH_SIZE', self.batch_size)
+        self.pause = app.config.get('ARCHIVE_BATCH_PAUSE', self.pause)
+
+        with app.app_context():
+            if not event.contains(db.engine, 'checkin', _detach_archives):
+                event.listen(db.engine, 'checkin', _detach_archives)
+
+    # --- Archive files ---
+
+    def path(self, year):
+        return os.path.join(self.folder, f'chirp-archive-{year}.db')
+
+    def years(self):
+        """Years that have an archive file, oldest first."""
+        if not os.path.isdir(self.folder):
+            return []
+        return sorted(int(match.group(1)) for match in map(ARCHIVE_FILE.match, os.listdir(self.folder)) if match)
+
+    def table(self, schema, name):
+        """The archived table `name` in the attached database `schema`."""
+        key = (schema, name)
+        if key not in self._tables:
+            metadata = MetaData()
+            for table in ARCHIVED_TABLES:
+                self._tables[(schema, table.name)] = table.to_metadata(metadata, schema=schema)
+        return self._tables[key]
+
+    def _prepare(self, year):
+        """Creates the archive file for `year` with the archived tables and their indexes, if needed."""
+        if year in self._prepared:
+            return
+
+        os.makedirs(self.folder, exist_ok=True)
+        engine = create_engine(f'sqlite:///{self.path(year)}')
+        try:
+            db.metadata.create_all(engine, tables=ARCHIVED_TABLES)
+        finally:
+            engine.dispose()
+        self._prepared.add(year)
+
+    def _attach(self, connection, year, writable=False):
+        """ATTACHes the archive for `year` to `connection` and returns its schema name, or None when there is none."""
+        name = f'archive_rw_{year}' if writable else f'archive_{year}'
+        attached = connection.info.setdefault('archives', set())
+        if name in attached:
+            return name
+
+        if writable:
+            self._prepare(year)
+            filename = self.path(year)
+        elif os.path.exists(self.path(year)):
+            # A URI filename, which SQLite accepts in ATTACH as Python's sqlite3 builds it
+            filename = f'file:{pathname2url(self.path(year))}?mode=ro'
+        else:
+            return None
+
+        connection.exec_driver_sql(f'ATTACH DATABASE ? AS {name}', (filename,))
+        attached.add(name)
+        return name
+
+    def attach_for_write(self, year):
+        """ATTACHes the archive for `year` to the session's connection for writing; detached once the connection is released."""
+        return self._attach(db.session.connection(), year, writable=True)
+
+    @contextmanager
+    def reading(self, year):
+        """
+        Yields (connection, schema name) with the archive for `year` attached read-only
+        to a connection of its own; the name is None when there is no such archive.
+        Detached again on exit, so any number of archives can be read in turn.
+        """
+        with db.engine.connect() as connection:
+            name = self._attach(connection, year)
+            try:
+                yield connection, name
+            finally:
+                if name is not None:
+                    connection.rollback()
+                    connection.exec_driver_sql(f'DETACH DATABASE {name}')
+                    connection.info['archives'].discard(name)
+
+    # --- Reading ---
+
+    def _index_query(self, kind, owner_id, peer_id=0):
+        return db.session.query(ArchiveIndex).filter_by(kind=kind, owner_id=owner_id, peer_id=peer_id)
+
+    def has_rows(self, kind, owner_id, peer_id=0):
+        return db.session.query(self._index_query(kind, owner_id, peer_id).exists()).scalar()
+
+    def fetch(self, kind, owner_id, peer_id, cursor, limit):
+        """
+        Up to `limit` archived rows of `kind` for (owner_id, peer_id), newest first, that
+        come after `cursor` (a (timestamp, id) position, None for the newest). Each row
+        also has the year of its archive as `archive`.
+        """
+        query = self._index_query(kind, owner_id, peer_id).with_entities(ArchiveIndex.archive)
+        if cursor:
+            query = query.filter(ArchiveIndex.oldest_at <= cursor[0])
+
+        rows = []
+        for (year,) in query.order_by(ArchiveIndex.archive.desc()):
+            with self.reading(year) as (connection, name):
+                if name is None:
+                    continue
+                table = self.table(name, kind)
+                select_rows = select(table, literal(year).label('archive'))\
+                    .where(_owner_condition(kind, table.c, owner_id, peer_id))
+                if cursor:
+                    select_rows = select_rows.where(keyset_before(table.c.timestamp, table.c.id, cursor))
+                rows += connection.execute(
+                    select_rows.order_by(table.c.timestamp.desc(), table.c.id.desc()).limit(limit - len(rows))
+                ).all()
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def extend_page(self, kind, rows, next_cursor, cursor, limit, owner_id, peer_id=0):
+        """
+        Completes one page of hot rows, as returned by fetch_page for `cursor` (newest
+        first), with the archived rows of `kind` for (owner_id, peer_id) that belong on
+        it. The archives are only read when the page reaches back past the newest
+        archived row; otherwise the page is returned as it is. Returns (rows, next_cursor),
+        where archived rows are Row tuples rather than model instances.
+        """
+        newest = self._index_query(kind, owner_id, peer_id).with_entities(func.max(ArchiveIndex.newest_at)).scalar()
+        if newest is None or (next_cursor and rows[-1].timestamp > newest):
+            return rows, next_cursor
+
+        merged = sorted(rows + self.fetch(kind, owner_id, peer_id, cursor, limit + 1), key=_position, reverse=True)
+        more = next_cursor is not None or len(merged) > limit
+        merged = merged[:limit]
+        return merged, (encode_cursor(*_position(merged[-1])) if more and merged else None)
+
+    def describe_posts(self, viewer_id, posts):
+        """
+        For archived post rows (from fetch), returns ({post_id: {'likes', 'retweets',
+        'comments'}}, {post_id: set of reaction types viewer_id has on it}), as
+        get_live_counts and get_viewer_reactions do for hot posts.
+        """
+        counts = {post.id: {'likes': 0, 'retweets': 0, 'comments': 0} for post in posts}
+        reactions = {post.id: set() for post in posts}
+        by_year = defaultdict(list)
+        for post in posts:
+            by_year[post.archive].append(post.id)
+
+        for year, post_ids in by_year.items():
+            with self.reading(year) as (connection, name):
+                if name is None:
+                    continue
+                stats, reaction = self.table(name, 'post_stats'), self.table(name, 'post_reaction')
+                for post_id, likes, retweets, comments in connection.execute(
+                    select(stats.c.post_id, stats.c.like_count, stats.c.retweet_count, stats.c.comment_count)
+                    .where(stats.c.post_id.in_(post_ids))
+                ):
+                    counts[post_id] = {'likes': likes, 'retweets': retweets, 'comments': comments or 0}
+                for post_id, flags in connection.execute(
+                    select(reaction.c.post_id, reaction.c.flags)
+                    .where(reaction.c.user_id == viewer_id, reaction.c.post_id.in_(post_ids))
+                ):
+                    reactions[post_id] = types_from_flags(flags)
+
+        return counts, reactions
+
+    def find_post(self, post_id):
+        """The archived post with this id (a Row with its archive's year as `archive`), or None."""
+        years = db.session.query(ArchiveIndex.archive).distinct().filter(
+            ArchiveIndex.kind == 'post', ArchiveIndex.min_id <= post_id, ArchiveIndex.max_id >= post_id
+        )
+        for (year,) in years:
+            with self.reading(year) as (connection, name):
+                if name is None:
+                    continue
+                table = self.table(name, 'post')
+                post = connection.execute(
+                    select(table, literal(year).label('archive')).where(table.c.id == post_id)
+                ).first()
+            if post is not None:
+                return post
+        return None
+
+    def get_comments_page(self, post, parent_id, cursor, limit):
+        """
+        As the comments endpoint, for an archived post (from find_post): one page of its
+        top-level comments or of one thread's replies, oldest first. Returns
+        ((comment, author) pairs, next_cursor, reply counts or None, comment count).
+        """
+        with self.reading(post.archive) as (connection, name):
+            comments = self.table(name, 'comment')
+            query = select(comments).where(comments.c.post_id == post.id, comments.c.parent_id == parent_id)
+            if cursor:
+                query = query.where(keyset_after(comments.c.timestamp, comments.c.id, cursor))
+            rows = connection.execute(
+                query.order_by(comments.c.timestamp.asc(), comments.c.id.asc()).limit(limit + 1)
+            ).all()
+
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = encode_cursor(*_position(rows[-1]))
+
+            reply_counts = None
+            if parent_id is None:
+                reply_counts = dict(connection.execute(
+                    select(comments.c.parent_id, func.count())
+                    .where(comments.c.post_id == post.id, comments.c.parent_id.in_([row.id for row in rows]))
+                    .group_by(comments.c.parent_id)
+                ).all())
+
+            stats = self.table(name, 'post_stats')
+            comment_count = connection.execute(
+                select(stats.c.comment_count).where(stats.c.post_id == post.id)
+            ).scalar() or 0
+
+        authors = {user.id: user for user in User.query.filter(User.id.in_({row.user_id for row in rows}))}
+        pairs = [(row, authors[row.user_id]) for row in rows if row.user_id in authors]
+        return pairs, next_cursor, reply_counts, comment_count
+
+    def user_stats(self, user_ids):
+        """
+        Returns {user_id: Counter} of the post_count, likes_received, retweets_received
+        and comments_received that the users' archived posts add to their stats.
+        """
+        totals = defaultdict(Counter)
+        by_year = defaultdict(list)
+        for year, owner_id in db.session.query(ArchiveIndex.archive, ArchiveIndex.owner_id)\
+                .filter(ArchiveIndex.kind == 'post', ArchiveIndex.owner_id.in_(user_ids)):
+            by_year[year].append(owner_id)
+
+        for year, owner_ids in by_year.items():
+            with self.reading(year) as (connection, name):
+                if name is None:
+                    continue
+                posts, reactions = self.table(name, 'post'), self.table(name, 'post_reaction')
+                comments = self.table(name, 'comment')
+                in_owners = posts.c.user_id.in_(owner_ids)
+
+                queries = {
+                    'post_count': select(posts.c.user_id, func.count()).where(in_owners),
+                    'comments_received': select(posts.c.user_id, func.count())
+                        .join(comments, comments.c.post_id == posts.c.id).where(in_owners),
+                }
+                for field, flag in (('likes_received', Reaction.LIKE), ('retweets_received', Reaction.RETWEET)):
+                    queries[field] = select(posts.c.user_id, func.count())\
+                        .join(reactions, reactions.c.post_id == posts.c.id)\
+                        .where(in_owners, reactions.c.flags.op('&')(flag) != 0)
+
+                for field, query in queries.items():
+                    for user_id, count in connection.execute(query.group_by(posts.c.user_id)):
+                        totals[user_id][field] += count
+
+        return totals
+
+    # --- Archiving ---
+
+    def seed_id_sequences(self):
+        """
+        Raises the AUTOINCREMENT sequence of each table in ID_TABLES past the highest id
+        its archives hold, for archives filled before those tables had AUTOINCREMENT.
+        Returns the names of the tables whose sequence was raised.
+        """
+        highest = Counter()
+        for year in self.years():
+            with self.reading(year) as (connection, schema):
+                for table in ID_TABLES:
+                    archived_max = connection.execute(select(func.max(self.table(schema, table.name).c.id))).scalar()
+                    highest[table.name] = max(highest[table.name], archived_max or 0)
+
+        raised = []
+        for name, archived_max in highest.items():
+            current = db.session.execute(
+                text('SELECT seq FROM sqlite_sequence WHERE name = :name'), {'name': name}
+            ).scalar()
+            if archived_max <= (current or 0):
+                continue
+
+            if current is None:
+                statement = text('INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)')
+            else:
+                statement = text('UPDATE sqlite_sequence SET seq = :seq WHERE name = :name')
+            db.session.execute(statement, {'name': name, 'seq': archived_max})
+            raised.append(name)
+
+        db.session.commit()
+        return raised
+
+    def _copy(self, schema, table, condition, overrides=None):
+        """
+        Copies the rows of `table` matching `condition` into the attached archive `schema`.
+        OR REPLACE only ever meets the same rows again, copied by a run that was interrupted
+        before its commit reached the main database: ids aren't reused (see ID_TABLES).
+        """
+        overrides = overrides or {}
+        names = [column.name for column in table.columns]
+        db.session.execute(
+            insert(self.table(schema, table.name)).prefix_with('OR REPLACE').from_select(
+                names, select(*[overrides.get(name, table.c[name]) for name in names]).where(condition)
+            )
+        )
+
+    def _index(self, kind, year, rows):
+        """Adds moved rows, as (owner_id, peer_id, id, timestamp), to ArchiveIndex."""
+        groups = defaultdict(list)
+        for owner_id, peer_id, row_id, timestamp in rows:
+            groups[(owner_id, peer_id)].append((row_id, timestamp))
+
+        statement = sqlite_insert(ArchiveIndex.__table__).values(
+            kind=kind, archive=year,
+            owner_id=bindparam('owner'), peer_id=bindparam('peer'), row_count=bindparam('count'),
+            oldest_at=bindparam('oldest'), newest_at=bindparam('newest'),
+            min_id=bindparam('first'), max_id=bindparam('last'),
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=['kind', 'owner_id', 'peer_id', 'archive'],
+            set_={
+                'row_count': ArchiveIndex.row_count + statement.excluded.row_count,
+                'oldest_at': func.min(ArchiveIndex.oldest_at, statement.excluded.oldest_at),
+                'newest_at': func.max(ArchiveIndex.newest_at, statement.excluded.newest_at),
+                'min_id': func.min(ArchiveIndex.min_id, statement.excluded.min_id),
+                'max_id': func.max(ArchiveIndex.max_id, statement.excluded.max_id),
+            }
+        )
+        db.session.connection().execute(statement, [
+            {
+                'owner': owner_id, 'peer': peer_id, 'count': len(items),
+                'oldest': min(timestamp for _, timestamp in items), 'newest': max(timestamp for _, timestamp in items),
+                'first': min(row_id for row_id, _ in items), 'last': max(row_id for row_id, _ in items),
+            }
+            for (owner_id, peer_id), items in groups.items()
+        ])
+
+    @staticmethod
+    def _by_year(rows):
+        years = defaultdict(list)
+        for row in rows:
+            years[row.timestamp.year].append(row)
+        return years
+
+    def _archive_posts(self, cutoff, batch_size):
+        rows = db.session.query(Post.id, Post.user_id, Post.timestamp).filter(
+            Post.timestamp < cutoff,
+            ~exists().where(Reaction.post_id == Post.id, or_(
+                has_reaction('BOOKMARK'), Reaction.liked_at >= cutoff, Reaction.retweeted_at >= cutoff
+            )),
+            ~exists().where(Comment.post_id == Post.id, Comment.timestamp >= cutoff),
+            ~exists().where(PostStats.post_id == Post.id, PostStats.dirty.is_(True)),
+        ).order_by(Post.id).limit(batch_size).all()
+        if not rows:
+            return 0
+
+        # Archived posts are read-only, so their counts are final: make sure each has them
+        get_live_counts([row.id for row in rows])
+
+        for year, posts in self._by_year(rows).items():
+            schema = self.attach_for_write(year)
+            post_ids = [post.id for post in posts]
+            self._copy(schema, Post.__table__, Post.id.in_(post_ids))
+            for model in (PostStats, Reaction, Comment):
+                self._copy(schema, model.__table__, model.post_id.in_(post_ids))
+                db.session.execute(delete(model).where(model.post_id.in_(post_ids)))
+            unindex_posts(post_ids)
+            db.session.execute(delete(Post).where(Post.id.in_(post_ids)))
+            self._index('post', year, [(post.user_id, 0, post.id, post.timestamp) for post in posts])
+        return len(rows)
+
+    def _archive_messages(self, cutoff, batch_size):
+        rows = db.session.query(Message.id, Message.sender_id, Message.recipient_id, Message.timestamp)\
+            .filter(Message.timestamp < cutoff)\
+            .order_by(Message.id)\
+            .limit(batch_size)\
+            .all()
+        if not rows:
+            return 0
+
+        for year, messages in self._by_year(rows).items():
+            schema = self.attach_for_write(year)
+            message_ids = [message.id for message in messages]
+            self._copy(schema, Message.__table__, Message.id.in_(message_ids))
+            db.session.execute(delete(Message).where(Message.id.in_(message_ids)))
+            self._index('message', year, [
+                (min(message.sender_id, message.recipient_id), max(message.sender_id, message.recipient_id),
+                 message.id, message.timestamp)
+                for message in messages
+            ])
+        return len(rows)
+
+    def _archive_notifications(self, cutoff, batch_size):
+        rows = db.session.query(Notification.id, Notification.user_id, Notification.is_read, Notification.timestamp)\
+            .filter(Notification.timestamp < cutoff)\
+            .order_by(Notification.id)\
+            .limit(batch_size)\
+            .all()
+        if not rows:
+            return 0
+
+        for year, notifications in self._by_year(rows).items():
+            schema = self.attach_for_write(year)
+            notification_ids = [notification.id for notification in notifications]
+            self._copy(schema, Notification.__table__, Notification.id.in_(notification_ids), {'is_read': true()})
+            db.session.execute(delete(Notification).where(Notification.id.in_(notification_ids)))
+            self._index('notification', year, [
+                (notification.user_id, 0, notification.id, notification.timestamp) for notification in notifications
+            ])
+
+        unread = Counter(row.user_id for row in rows if not row.is_read)
+        _subtract(UserStats.__table__, 'unread_notifications', 'user_id', unread)
+        return len(rows)
+
+    def archive_older_than(self, days, batch_size=None):
+        """
+        Moves posts, messages and notifications older than `days` days into the archives,
+        batch_size rows per transaction with a pause in between. Safe to interrupt and
+        run again. Returns {'post': n, 'message': n, 'notification': n} rows moved.
+        """
+        # Without AUTOINCREMENT, moving the newest rows out would let their ids be handed out again
+        missing = [table.name for table in ID_TABLES if table.name in missing_autoincrement()]
+        if missing:
+            raise RuntimeError(f"Tables {', '.join(missing)} need AUTOINCREMENT before archiving; run flask init-db")
+
+        batch_size = batch_size or self.batch_size
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        moved = Counter()
+
+        for kind, archive_batch in (
+            ('post', self._archive_posts),
+            ('message', self._archive_messages),
+            ('notification', self._archive_notifications),
+        ):
+            while True:
+                try:
+                    count = archive_batch(cutoff, batch_size)
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    raise
+                moved[kind] += count
+                if not count:
+                    break
+                time.sleep(self.pause)
+
+        return moved
+
+    # --- Deleting ---
+
+    def delete_post(self, post):
+        """
+        Deletes an archived post (from find_post) with its stats, reactions and comments,
+        in the current transaction. Returns its {'likes', 'retweets', 'comments'} counts
+        for the caller to take off the author's stats; the caller commits.
+        """
+        schema = self.attach_for_write(post.archive)
+        tables = {name: self.table(schema, name) for name in ('post', 'post_stats', 'post_reaction', 'comment')}
+
+        reactions = tables['post_reaction']
+        counts = {
+            'likes': db.session.execute(select(func.count()).where(
+                reactions.c.post_id == post.id, reactions.c.flags.op('&')(Reaction.LIKE) != 0)).scalar(),
+            'retweets': db.session.execute(select(func.count()).where(
+                reactions.c.post_id == post.id, reactions.c.flags.op('&')(Reaction.RETWEET) != 0)).scalar(),
+            'comments': db.session.execute(select(func.count()).where(
+                tables['comment'].c.post_id == post.id)).scalar(),
+        }
+
+        for name in ('post_reaction', 'comment', 'post_stats'):
+            db.session.execute(delete(tables[name]).where(tables[name].c.post_id == post.id))
+        db.session.execute(delete(tables['post']).where(tables['post'].c.id == post.id))
+        db.session.execute(
+            update(ArchiveIndex)
+            .where(ArchiveIndex.kind == 'post', ArchiveIndex.owner_id == post.user_id, ArchiveIndex.archive == post.archive)
+            .values(row_count=ArchiveIndex.row_count - 1)
+        )
+        return counts
+
+    def _purge_user_archive(self, user_id, schema, batch_size):
+        """Deletes the next batch of a deleted account's rows from one attached archive. Returns the number deleted."""
+        posts, stats = self.table(schema, 'post'), self.table(schema, 'post_stats')
+        reactions, comments = self.table(schema, 'post_reaction'), self.table(schema, 'comment')
+        messages, notifications = self.table(schema, 'message'), self.table(schema, 'notification')
+
+        # Their posts, with everything on them
+        post_ids = db.session.execute(select(posts.c.id).where(posts.c.user_id == user_id).limit(batch_size)).scalars().all()
+        if post_ids:
+            for table in (reactions, comments, stats):
+                db.session.execute(delete(table).where(table.c.post_id.in_(post_ids)))
+            db.session.execute(delete(posts).where(posts.c.id.in_(post_ids)))
+            return len(post_ids)
+
+        # Their reactions on others' archived posts, taken off those posts' counts and authors' stats
+        rows = db.session.execute(
+            select(reactions.c.post_id, reactions.c.flags, posts.c.user_id)
+            .join(posts, posts.c.id == reactions.c.post_id)
+            .where(reactions.c.user_id == user_id)
+            .limit(batch_size)
+        ).all()
+        if rows:
+            post_likes, post_retweets, author_likes, author_retweets = Counter(), Counter(), Counter(), Counter()
+            for post_id, flags, author_id in rows:
+                types = types_from_flags(flags)
+                if 'LIKE' in types:
+                    post_likes[post_id] += 1
+                    author_likes[author_id] += 1
+                if 'RETWEET' in types:
+                    post_retweets[post_id] += 1
+                    author_retweets[author_id] += 1
+
+            db.session.execute(delete(reactions).where(
+                reactions.c.user_id == user_id, reactions.c.post_id.in_([post_id for post_id, _, _ in rows])
+            ))
+            _subtract(stats, 'like_count', 'post_id', post_likes)
+            _subtract(stats, 'retweet_count', 'post_id', post_retweets)
+            _subtract(UserStats.__table__, 'likes_received', 'user_id', author_likes)
+            _subtract(UserStats.__table__, 'retweets_received', 'user_id', author_retweets)
+            return len(rows)
+
+        # Their comments and the replies under them
+        own = db.session.execute(
+            select(comments.c.id, comments.c.post_id).where(comments.c.user_id == user_id).limit(batch_size)
+        ).all()
+        if own:
+            replies = db.session.execute(
+                select(comments.c.id, comments.c.post_id)
+                .where(comments.c.parent_id.in_([comment_id for comment_id, _ in own]), comments.c.user_id != user_id)
+            ).all()
+            removed = own + replies
+            per_post = Counter(post_id for _, post_id in removed)
+            authors = dict(db.session.execute(
+                select(posts.c.id, posts.c.user_id).where(posts.c.id.in_(list(per_post)))
+            ).all())
+            per_author = Counter()
+            for post_id, count in per_post.items():
+                per_author[authors[post_id]] += count
+
+            db.session.execute(delete(comments).where(comments.c.id.in_([comment_id for comment_id, _ in removed])))
+            _subtract(stats, 'comment_count', 'post_id', per_post)
+            _subtract(UserStats.__table__, 'comments_received', 'user_id', per_author)
+            return len(removed)
+
+        for table, condition in (
+            (messages, or_(messages.c.sender_id == user_id, messages.c.recipient_id == user_id)),
+            (notifications, or_(notifications.c.user_id == user_id, notifications.c.actor_id == user_id)),
+        ):
+            row_ids = db.session.execute(select(table.c.id).where(condition).limit(batch_size)).scalars().all()
+            if row_ids:
+                db.session.execute(delete(table).where(table.c.id.in_(row_ids)))
+                return len(row_ids)
+
+        return 0
+
+    def purge_user_batch(self, user_id, batch_size):
+        """
+        Account purge step (see purge.USER_PURGE_STEPS): deletes the next batch of a
+        deleted account's archived posts, reactions, comments, messages and
+        notifications, then its ArchiveIndex rows. Returns the number of rows deleted.
+        """
+        for year in self.years():
+            removed = self._purge_user_archive(user_id, self.attach_for_write(year), batch_size)
+            if removed:
+                return removed
+            # Release each archive that had nothing left, so they don't pile up on the connection
+            db.session.commit()
+
+        return db.session.execute(delete(ArchiveIndex).where(
+            or_(ArchiveIndex.owner_id == user_id, ArchiveIndex.peer_id == user_id)
+        )).rowcount
+
+archive_store = ArchiveStore()
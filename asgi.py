@@ -0,0 +1,440 @@
+"""
+Optional ASGI serving mode: uvicorn --factory asgi:create_asgi_app --workers 2
+
+The messaging and notification endpoints, and the /api/events stream, are served
+natively as coroutines on SQLAlchemy's async engine over aiosqlite, with the same
+URLs and JSON as the Flask views. A request waiting on the database, or a client
+holding the event stream open, costs a coroutine instead of a worker, so a few
+processes can hold thousands of idle connections. Everything else is passed to
+the Flask app, which runs in a thread pool (ASGI_WSGI_THREADS per process).
+
+Needs: pip install uvicorn a2wsgi aiosqlite "sqlalchemy[asyncio]"
+"""
+import asyncio
+import json
+from collections import namedtuple
+from urllib.parse import parse_qsl, quote
+from itsdangerous import BadSignature
+from sqlalchemy import select, insert, update, func, case, or_, and_
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import parse_cookie
+from werkzeug.routing import Map, Rule
+from app import create_app
+from models import db, User, Message, Notification, UserStats, ArchiveIndex
+from pagination import InvalidCursor, get_page_size, encode_cursor, decode_cursor, keyset_before
+from serializer import dumps
+from ratelimit import rate_limiter, RateLimited
+
+try:
+    from a2wsgi import WSGIMiddleware
+    from sqlalchemy.ext.asyncio import create_async_engine
+except ImportError:  # Optional: only needed to serve over ASGI
+    WSGIMiddleware = create_async_engine = None
+
+DEFAULT_AVATAR = 'uploads/default-avatar.jpg'
+
+Viewer = namedtuple('Viewer', 'id username')
+
+class AsyncRequest:
+    """The parts of an ASGI HTTP request the async views read."""
+
+    def __init__(self, scope, receive):
+        self.scope = scope
+        self.receive = receive
+        self.path = scope['path']
+        self.client_ip = scope['client'][0] if scope.get('client') else None
+        self.args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+        headers = dict(scope['headers'])
+        self.cookies = parse_cookie(headers.get(b'cookie', b'').decode('latin-1'))
+
+    async def json(self):
+        """The request body parsed as JSON, or {} when it is empty or not JSON."""
+        chunks = []
+        while True:
+            message = await self.receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+        try:
+            data = json.loads(b''.join(chunks))
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    async def wait_disconnect(self):
+        while (await self.receive())['type'] != 'http.disconnect':
+            pass
+
+async def send_json(send, payload, status=200, headers=()):
+    body = dumps(payload) + b'\n'
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode('ascii')),
+                    *headers],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+class ChirpASGI:
+    """
+    ASGI app in front of the Flask app. Requests matching `routes` are answered by the
+    coroutine of the same name; anything else (including a method a route doesn't
+    take) goes to Flask. Sessions are Flask's signed cookie, read with the Flask
+    app's own serializer, so logging in through Flask logs in here too.
+    """
+
+    routes = Map([
+        Rule('/api/messages/conversations', endpoint='get_conversations', methods=['GET']),
+        Rule('/api/messages/<partner_username>', endpoint='get_messages', methods=['GET']),
+        Rule('/api/messages/<partner_username>', endpoint='send_message', methods=['POST']),
+        Rule('/api/notifications', endpoint='get_notifications', methods=['GET']),
+        Rule('/api/notifications/unread_count', endpoint='get_unread_count', methods=['GET']),
+        Rule('/api/notifications/read', endpoint='mark_notifications_read', methods=['POST']),
+        Rule('/api/events', endpoint='events', methods=['GET']),
+    ])
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WSGIMiddleware(flask_app, workers=flask_app.config.get('ASGI_WSGI_THREADS', 10))
+        self.sessions = flask_app.session_interface.get_signing_serializer(flask_app)
+        self.poll_interval = flask_app.config.get('EVENT_POLL_INTERVAL', 5.0)
+        self.heartbeat_interval = flask_app.config.get('EVENT_HEARTBEAT_INTERVAL', 25.0)
+
+        with flask_app.app_context():
+            # Flask-SQLAlchemy has already resolved a relative SQLite path against the instance folder
+            url = db.engine.url
+        self.engine = create_async_engine(url.set(drivername='sqlite+aiosqlite'))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+
+        try:
+            endpoint, path_args = self.routes.bind('', path_info=scope['path']).match(method=scope['method'])
+        except HTTPException:
+            return await self.wsgi(scope, receive, send)
+
+        request = AsyncRequest(scope, receive)
+        viewer = await self.current_viewer(request)
+        if viewer is None:
+            # Same as Flask-Login's login_required
+            next_path = request.path + (f"?{scope['query_string'].decode('latin-1')}" if scope.get('query_string') else '')
+            await send({
+                'type': 'http.response.start',
+                'status': 302,
+                'headers': [(b'location', f"/login?next={quote(next_path, safe='')}".encode('latin-1'))],
+            })
+            return await send({'type': 'http.response.body', 'body': b''})
+
+        await getattr(self, endpoint)(request, viewer, send, **path_args)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                return await send({'type': 'lifespan.shutdown.complete'})
+
+    async def current_viewer(self, request):
+        """The logged-in, not deleted user of the request's Flask session, or None."""
+        cookie = request.cookies.get(self.flask_app.config['SESSION_COOKIE_NAME'])
+        if not cookie:
+            return None
+        try:
+            session = self.sessions.loads(cookie, max_age=int(self.flask_app.permanent_session_lifetime.total_seconds()))
+            user_id = int(session['_user_id'])
+        except (BadSignature, KeyError, TypeError, ValueError):
+            return None
+
+        async with self.engine.connect() as connection:
+            row = (await connection.execute(
+                select(User.id, User.username).where(User.id == user_id, User.deleted_at.is_(None))
+            )).first()
+        return Viewer(*row) if row else None
+
+    async def find_active_user(self, connection, username):
+        return (await connection.execute(
+            select(User.id, User.username).where(User.username == username, User.deleted_at.is_(None))
+        )).first()
+
+    async def unread_notifications(self, connection, user_id):
+        """The user's unread counter, counted from the rows when their stats row doesn't have it yet."""
+        unread = (await connection.execute(
+            select(UserStats.unread_notifications).where(UserStats.user_id == user_id)
+        )).scalar()
+        if unread is None:
+            unread = (await connection.execute(
+                select(func.count(Notification.id)).where(Notification.user_id == user_id, Notification.is_read.is_(False))
+            )).scalar()
+        return unread
+
+    # --- Direct Messages ---
+
+    async def get_conversations(self, request, viewer, send):
+        """As messaging.get_conversations, with each partner's last message found by one window query."""
+        partner_id = case((Message.sender_id == viewer.id, Message.recipient_id), else_=Message.sender_id)
+        latest = select(
+            Message.content, Message.timestamp, partner_id.label('partner_id'),
+            func.row_number().over(
+                partition_by=partner_id, order_by=(Message.timestamp.desc(), Message.id.desc())
+            ).label('position')
+        ).where(or_(Message.sender_id == viewer.id, Message.recipient_id == viewer.id)).subquery()
+
+        async with self.engine.connect() as connection:
+            rows = (await connection.execute(
+                select(User.id, User.username, User.profile_image, latest.c.content, latest.c.timestamp)
+                .join(latest, latest.c.partner_id == User.id)
+                .where(latest.c.position == 1)
+                .order_by(latest.c.timestamp.desc())
+            )).all()
+            unread_counts = dict((await connection.execute(
+                select(Message.sender_id, func.count())
+                .where(Message.recipient_id == viewer.id, Message.is_read.is_(False))
+                .group_by(Message.sender_id)
+            )).all())
+
+        await send_json(send, {'success': True, 'conversations': [
+            {
+                'partner_username': username,
+                'partner_id': partner_id,
+                'last_message_content': content,
+                'last_message_time': timestamp.isoformat(),
+                'unread_count': unread_counts.get(partner_id, 0),
+                'profile_image': profile_image or DEFAULT_AVATAR,
+            }
+            for partner_id, username, profile_image, content, timestamp in rows
+        ]})
+
+    async def get_messages(self, request, viewer, send, partner_username):
+        """As messaging.get_messages. Pages that read from the archive (see archive.py) are left to Flask."""
+        if request.args.get('before'):
+            return await self.wsgi(request.scope, request.receive, send)
+
+        async with self.engine.begin() as connection:
+            partner = await self.find_active_user(connection, partner_username)
+            if partner is None:
+                return await send_json(send, {'success': False, 'message': 'Partner not found.'}, 404)
+
+            owner_id, peer_id = sorted((viewer.id, partner.id))
+            archived = (await connection.execute(
+                select(ArchiveIndex.archive)
+                .where(ArchiveIndex.kind == 'message', ArchiveIndex.owner_id == owner_id, ArchiveIndex.peer_id == peer_id)
+                .limit(1)
+            )).first() is not None
+
+            await connection.execute(
+                update(Message)
+                .where(Message.sender_id == partner.id, Message.recipient_id == viewer.id, Message.is_read.is_(False))
+                .values(is_read=True)
+            )
+            rows = (await connection.execute(
+                select(Message.id, Message.content, Message.timestamp, Message.is_read, Message.sender_id)
+                .where(or_(
+                    and_(Message.sender_id == viewer.id, Message.recipient_id == partner.id),
+                    and_(Message.sender_id == partner.id, Message.recipient_id == viewer.id)
+                ))
+                .order_by(Message.timestamp.asc(), Message.id.asc())
+            )).all()
+
+        if archived and not rows:
+            return await self.wsgi(request.scope, request.receive, send)
+
+        await send_json(send, {
+            'success': True,
+            'messages': [
+                {
+                    'id': message_id,
+                    'content': content,
+                    'timestamp': timestamp.isoformat(),
+                    'is_read': is_read,
+                    'is_outgoing': sender_id == viewer.id,
+                    'sender_username': viewer.username if sender_id == viewer.id else partner.username,
+                }
+                for message_id, content, timestamp, is_read, sender_id in rows
+            ],
+            'partner_username': partner.username,
+            'next_cursor': encode_cursor(rows[0].timestamp, rows[0].id) if archived else None
+        })
+
+    async def send_message(self, request, viewer, send, partner_username):
+        """As messaging.send_message, under the same rate limits and write backpressure."""
+        try:
+            rate_limiter.check('message', request.client_ip, viewer.id)
+            started = rate_limiter.begin_write() if rate_limiter.enabled else None
+        except RateLimited as error:
+            return await send_json(
+                send, {'success': False, 'message': error.message, 'retryAfter': error.retry_after}, 429,
+                [(b'retry-after', str(error.retry_after).encode('ascii'))]
+            )
+
+        try:
+            await self.insert_message(request, viewer, send, partner_username)
+        finally:
+            if started is not None:
+                rate_limiter.end_write(started)
+
+    async def insert_message(self, request, viewer, send, partner_username):
+        content = (await request.json()).get('content')
+
+        async with self.engine.begin() as connection:
+            partner = await self.find_active_user(connection, partner_username)
+            if partner is None or not content:
+                return await send_json(send, {'success': False, 'message': 'Invalid data or recipient.'}, 400)
+            if partner.id == viewer.id:
+                return await send_json(send, {'success': False, 'message': 'Cannot message yourself.'}, 400)
+
+            message_id, timestamp = (await connection.execute(
+                insert(Message)
+                .values(sender_id=viewer.id, recipient_id=partner.id, content=content, is_read=False)
+                .returning(Message.id, Message.timestamp)
+            )).one()
+
+        await send_json(send, {
+            'success': True,
+            'message_data': {
+                'id': message_id,
+                'content': content,
+                'timestamp': timestamp.isoformat(),
+                'is_read': False,
+                'is_outgoing': True,
+                'sender_username': viewer.username
+            }
+        }, 201)
+
+    # --- Notifications ---
+
+    async def get_notifications(self, request, viewer, send):
+        """As social.api_load_notifications: one keyset page, newest first."""
+        try:
+            before = decode_cursor(request.args['before']) if request.args.get('before') else None
+        except InvalidCursor:
+            return await send_json(send, {'success': False, 'message': 'Invalid cursor.'}, 400)
+        limit = get_page_size(request.args)
+
+        query = select(
+            Notification.id, Notification.post_id, Notification.actor_id, User.username, Notification.type,
+            Notification.group_count, Notification.is_read, Notification.timestamp
+        ).join(User, Notification.actor_id == User.id).where(Notification.user_id == viewer.id)
+        if before:
+            query = query.where(keyset_before(Notification.timestamp, Notification.id, before))
+
+        async with self.engine.connect() as connection:
+            rows = (await connection.execute(
+                query.order_by(Notification.timestamp.desc(), Notification.id.desc()).limit(limit + 1)
+            )).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id)
+
+        await send_json(send, {
+            'success': True,
+            'notifications': [
+                {
+                    'id': row.id,
+                    'post_id': row.post_id,
+                    'actor_id': row.actor_id,
+                    'actor_username': row.username,
+                    'type': row.type,
+                    'group_count': row.group_count or 1,
+                    'is_read': row.is_read,
+                    'timestamp': row.timestamp.isoformat()
+                }
+                for row in rows
+            ],
+            'next_cursor': next_cursor,
+            'high_water_mark': encode_cursor(rows[0].timestamp, rows[0].id) if rows and not before else None
+        })
+
+    async def get_unread_count(self, request, viewer, send):
+        async with self.engine.connect() as connection:
+            unread = await self.unread_notifications(connection, viewer.id)
+        await send_json(send, {'success': True, 'unreadCount': unread})
+
+    async def mark_notifications_read(self, request, viewer, send):
+        """As notifications.mark_notifications_read, in one transaction."""
+        until = (await request.json()).get('until')
+        try:
+            until = decode_cursor(until) if until else None
+        except InvalidCursor:
+            return await send_json(send, {'success': False, 'message': 'Invalid cursor.'}, 400)
+
+        condition = and_(Notification.user_id == viewer.id, Notification.is_read.is_(False))
+        if until is not None:
+            timestamp, row_id = until
+            condition = and_(condition, or_(
+                Notification.timestamp < timestamp,
+                and_(Notification.timestamp == timestamp, Notification.id <= row_id)
+            ))
+
+        async with self.engine.begin() as connection:
+            marked = (await connection.execute(update(Notification).where(condition).values(is_read=True))).rowcount
+            if marked:
+                # A missing or NULL counter is left alone: it is computed from the rows when first read
+                await connection.execute(
+                    update(UserStats)
+                    .where(UserStats.user_id == viewer.id)
+                    .values(unread_notifications=UserStats.unread_notifications - marked)
+                )
+            unread = await self.unread_notifications(connection, viewer.id)
+
+        await send_json(send, {'success': True, 'marked': marked, 'unreadCount': unread})
+
+    # --- Event Stream ---
+
+    async def badge_counts(self, user_id):
+        async with self.engine.connect() as connection:
+            unread_messages = (await connection.execute(
+                select(func.count(Message.id)).where(Message.recipient_id == user_id, Message.is_read.is_(False))
+            )).scalar()
+            return {
+                'unreadNotifications': await self.unread_notifications(connection, user_id),
+                'unreadMessages': unread_messages,
+            }
+
+    async def events(self, request, viewer, send):
+        """
+        Server-sent events for the sidebar badges: a 'counts' event with the unread
+        notification and message counts on connect and whenever they change (checked
+        every EVENT_POLL_INTERVAL seconds), and a comment line as a keep-alive.
+        Holds no connection between checks.
+        """
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'),
+                        (b'x-accel-buffering', b'no')],
+        })
+
+        disconnected = asyncio.ensure_future(request.wait_disconnect())
+        loop = asyncio.get_running_loop()
+        last_counts = None
+        last_sent = loop.time()
+        try:
+            while not disconnected.done():
+                counts = await self.badge_counts(viewer.id)
+                if counts != last_counts:
+                    await send({'type': 'http.response.body', 'more_body': True,
+                                'body': b'event: counts\ndata: ' + dumps(counts) + b'\n\n'})
+                    last_counts, last_sent = counts, loop.time()
+                elif loop.time() - last_sent >= self.heartbeat_interval:
+                    await send({'type': 'http.response.body', 'more_body': True, 'body': b': keep-alive\n\n'})
+                    last_sent = loop.time()
+
+                await asyncio.wait([disconnected], timeout=self.poll_interval)
+        finally:
+            disconnected.cancel()
+
+def create_asgi_app(config=None):
+    """Builds the Flask app (see app.create_app) and wraps it for an ASGI server."""
+    if create_async_engine is None:
+        raise RuntimeError('ASGI mode needs: pip install uvicorn a2wsgi aiosqlite "sqlalchemy[asyncio]"')
+
+    return ChirpASGI(create_app({'EVENT_STREAM': True, **(config or {})}))
@@ -0,0 +1,221 @@
+import os
+from datetime import datetime
+from flask import Blueprint, Response, current_app, redirect, url_for, request, jsonify, stream_with_context
+from flask_login import LoginManager, login_user, logout_user, current_user, login_required
+from werkzeug.utils import secure_filename
+from models import db, User, UserStats
+from user_search import index_users
+from typeahead import username_typeahead
+from purge import purge_worker, tombstone_user
+from ratelimit import rate_limiter
+from export import export_user
+
+bp = Blueprint('auth', __name__)
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+
+login_manager = LoginManager()
+login_manager.login_view = 'pages.login'
+
+@login_manager.user_loader
+def load_user(user_id):
+    """Required by Flask-Login to reload the user object from the session ID."""
+    user = db.session.get(User, int(user_id))
+    # A deleted account's sessions end with the request that deleted it
+    return user if user is not None and user.deleted_at is None else None
+
+def find_active_user(username):
+    """Looks up a user by username, treating accounts pending deletion as gone."""
+    return User.query.filter_by(username=username, deleted_at=None).first()
+
+# --- Authentication API Routes ---
+
+def login_attempt_key():
+    """The username a login request is trying, for its per-account rate limit."""
+    username = (request.get_json(silent=True) or {}).get('username')
+    return username.lower() if isinstance(username, str) else None
+
+@bp.route('/api/login', methods=['POST'])
+@rate_limiter.limit('login', user_key=login_attempt_key, write=False)
+def api_login():
+    """Handles the login form submission from login.html (via app.js fetch)."""
+    data = request.get_json()
+    username = data.get('username')
+    password = data.get('password')
+
+    user = find_active_user(username)
+    
+    if user is None or not user.check_password(password):
+        return jsonify({'success': False, 'message': 'Invalid username or password'}), 401
+
+    login_user(user)
+    return jsonify({'success': True, 'redirect': url_for('pages.timeline')})
+
+@bp.route('/api/signup', methods=['POST'])
+def api_signup():
+    """Handles new user registration."""
+    data = request.get_json()
+    username = data.get('username')
+    email = data.get('email')
+    password = data.get('password')
+
+    if not username or not email or not password:
+        return jsonify({'success': False, 'message': 'All fields are required'}), 400
+
+    if User.query.filter_by(username=username).first():
+        return jsonify({'success': False, 'message': 'Username already taken'}), 409
+    
+    if User.query.filter_by(email=email).first():
+        return jsonify({'success': False, 'message': 'Email already registered'}), 409
+
+    new_user = User(username=username, email=email)
+    new_user.set_password(password) 
+    
+    db.session.add(new_user)
+    db.session.flush()
+    db.session.add(UserStats(user_id=new_user.id))
+    index_users([new_user])
+    db.session.commit()
+    
+    username_typeahead.add_user(new_user.id, new_user.username)
+
+    login_user(new_user)
+    
+    return jsonify({
+        'success': True, 
+        'message': 'Account created successfully!',
+        'redirect': url_for('pages.timeline')
+    })
+
+@bp.route('/logout')
+def logout():
+    """Logs out the current user."""
+    logout_user()
+    return redirect(url_for('pages.login'))
+
+@bp.route('/api/account', methods=['DELETE'])
+@login_required
+def delete_account():
+    """
+    Deletes the current user's account. Requires their password.
+    The account is locked and hidden right away; its posts, reactions, comments,
+    messages and follows are purged in the background in small batches (see purge.py).
+    """
+    data = request.get_json(silent=True) or {}
+    
+    if not current_user.check_password(data.get('password') or ''):
+        return jsonify({'success': False, 'message': 'Incorrect password'}), 403
+    
+    user_id = current_user.id
+    job = tombstone_user(current_user)
+    db.session.commit()
+    
+    logout_user()
+    username_typeahead.remove_user(user_id)
+    purge_worker.wake()
+    
+    return jsonify({
+        'success': True,
+        'message': 'Account deleted',
+        'jobId': job.id,
+        'redirect': url_for('pages.login')
+    })
+
+@bp.route('/api/export', methods=['GET'])
+@login_required
+@rate_limiter.limit('export', write=False)
+def export_account():
+    """
+    Downloads the current user's data (see export.py) as NDJSON, streamed in chunks.
+    An interrupted download resumes with ?cursor= set to the last line's cursor.
+    """
+    chunks = export_user(current_user.id, cursor=request.args.get('cursor'))
+    response = Response(stream_with_context(chunks), mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = f'attachment; filename="chirp-{current_user.username}.ndjson"'
+    return response
+
+# --- Image Upload Helper Functions ---
+
+def allowed_file(filename):
+    """Check if file extension is allowed."""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def upload_path(filename):
+    """Path for a new upload, creating UPLOAD_FOLDER on first use rather than at startup."""
+    folder = current_app.config['UPLOAD_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, filename)
+
+# --- Image Upload API Routes ---
+
+@bp.route('/api/upload/profile-image', methods=['POST'])
+@login_required
+def upload_profile_image():
+    """Upload profile picture for current user."""
+    if 'file' not in request.files:
+        return jsonify({'success': False, 'message': 'No file provided'}), 400
+    
+    file = request.files['file']
+    
+    if file.filename == '':
+        return jsonify({'success': False, 'message': 'No file selected'}), 400
+    
+    if not allowed_file(file.filename):
+        return jsonify({'success': False, 'message': 'Invalid file type. Allowed: png, jpg, jpeg, gif, webp'}), 400
+    
+    try:
+        ext = file.filename.rsplit('.', 1)[1].lower()
+        filename = secure_filename(f"profile_{current_user.id}_{int(datetime.utcnow().timestamp())}.{ext}")
+        filepath = upload_path(filename)
+        
+        file.save(filepath)
+        
+        current_user.profile_image = f"uploads/{filename}"
+        db.session.commit()
+        username_typeahead.update_user(current_user.id, profile_image=current_user.profile_image)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Profile image updated',
+            'image_url': url_for('static', filename=f"uploads/{filename}")
+        })
+    
+    except Exception as e:
+        print(f"Error uploading profile image: {e}")
+        return jsonify({'success': False, 'message': 'Error uploading file'}), 500
+
+@bp.route('/api/upload/banner-image', methods=['POST'])
+@login_required
+def upload_banner_image():
+    """Upload banner image for current user."""
+    if 'file' not in request.files:
+        return jsonify({'success': False, 'message': 'No file provided'}), 400
+    
+    file = request.files['file']
+    
+    if file.filename == '':
+        return jsonify({'success': False, 'message': 'No file selected'}), 400
+    
+    if not allowed_file(file.filename):
+        return jsonify({'success': False, 'message': 'Invalid file type. Allowed: png, jpg, jpeg, gif, webp'}), 400
+    
+    try:
+        ext = file.filename.rsplit('.', 1)[1].lower()
+        timestamp = int(datetime.utcnow().timestamp())
+        filename = secure_filename(f"banner_{current_user.id}_{timestamp}.{ext}")
+        
+        filepath = upload_path(filename)
+        file.save(filepath)
+        
+        current_user.banner_image = f"uploads/{filename}"
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'message': 'Banner image updated',
+            'image_url': url_for('static', filename=f"uploads/{filename}")
+        })
+    
+    except Exception as e:
+        print(f"Error uploading banner image: {e}")
+        return jsonify({'success': False, 'message': 'Error uploading file'}), 500
@@ -0,0 +1,93 @@
+"""
+Measures the cost of serializing post listings, per 1,000 posts.
+
+Compares the old path (a dict per post with strftime, encoded by the stdlib encoder
+with Flask's default settings) against the fragment path used by the API (cached
+per-post JSON bytes plus the viewer's counts, assembled by concatenation), with a
+cold and a warm fragment cache. Needs no database.
+
+Usage: python benchmark_serialization.py [--posts 1000] [--rounds 20]
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from fragments import PostFragmentCache
+from serializer import BACKEND, dumps
+
+def make_rows(count):
+    now = datetime.utcnow()
+    authors = [SimpleNamespace(id=i, username=f'user{i}', profile_image=None) for i in range(50)]
+    return [
+        (SimpleNamespace(id=i, user_id=authors[i % 50].id, timestamp=now - timedelta(minutes=i),
+                         content=f'Chirp number {i} about #benchmarks with @user{i % 50} and some more text to read'),
+         authors[i % 50])
+        for i in range(count)
+    ]
+
+def legacy_listing(rows, counts, reactions, viewer_id):
+    posts = []
+    for post, author in rows:
+        reacted = reactions[post.id]
+        posts.append({
+            'id': post.id,
+            'username': author.username,
+            'handle': '@' + author.username,
+            'content': post.content,
+            'time': post.timestamp.strftime('%b %d'),
+            'likes': counts[post.id]['likes'],
+            'retweets': counts[post.id]['retweets'],
+            'comments': counts[post.id]['comments'],
+            'isLiked': 'LIKE' in reacted,
+            'isRetweeted': 'RETWEET' in reacted,
+            'isBookmarked': 'BOOKMARK' in reacted,
+            'profile_image': author.profile_image or 'uploads/default-avatar.jpg',
+            'canDelete': post.user_id == viewer_id,
+        })
+    return json.dumps({'success': True, 'posts': posts}, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+def fragment_listing(cache, rows, counts, reactions, viewer_id):
+    posts = [cache.render(post, author, counts[post.id], reactions[post.id], viewer_id) for post, author in rows]
+    return dumps({'success': True, 'posts': posts})
+
+def best_of(rounds, run):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    rows = make_rows(args.posts)
+    counts = {post.id: {'likes': post.id * 3, 'retweets': post.id, 'comments': post.id % 7} for post, _ in rows}
+    reactions = {post.id: {'LIKE'} if post.id % 3 == 0 else set() for post, _ in rows}
+    scale = 1000 / args.posts * 1000  # seconds per listing -> ms per 1,000 posts
+
+    warm_cache = PostFragmentCache(capacity=args.posts)
+    fragment_listing(warm_cache, rows, counts, reactions, 1)
+
+    results = {
+        'legacy dicts + json': best_of(args.rounds, lambda: legacy_listing(rows, counts, reactions, 1)),
+        f'fragments + {BACKEND}, cold cache': best_of(
+            args.rounds, lambda: fragment_listing(PostFragmentCache(capacity=args.posts), rows, counts, reactions, 1)
+        ),
+        f'fragments + {BACKEND}, warm cache': best_of(
+            args.rounds, lambda: fragment_listing(warm_cache, rows, counts, reactions, 1)
+        ),
+    }
+
+    assert json.loads(fragment_listing(warm_cache, rows, counts, reactions, 1))['posts'][0]['likes'] == 0
+
+    print(f"Serialization backend: {BACKEND}")
+    for name, seconds in results.items():
+        print(f"{name:<36} {seconds * scale:8.3f} ms per 1,000 posts")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Measures cold start: a fresh interpreter importing app and running create_app(),
+which is what every `flask` command and a gunicorn master pays (forked gunicorn
+workers pay neither). Exits with status 1 when the median is over STARTUP_BUDGET_MS.
+
+Usage: python benchmark_startup.py [--runs 10]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from config import Config
+
+PROBE = """
+import time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+built = time.perf_counter()
+print(imported - started, built - imported)
+"""
+
+def measure():
+    output = subprocess.run([sys.executable, '-c', PROBE], capture_output=True, text=True, check=True).stdout
+    return [float(value) * 1000 for value in output.split()]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    measure()  # Warms the OS file cache and writes the .pyc files
+    runs = [measure() for _ in range(args.runs)]
+    import_ms = statistics.median(run[0] for run in runs)
+    create_ms = statistics.median(run[1] for run in runs)
+    total_ms = statistics.median(sum(run) for run in runs)
+
+    print(f"{'import app':<24} {import_ms:8.1f} ms")
+    print(f"{'create_app()':<24} {create_ms:8.1f} ms")
+    print(f"{'total (median)':<24} {total_ms:8.1f} ms  (budget {Config.STARTUP_BUDGET_MS} ms)")
+
+    if total_ms > Config.STARTUP_BUDGET_MS:
+        print("Over the startup budget.")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from models import db, User, PurgeJob
+from schema import upgrade_schema
+from stats import repair_user_stats
+from reactions import migrate_legacy_reactions
+from counters import reconcile_post_stats
+from notifications import compact_notifications
+from entities import backfill_post_index
+from trending import replay_trending
+from user_search import index_users, rebuild_user_search_index, backfill_lowered_usernames
+from purge import purge_worker
+from archive import archive_store
+from export import export_user
+from pagination import InvalidCursor
+from sync import compact_change_log
+
+@click.command('init-db')
+@with_appcontext
+def init_db():
+    """Create all tables and a dummy user."""
+    # create_all() skips tables that already exist, so this also adds any columns and indexes they are missing
+    for column in upgrade_schema():
+        print(f"Added column {column}.")
+    for table in archive_store.seed_id_sequences():
+        print(f"Moved the next {table} id past the archived ones.")
+    filled = backfill_lowered_usernames()
+    if filled:
+        print(f"Filled in lowercased usernames for {filled} users.")
+    
+    if User.query.filter_by(username='testuser').first() is None:
+        test_user = User(username='testuser', email='test@chirp.com')
+        test_user.set_password('password') 
+        db.session.add(test_user)
+        db.session.flush()
+        index_users([test_user])
+        db.session.commit()
+        print("Database initialized and 'testuser' created (password: 'password').")
+    else:
+        print("Database tables already exist.")
+
+@click.command('migrate-reactions')
+@click.option('--drop-legacy', is_flag=True, help='Drop the old reaction table after copying it.')
+@with_appcontext
+def migrate_reactions_command(drop_legacy):
+    """Copy reactions from the legacy one-row-per-type table into the bitflag table."""
+    upgrade_schema()
+    migrated = migrate_legacy_reactions(drop_legacy=drop_legacy)
+    if migrated is None:
+        print("No legacy reaction table found; nothing to migrate.")
+    else:
+        print(f"Migrated {migrated} (user, post) reaction rows.")
+
+@click.command('repair-user-stats')
+@with_appcontext
+def repair_user_stats_command():
+    """Recompute every user's profile statistics from the source tables."""
+    repaired = repair_user_stats()
+    print(f"Recomputed stats for {repaired} users.")
+
+@click.command('reconcile-counters')
+@click.option('--all', 'full', is_flag=True, help='Recompute every post, not just the ones left dirty.')
+@with_appcontext
+def reconcile_counters_command(full):
+    """Recompute post like/retweet counters that buffered writes may have left stale."""
+    # Posts with deltas buffered in the last minute are skipped even with --all: running
+    # workers may not have flushed them yet
+    reconciled = reconcile_post_stats(grace_seconds=60, full=full)
+    print(f"Reconciled counters for {reconciled} posts.")
+
+@click.command('compact-notifications')
+@click.option('--days', type=int, default=None, help='Delete read notifications older than this (default: NOTIFICATION_RETENTION_DAYS).')
+@click.option('--batch-size', type=int, default=1000, help='Rows deleted per transaction.')
+@with_appcontext
+def compact_notifications_command(days, batch_size):
+    """Delete read notifications past the retention period, in small batches."""
+    days = days if days is not None else current_app.config['NOTIFICATION_RETENTION_DAYS']
+    deleted = compact_notifications(days, batch_size=batch_size)
+    print(f"Deleted {deleted} read notifications older than {days} days.")
+
+@click.command('compact-change-log')
+@click.option('--days', type=int, default=None, help='Delete sync log entries older than this (default: CHANGE_LOG_RETENTION_DAYS).')
+@click.option('--batch-size', type=int, default=1000, help='Rows deleted per transaction.')
+@with_appcontext
+def compact_change_log_command(days, batch_size):
+    """Delete sync change log entries past the retention period, in small batches."""
+    days = days if days is not None else current_app.config['CHANGE_LOG_RETENTION_DAYS']
+    deleted = compact_change_log(days, batch_size=batch_size)
+    print(f"Deleted {deleted} change log entries older than {days} days.")
+
+@click.command('run-purge-jobs')
+@with_appcontext
+def run_purge_jobs_command():
+    """Run queued background deletions (e.g. of large posts) until none are left."""
+    jobs = purge_worker.run_pending()
+    print(f"Ran {jobs} purge jobs.")
+
+@click.command('purge-status')
+@with_appcontext
+def purge_status_command():
+    """Show background deletions that haven't finished, with their progress."""
+    jobs = PurgeJob.query.filter(PurgeJob.status != 'done').order_by(PurgeJob.id).all()
+    for job in jobs:
+        error = f", last error: {job.last_error}" if job.last_error else ""
+        print(f"#{job.id} {job.kind} {job.target_id}: {job.status}, {job.deleted_rows} rows deleted "
+              f"(queued {job.created_at:%Y-%m-%d %H:%M}){error}")
+    print(f"{len(jobs)} unfinished purge jobs.")
+
+@click.command('archive')
+@click.option('--older-than', 'days', type=int, default=None, help='Archive rows older than this many days (default: ARCHIVE_AFTER_DAYS).')
+@click.option('--batch-size', type=int, default=None, help='Rows moved per transaction.')
+@click.option('--vacuum', is_flag=True, help='VACUUM the main database afterwards to give the freed space back.')
+@with_appcontext
+def archive_command(days, batch_size, vacuum):
+    """Move old posts, messages and notifications into the yearly archive databases."""
+    days = days if days is not None else current_app.config['ARCHIVE_AFTER_DAYS']
+    # Archiving needs the id tables on AUTOINCREMENT (see archive.ID_TABLES)
+    upgrade_schema()
+    archive_store.seed_id_sequences()
+    moved = archive_store.archive_older_than(days, batch_size=batch_size)
+    print(f"Archived {moved['post']} posts, {moved['message']} messages and "
+          f"{moved['notification']} notifications older than {days} days into {archive_store.folder}.")
+    if vacuum:
+        with db.engine.connect() as connection:
+            connection.exec_driver_sql('VACUUM')
+        print("Vacuumed the main database.")
+
+@click.command('export-user')
+@click.argument('username')
+@click.option('--output', '-o', type=click.File('wb'), default='-', help='File to write to (default: stdout).')
+@click.option('--cursor', default=None, help='Resume after this cursor, the last line of an interrupted export.')
+@with_appcontext
+def export_user_command(username, output, cursor):
+    """Write a user's posts, comments, reactions, messages, follows and notifications as NDJSON."""
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.ClickException(f"No user named {username}.")
+    try:
+        chunks = export_user(user.id, cursor=cursor)
+    except InvalidCursor:
+        raise click.ClickException(f"Invalid cursor: {cursor}")
+    for chunk in chunks:
+        output.write(chunk)
+
+@click.command('backfill-post-index')
+@with_appcontext
+def backfill_post_index_command():
+    """Index mentions and hashtags of posts written before the index existed."""
+    indexed = backfill_post_index()
+    print(f"Indexed mentions and hashtags for {indexed} posts.")
+
+@click.command('replay-trending')
+@click.option('--hours', type=int, default=24, help='How much post history to replay.')
+@with_appcontext
+def replay_trending_command(hours):
+    """Rebuild the trending windows from recent posts' hashtags and snapshot them."""
+    replayed = replay_trending(hours)
+    print(f"Replayed {replayed} hashtags from the last {hours} hours.")
+
+@click.command('rebuild-user-search')
+@with_appcontext
+def rebuild_user_search_command():
+    """Rebuild the username trigram index used by user search."""
+    indexed = rebuild_user_search_index()
+    print(f"Indexed {indexed} usernames.")
+
+COMMANDS = (
+    init_db,
+    migrate_reactions_command,
+    repair_user_stats_command,
+    reconcile_counters_command,
+    compact_notifications_command,
+    compact_change_log_command,
+    run_purge_jobs_command,
+    purge_status_command,
+    archive_command,
+    export_user_command,
+    backfill_post_index_command,
+    replay_trending_command,
+    rebuild_user_search_command,
+)
+
+def init_app(app):
+    """Adds the maintenance commands to `flask`."""
+    for command in COMMANDS:
+        app.cli.add_command(command)
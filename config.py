@@ -0,0 +1,62 @@
+import json
+import os
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+
+ENV_PREFIX = 'CHIRP_'
+
+class Config:
+    """
+    Default settings. create_app() applies these, then any CHIRP_<NAME> environment
+    variables (see from_env), then the mapping passed to it.
+    """
+    SECRET_KEY = 'a_super_secret_key'
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///chirp.db'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    UPLOAD_FOLDER = os.path.join(basedir, 'static/uploads')
+    MAX_CONTENT_LENGTH = 5 * 1024 * 1024
+    NOTIFICATION_RETENTION_DAYS = 30
+    CHANGE_LOG_RETENTION_DAYS = 7
+    # Embed the first page of posts in the timeline, profile and bookmarks pages as inline JSON
+    SSR_FIRST_PAGE = True
+    # Posts with more reactions, comments and notifications than this are purged in the background
+    POST_DELETE_INLINE_LIMIT = 5000
+    # Overrides for ranking.TOP_TIMELINE_DEFAULTS (candidate bounds, decay and score weights)
+    TOP_TIMELINE = {}
+    # Overrides for ratelimit.RATE_LIMIT_DEFAULTS, e.g. {'post': {'user': '5/minute'}}.
+    # RATE_LIMIT_ENABLED = False turns off the limits and write shedding
+    RATE_LIMITS = {}
+    RATE_LIMIT_ENABLED = True
+    # Number of reverse proxies in front of the app that set X-Forwarded-For (0: none)
+    PROXY_FIX_X_FOR = 0
+    # Cold storage (see archive.py): `flask archive` moves rows older than ARCHIVE_AFTER_DAYS
+    # into yearly databases in ARCHIVE_FOLDER (instance/archive when unset)
+    ARCHIVE_AFTER_DAYS = 365
+    ARCHIVE_FOLDER = None
+    # Set by asgi.py: pages then tell the client to follow /api/events instead of polling
+    EVENT_STREAM = False
+    # Cold-start budget: importing app and building it. create_app() logs a warning
+    # when the first app in a process goes over it; benchmark_startup.py measures it
+    STARTUP_BUDGET_MS = 1000
+
+def from_env(environ=None):
+    """
+    Reads settings from CHIRP_<NAME> environment variables, e.g. CHIRP_SECRET_KEY or
+    CHIRP_PURGE_BATCH_SIZE=200. Values are parsed as JSON where they can be (numbers,
+    true/false, objects), so CHIRP_TOP_TIMELINE='{"half_life_hours": 6}' works; anything else
+    is kept as a string.
+    """
+    environ = os.environ if environ is None else environ
+    settings = {}
+    for key, value in environ.items():
+        if not key.startswith(ENV_PREFIX):
+            continue
+        name = key[len(ENV_PREFIX):]
+        if isinstance(getattr(Config, name, None), str):
+            settings[name] = value  # e.g. a numeric SECRET_KEY stays a string
+            continue
+        try:
+            settings[name] = json.loads(value)
+        except ValueError:
+            settings[name] = value
+    return settings
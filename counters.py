@@ -0,0 +1,378 @@
+import atexit
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import event, update, bindparam, or_, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, PostStats, Comment
+from reactions import get_reaction_counts
+
+# PostStats column fed by each reaction type
+COUNT_FIELDS = {'LIKE': 'like_count', 'RETWEET': 'retweet_count'}
+
+class _Shard:
+    """One lock-protected slice of the buffer, holding the posts whose id maps to it."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.deltas = {}            # post_id -> Counter of {field: delta} not yet flushed
+        self.hits = Counter()       # post_id -> reactions seen in the current hot window
+        self.hot_until = {}         # post_id -> monotonic time until which the post is buffered
+
+class CounterBuffer:
+    """
+    Per-process write-behind buffer for like/retweet counts on hot posts.
+
+    A post becomes hot once it sees hot_threshold reactions within hot_window seconds
+    in this process. Deltas for hot posts are summed in memory and written to
+    post_stats every flush_interval seconds, or sooner once flush_threshold deltas are
+    pending, by a background thread. Reads add the pending deltas on top of the stored
+    counts, so this worker's counts are live and other workers see them one flush later.
+    The buffer is split into shards so concurrent requests on different posts
+    don't contend on one lock.
+    """
+
+    def __init__(self, shards=16, flush_interval=2.0, flush_threshold=500,
+                 hot_threshold=20, hot_window=10.0, reconcile_interval=60.0):
+        self.shards = [_Shard() for _ in range(shards)]
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.hot_threshold = hot_threshold
+        self.hot_window = hot_window
+        self.reconcile_interval = reconcile_interval
+
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._window_started = time.monotonic()
+        self._wakeup = threading.Event()
+        self._flusher = None
+        self._flusher_pid = None
+        self._app = None
+
+    def init_app(self, app):
+        """Reads COUNTER_* settings from the app config and registers the transaction hooks."""
+        self._app = app
+        self.flush_interval = app.config.get('COUNTER_FLUSH_INTERVAL', self.flush_interval)
+        self.flush_threshold = app.config.get('COUNTER_FLUSH_THRESHOLD', self.flush_threshold)
+        self.hot_threshold = app.config.get('COUNTER_HOT_THRESHOLD', self.hot_threshold)
+        self.hot_window = app.config.get('COUNTER_HOT_WINDOW', self.hot_window)
+        self.reconcile_interval = app.config.get('COUNTER_RECONCILE_INTERVAL', self.reconcile_interval)
+
+        # db.session is shared by every app, so the hooks are registered once per process
+        if not event.contains(db.session, 'after_commit', self._after_commit):
+            event.listen(db.session, 'after_commit', self._after_commit)
+            event.listen(db.session, 'after_rollback', self._after_rollback)
+
+    def _shard(self, post_id):
+        return self.shards[post_id % len(self.shards)]
+
+    def observe(self, post_id):
+        """Records one reaction on a post and returns True if the post is (now) hot."""
+        now = time.monotonic()
+        if now - self._window_started > self.hot_window:
+            # Start a new window; a racing reset here only costs a few hits
+            self._window_started = now
+            for shard in self.shards:
+                with shard.lock:
+                    shard.hits.clear()
+                    shard.hot_until = {pid: until for pid, until in shard.hot_until.items() if until > now}
+
+        shard = self._shard(post_id)
+        with shard.lock:
+            if shard.hot_until.get(post_id, 0) > now:
+                shard.hot_until[post_id] = now + self.hot_window
+                return True
+
+            shard.hits[post_id] += 1
+            if shard.hits[post_id] >= self.hot_threshold:
+                shard.hot_until[post_id] = now + self.hot_window
+                return True
+
+        return False
+
+    def add(self, post_id, field, delta):
+        """Buffers a committed count delta for a hot post."""
+        shard = self._shard(post_id)
+        with shard.lock:
+            shard.deltas.setdefault(post_id, Counter())[field] += delta
+
+        with self._pending_lock:
+            self._pending += 1
+            pending = self._pending
+
+        self._ensure_flusher()
+        if pending >= self.flush_threshold:
+            self._wakeup.set()
+
+    def pending(self, post_ids):
+        """Returns {post_id: Counter of unflushed deltas} for the given posts."""
+        result = {}
+        for post_id in post_ids:
+            shard = self._shard(post_id)
+            with shard.lock:
+                deltas = shard.deltas.get(post_id)
+                if deltas:
+                    result[post_id] = Counter(deltas)
+        return result
+
+    def discard(self, post_id):
+        """Drops everything buffered for a post (e.g. once it has been deleted)."""
+        shard = self._shard(post_id)
+        with shard.lock:
+            shard.deltas.pop(post_id, None)
+            shard.hits.pop(post_id, None)
+            shard.hot_until.pop(post_id, None)
+
+    def _drain(self):
+        drained = {}
+        for shard in self.shards:
+            with shard.lock:
+                deltas, shard.deltas = shard.deltas, {}
+            drained.update(deltas)
+
+        with self._pending_lock:
+            self._pending = 0
+        return drained
+
+    def flush(self):
+        """
+        Writes all buffered deltas to post_stats in one transaction. Must run inside an app context.
+        On failure the deltas are put back so the next flush retries them.
+        """
+        drained = self._drain()
+        rows = [
+            {
+                'target_id': post_id,
+                'like_delta': deltas.get('like_count', 0),
+                'retweet_delta': deltas.get('retweet_count', 0),
+            }
+            for post_id, deltas in drained.items()
+            if any(deltas.values())
+        ]
+        if not rows:
+            return 0
+
+        try:
+            db.session.connection().execute(
+                update(PostStats)
+                .where(PostStats.post_id == bindparam('target_id'))
+                .values(
+                    like_count=PostStats.like_count + bindparam('like_delta'),
+                    retweet_count=PostStats.retweet_count + bindparam('retweet_delta'),
+                    dirty=True,
+                    flushed_at=datetime.utcnow(),
+                ),
+                rows
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            for post_id, deltas in drained.items():
+                for field, delta in deltas.items():
+                    self.add(post_id, field, delta)
+            raise
+
+        return len(rows)
+
+    def _ensure_flusher(self):
+        # Started lazily so each forked worker gets its own thread
+        if self._flusher_pid == os.getpid() or self._app is None:
+            return
+
+        self._flusher_pid = os.getpid()
+        self._flusher = threading.Thread(target=self._run_flusher, name='counter-flusher', daemon=True)
+        self._flusher.start()
+        atexit.register(self._flush_at_exit)
+
+    def _run_flusher(self):
+        last_reconcile = time.monotonic()
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+
+            with self._app.app_context():
+                try:
+                    self.flush()
+                    if time.monotonic() - last_reconcile >= self.reconcile_interval:
+                        last_reconcile = time.monotonic()
+                        reconcile_post_stats(grace_seconds=self.flush_interval * 5)
+                except Exception as e:
+                    print(f"Error flushing post counters: {e}")
+                finally:
+                    db.session.remove()
+
+    def _flush_at_exit(self):
+        with self._app.app_context():
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing post counters at exit: {e}")
+
+    # Deltas recorded inside a transaction only reach the buffer once it commits
+
+    def _after_commit(self, session):
+        for post_id, field, delta in session.info.pop('buffered_counts', ()):
+            self.add(post_id, field, delta)
+
+    def _after_rollback(self, session):
+        session.info.pop('buffered_counts', None)
+
+counter_buffer = CounterBuffer()
+
+def compute_post_stats(post_ids):
+    """
+    Recomputes the counters for the given posts from post_reaction and comment.
+    Returns {post_id: {'like_count': n, 'retweet_count': n, 'comment_count': n}}.
+    """
+    stats = {
+        post_id: {'like_count': counts['likes'], 'retweet_count': counts['retweets'], 'comment_count': 0}
+        for post_id, counts in get_reaction_counts(post_ids).items()
+    }
+    if not stats:
+        return stats
+
+    comment_rows = db.session.query(Comment.post_id, func.count(Comment.id))\
+        .filter(Comment.post_id.in_(post_ids))\
+        .group_by(Comment.post_id)
+
+    for post_id, count in comment_rows:
+        stats[post_id]['comment_count'] = count
+
+    return stats
+
+def record_count_change(post_id, reaction_type, delta):
+    """
+    Accounts for one reaction being set (+1) or cleared (-1) on a post, in the current transaction.
+    Cold posts have post_stats updated right away; hot posts have the delta buffered
+    once the transaction commits. Types without a count (BOOKMARK) are ignored.
+    """
+    field = COUNT_FIELDS.get(reaction_type)
+    if field is None:
+        return
+
+    if counter_buffer.observe(post_id):
+        # Mark the row and when its deltas were buffered before they reach the buffer, so a
+        # crash can't lose track of it and reconciliation waits for them to be flushed.
+        # buffered_at is only refreshed once per flush interval, so hot rows stay unwritten.
+        now = datetime.utcnow()
+        updated = PostStats.query.filter(
+            PostStats.post_id == post_id,
+            or_(
+                PostStats.dirty.is_(False),
+                PostStats.buffered_at.is_(None),
+                PostStats.buffered_at < now - timedelta(seconds=counter_buffer.flush_interval)
+            )
+        ).update({'dirty': True, 'buffered_at': now}, synchronize_session=False)
+        if updated or db.session.get(PostStats, post_id) is not None:
+            db.session.info.setdefault('buffered_counts', []).append((post_id, field, delta))
+            return
+
+    column = getattr(PostStats, field)
+    updated = PostStats.query.filter_by(post_id=post_id).update(
+        {column: column + delta}, synchronize_session=False
+    )
+
+    if not updated:
+        # No row yet: build it from the source tables, which already include this change
+        db.session.flush()
+        db.session.add(PostStats(post_id=post_id, **compute_post_stats([post_id])[post_id]))
+
+def record_comment_change(post_id, delta):
+    """
+    Adjusts a post's comment counter in the current transaction; the caller commits.
+    Comments are written through rather than buffered. A NULL counter (rows created
+    before the column existed) stays NULL until get_live_counts backfills it.
+    """
+    updated = PostStats.query.filter_by(post_id=post_id).update(
+        {PostStats.comment_count: PostStats.comment_count + delta}, synchronize_session=False
+    )
+
+    if not updated:
+        db.session.flush()
+        db.session.add(PostStats(post_id=post_id, **compute_post_stats([post_id])[post_id]))
+
+def get_live_counts(post_ids):
+    """
+    Returns {post_id: {'likes': n, 'retweets': n, 'comments': n}}: the stored counts plus
+    this worker's unflushed deltas. Posts without a post_stats row yet get one built from
+    the source tables, and rows missing their comment count get it filled in. Concurrent
+    reads may backfill the same post: whichever inserts second leaves the row as it is.
+    """
+    counts = {}
+    unknown_comments = []
+    stored = PostStats.query.filter(PostStats.post_id.in_(post_ids)).all() if post_ids else []
+    for stats in stored:
+        counts[stats.post_id] = {'likes': stats.like_count, 'retweets': stats.retweet_count,
+                                 'comments': stats.comment_count}
+        if stats.comment_count is None:
+            unknown_comments.append(stats.post_id)
+
+    missing = [post_id for post_id in post_ids if post_id not in counts]
+    if missing or unknown_comments:
+        computed = compute_post_stats(missing + unknown_comments)
+        if missing:
+            db.session.execute(sqlite_insert(PostStats).on_conflict_do_nothing(), [
+                {'post_id': post_id, **computed[post_id]} for post_id in missing
+            ])
+        for post_id in missing:
+            counts[post_id] = {'likes': computed[post_id]['like_count'],
+                               'retweets': computed[post_id]['retweet_count'],
+                               'comments': computed[post_id]['comment_count']}
+        for post_id in unknown_comments:
+            # Only the comment count: the reaction counts may have buffered deltas in flight
+            PostStats.query.filter_by(post_id=post_id).update(
+                {'comment_count': computed[post_id]['comment_count']}, synchronize_session=False
+            )
+            counts[post_id]['comments'] = computed[post_id]['comment_count']
+        db.session.commit()
+
+    for post_id, deltas in counter_buffer.pending(post_ids).items():
+        counts[post_id]['likes'] += deltas.get('like_count', 0)
+        counts[post_id]['retweets'] += deltas.get('retweet_count', 0)
+
+    return counts
+
+def reconcile_post_stats(grace_seconds=10, full=False, batch_size=500):
+    """
+    Recomputes post_stats counts from the source tables. By default only dirty rows that no
+    worker has flushed for grace_seconds are touched: those are the posts whose buffered
+    deltas may have been lost in a crash. full=True recomputes every row.
+
+    Either way, rows with a delta buffered in the last grace_seconds are skipped: the
+    source tables already include those reactions, so recomputing before the delta is
+    flushed would count it twice. grace_seconds should therefore be a few flush
+    intervals. A row whose buffered_at changes between reading it and recomputing it
+    is left for the next run. Returns the number of rows reconciled.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+    reconciled = 0
+    last_id = 0
+
+    while True:
+        query = db.session.query(PostStats.post_id, PostStats.buffered_at).filter(
+            PostStats.post_id > last_id,
+            or_(PostStats.buffered_at.is_(None), PostStats.buffered_at < cutoff)
+        )
+        if not full:
+            query = query.filter(
+                PostStats.dirty.is_(True),
+                or_(PostStats.flushed_at.is_(None), PostStats.flushed_at < cutoff)
+            )
+
+        rows = query.order_by(PostStats.post_id).limit(batch_size).all()
+        if not rows:
+            break
+
+        buffered_at = dict(rows)
+        for post_id, values in compute_post_stats(list(buffered_at)).items():
+            reconciled += PostStats.query.filter(
+                PostStats.post_id == post_id,
+                PostStats.buffered_at.is_not_distinct_from(buffered_at[post_id])
+            ).update(dict(values, dirty=False), synchronize_session=False)
+        db.session.commit()
+
+        last_id = rows[-1].post_id
+
+    return reconciled
@@ -0,0 +1,99 @@
+import re
+from sqlalchemy import insert, delete, exists, or_
+from models import db, User, Post, PostMention, PostHashtag
+
+MENTION_PATTERN = re.compile(r'@(\w+)')
+HASHTAG_PATTERN = re.compile(r'#(\w+)')
+
+# Longer tags are still matched, but only this much of them is stored
+MAX_TAG_LENGTH = 100
+
+def extract_mentions(content):
+    """Returns the distinct usernames @mentioned in content, in order of appearance."""
+    return list(dict.fromkeys(MENTION_PATTERN.findall(content)))
+
+def extract_hashtags(content):
+    """Returns the distinct #tags in content, lowercased and without the '#', in order of appearance."""
+    return list(dict.fromkeys(tag.lower()[:MAX_TAG_LENGTH] for tag in HASHTAG_PATTERN.findall(content)))
+
+def normalize_tag(tag):
+    """Turns a tag as typed in a URL or search box ('#Chirp', 'chirp') into its stored form."""
+    return tag.lstrip('#').lower()[:MAX_TAG_LENGTH]
+
+def index_posts(posts):
+    """
+    Records the mentions and hashtags in the posts' content in the current transaction;
+    the caller commits. Posts must already be flushed so they have an id and timestamp.
+    Every mentioned username across the batch is resolved with one query.
+    Returns {post_id: [(user_id, username), ...]} of the users each post mentions.
+    """
+    usernames_by_post = {post.id: extract_mentions(post.content) for post in posts}
+    all_usernames = {username for usernames in usernames_by_post.values() for username in usernames}
+
+    user_ids = {}
+    if all_usernames:
+        user_ids = dict(db.session.query(User.username, User.id).filter(User.username.in_(all_usernames)))
+
+    mentioned = {
+        post_id: [(user_ids[username], username) for username in usernames if username in user_ids]
+        for post_id, usernames in usernames_by_post.items()
+    }
+
+    timestamps = {post.id: post.timestamp for post in posts}
+    mention_rows = [
+        {'post_id': post_id, 'user_id': user_id, 'timestamp': timestamps[post_id]}
+        for post_id, users in mentioned.items()
+        for user_id, _ in users
+    ]
+    hashtag_rows = [
+        {'tag': tag, 'post_id': post.id, 'timestamp': post.timestamp}
+        for post in posts
+        for tag in extract_hashtags(post.content)
+    ]
+
+    if mention_rows:
+        db.session.execute(insert(PostMention), mention_rows)
+    if hashtag_rows:
+        db.session.execute(insert(PostHashtag), hashtag_rows)
+
+    return mentioned
+
+def unindex_posts(post_ids):
+    """Removes the mention and hashtag rows of the given posts in the current transaction."""
+    db.session.execute(delete(PostMention).where(PostMention.post_id.in_(post_ids)))
+    db.session.execute(delete(PostHashtag).where(PostHashtag.post_id.in_(post_ids)))
+
+def backfill_post_index(batch_size=500):
+    """
+    Indexes mentions and hashtags for posts that were written before the index existed,
+    batch_size posts per transaction. Posts that already have rows are skipped, so it is
+    safe to re-run. Returns the number of posts indexed.
+    """
+    indexed = 0
+    last_id = 0
+
+    is_indexed = or_(
+        exists().where(PostMention.post_id == Post.id),
+        exists().where(PostHashtag.post_id == Post.id)
+    )
+
+    while True:
+        posts = Post.query\
+            .filter(Post.id > last_id)\
+            .order_by(Post.id)\
+            .limit(batch_size)\
+            .all()
+        if not posts:
+            break
+
+        last_id = posts[-1].id
+        done = {post_id for (post_id,) in db.session.query(Post.id)
+                .filter(Post.id.in_([post.id for post in posts]), is_indexed)}
+
+        pending = [post for post in posts if post.id not in done]
+        index_posts(pending)
+        db.session.commit()
+
+        indexed += len(pending)
+
+    return indexed
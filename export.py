@@ -0,0 +1,206 @@
+from sqlalchemy import select
+from models import db, User
+from reactions import types_from_flags
+from pagination import InvalidCursor
+from serializer import dumps
+from archive import archive_store
+
+# Rows read per round trip (SQLAlchemy's yield_per), and per query: after each window the
+# read transaction ends, so a slow download never holds SQLite's shared lock for long
+EXPORT_BATCH_SIZE = 500
+EXPORT_WINDOW = 5000
+
+def _tables(schema):
+    """Looks up archived tables in `schema`, or the hot tables when it is None."""
+    if schema is None:
+        return lambda name: db.metadata.tables[name]
+    return lambda name: archive_store.table(schema, name)
+
+def _posts(tables, user_id):
+    posts = tables('post')
+    return posts.c.id, select(posts.c.id, posts.c.content, posts.c.timestamp).where(posts.c.user_id == user_id)
+
+def _comments(tables, user_id):
+    comments = tables('comment')
+    return comments.c.id, select(
+        comments.c.id, comments.c.post_id, comments.c.parent_id, comments.c.content, comments.c.timestamp
+    ).where(comments.c.user_id == user_id)
+
+def _reactions(tables, user_id):
+    reactions = tables('post_reaction')
+    return reactions.c.post_id, select(
+        reactions.c.post_id, reactions.c.flags,
+        reactions.c.liked_at, reactions.c.retweeted_at, reactions.c.bookmarked_at
+    ).where(reactions.c.user_id == user_id)
+
+def _messages(direction):
+    # Sent and received messages are read separately, each along its own index
+    own, other = ('sender_id', 'recipient_id') if direction == 'sent' else ('recipient_id', 'sender_id')
+
+    def statement(tables, user_id):
+        messages, partner = tables('message'), User.__table__
+        return messages.c.id, select(
+            messages.c.id, messages.c[other].label('partner_id'), partner.c.username.label('partner_username'),
+            messages.c.content, messages.c.timestamp, messages.c.is_read
+        ).outerjoin(partner, partner.c.id == messages.c[other]).where(messages.c[own] == user_id)
+    return statement
+
+def _follows(direction):
+    own, other = ('follower_id', 'followed_id') if direction == 'following' else ('followed_id', 'follower_id')
+
+    def statement(tables, user_id):
+        follows, partner = tables('follows'), User.__table__
+        return follows.c.id, select(
+            follows.c.id, follows.c[other].label('user_id'), partner.c.username, follows.c.timestamp
+        ).outerjoin(partner, partner.c.id == follows.c[other]).where(follows.c[own] == user_id)
+    return statement
+
+def _notifications(tables, user_id):
+    notifications, actor = tables('notification'), User.__table__
+    return notifications.c.id, select(
+        notifications.c.id, notifications.c.type, notifications.c.post_id, notifications.c.actor_id,
+        actor.c.username.label('actor_username'), notifications.c.group_count,
+        notifications.c.is_read, notifications.c.timestamp
+    ).outerjoin(actor, actor.c.id == notifications.c.actor_id).where(notifications.c.user_id == user_id)
+
+def _post(row):
+    return {'id': row.id, 'content': row.content, 'timestamp': row.timestamp}
+
+def _comment(row):
+    return {'id': row.id, 'post_id': row.post_id, 'parent_id': row.parent_id,
+            'content': row.content, 'timestamp': row.timestamp}
+
+def _reaction(row):
+    return {'post_id': row.post_id, 'types': sorted(types_from_flags(row.flags)), 'liked_at': row.liked_at,
+            'retweeted_at': row.retweeted_at, 'bookmarked_at': row.bookmarked_at}
+
+def _message(direction):
+    def record(row):
+        return {'id': row.id, 'direction': direction, 'partner_id': row.partner_id,
+                'partner_username': row.partner_username, 'content': row.content,
+                'timestamp': row.timestamp, 'is_read': row.is_read}
+    return record
+
+def _follow(direction):
+    def record(row):
+        return {'id': row.id, 'direction': direction, 'user_id': row.user_id,
+                'username': row.username, 'timestamp': row.timestamp}
+    return record
+
+def _notification(row):
+    return {'id': row.id, 'type': row.type, 'post_id': row.post_id, 'actor_id': row.actor_id,
+            'actor_username': row.actor_username, 'group_count': row.group_count or 1,
+            'is_read': row.is_read, 'timestamp': row.timestamp}
+
+# The export walks these parts in order: (name, record type, statement, record, also in the archives)
+EXPORT_PARTS = (
+    ('posts', 'post', _posts, _post, True),
+    ('comments', 'comment', _comments, _comment, True),
+    ('reactions', 'reaction', _reactions, _reaction, True),
+    ('messages_sent', 'message', _messages('sent'), _message('sent'), True),
+    ('messages_received', 'message', _messages('received'), _message('received'), True),
+    ('following', 'follow', _follows('following'), _follow('following'), False),
+    ('followers', 'follow', _follows('followers'), _follow('followers'), False),
+    ('notifications', 'notification', _notifications, _notification, True),
+)
+PART_NAMES = [part[0] for part in EXPORT_PARTS]
+
+def encode_export_cursor(part, source, key):
+    """Encodes an export position: the part, its source ('hot' or an archive's year) and the last key read."""
+    return f"{part}.{source}.{key}"
+
+def decode_export_cursor(cursor):
+    """Decodes a cursor made by encode_export_cursor into (part, source, key)."""
+    try:
+        part, source, key = cursor.split('.')
+        if part not in PART_NAMES:
+            raise ValueError(part)
+        return part, (source if source == 'hot' else int(source)), int(key)
+    except (AttributeError, ValueError):
+        raise InvalidCursor(cursor)
+
+def _read_window(connection, schema, statement, user_id, after, limit, batch_size):
+    """
+    Yields up to `limit` rows of the part `statement` builds, with keys greater than
+    `after`, in key order, in lists of at most batch_size rows (read with yield_per).
+    """
+    key, query = statement(_tables(schema), user_id)
+    if after is not None:
+        query = query.where(key > after)
+    query = query.add_columns(key.label('export_key')).order_by(key).limit(limit)
+    result = connection.execute(query, execution_options={'yield_per': batch_size})
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
+
+def _read_part(statement, user_id, year, after, batch_size, window):
+    """
+    Yields every row of a part from the hot database (year None) or one archive after
+    key `after`, in lists of at most batch_size rows, one window's query at a time.
+    """
+    while True:
+        read = 0
+        if year is None:
+            try:
+                for rows in _read_window(db.session, None, statement, user_id, after, window, batch_size):
+                    read += len(rows)
+                    after = rows[-1].export_key
+                    yield rows
+            finally:
+                db.session.close()
+        else:
+            with archive_store.reading(year) as (connection, schema):
+                if schema is None:
+                    return
+                for rows in _read_window(connection, schema, statement, user_id, after, window, batch_size):
+                    read += len(rows)
+                    after = rows[-1].export_key
+                    yield rows
+        if read < window:
+            return
+
+def export_user(user_id, cursor=None, batch_size=None, window=None):
+    """
+    Streams a user's posts, comments, reactions, messages, follows and notifications
+    as NDJSON, archived rows included. Returns a generator of bytes, one chunk of up
+    to batch_size lines at a time; memory use doesn't depend on the size of the account.
+
+    Each line is {"type", "cursor", "data"}, and the last is {"type": "end", "count"}.
+    Passing the cursor of the last line received resumes the export after it. Each part
+    is read from the hot database first and then from the archives oldest first, so a
+    row archived while an export is running may show up twice (with the same id).
+    Raises InvalidCursor for a malformed cursor, before anything is streamed.
+    """
+    start = decode_export_cursor(cursor) if cursor else None
+    return _export(user_id, start, batch_size or EXPORT_BATCH_SIZE, window or EXPORT_WINDOW)
+
+def _export(user_id, start, batch_size, window):
+    years = archive_store.years()
+    count = 0
+
+    for index, (part, record_type, statement, record, archived) in enumerate(EXPORT_PARTS):
+        for source in ['hot'] + (years if archived else []):
+            after = None
+            if start is not None:
+                # Sources sort as hot first, then by year
+                position = (index, -1 if source == 'hot' else source)
+                resume = (PART_NAMES.index(start[0]), -1 if start[1] == 'hot' else start[1])
+                if position < resume:
+                    continue
+                if position == resume:
+                    after = start[2]
+
+            year = None if source == 'hot' else source
+            for rows in _read_part(statement, user_id, year, after, batch_size, window):
+                yield b''.join(
+                    dumps({
+                        'type': record_type,
+                        'cursor': encode_export_cursor(part, source, row.export_key),
+                        'data': record(row),
+                    }) + b'\n'
+                    for row in rows
+                )
+                count += len(rows)
+
+    yield dumps({'type': 'end', 'count': count}) + b'\n'
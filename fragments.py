@@ -0,0 +1,72 @@
+import threading
+from collections import OrderedDict
+from serializer import RawJSON, dumps, utc_isoformat
+
+DEFAULT_AVATAR = 'uploads/default-avatar.jpg'
+
+class PostFragmentCache:
+    """
+    Per-process LRU of the viewer-independent part of each serialized post (author,
+    content and timestamp), kept as encoded JSON bytes. A post is rendered by appending
+    the viewer's counts and reaction state to its cached prefix, so list responses are
+    assembled by concatenation. Posts are never edited, so an entry only goes stale
+    when the post is deleted (discard) or its author changes their avatar, which is
+    caught by keeping the avatar alongside the fragment.
+    """
+
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()    # post_id -> (profile_image, JSON object bytes without the closing brace)
+
+    def init_app(self, app):
+        """Reads POST_FRAGMENT_CACHE_SIZE from the app config."""
+        self.capacity = app.config.get('POST_FRAGMENT_CACHE_SIZE', self.capacity)
+
+    def prefix(self, post, author):
+        """Returns the cached, unterminated JSON object for (post, author), encoding it on a miss."""
+        with self.lock:
+            entry = self.entries.get(post.id)
+            if entry is not None and entry[0] == author.profile_image:
+                self.entries.move_to_end(post.id)
+                return entry[1]
+
+        prefix = dumps({
+            'id': post.id,
+            'username': author.username,
+            'handle': '@' + author.username,
+            'content': post.content,
+            'timestamp': utc_isoformat(post.timestamp),
+            'profile_image': author.profile_image or DEFAULT_AVATAR,
+        })[:-1]
+
+        with self.lock:
+            self.entries[post.id] = (author.profile_image, prefix)
+            self.entries.move_to_end(post.id)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+        return prefix
+
+    def render(self, post, author, counts, reacted, viewer_id):
+        """
+        Returns the post as RawJSON for viewer_id, given its {'likes', 'retweets', 'comments'}
+        counts and the set of reaction types the viewer has on it.
+        """
+        return RawJSON(self.prefix(post, author) + (
+            ',"likes":%d,"retweets":%d,"comments":%d,"isLiked":%s,"isRetweeted":%s,"isBookmarked":%s,"canDelete":%s}' % (
+                counts['likes'], counts['retweets'], counts['comments'],
+                _json_bool('LIKE' in reacted), _json_bool('RETWEET' in reacted),
+                _json_bool('BOOKMARK' in reacted), _json_bool(post.user_id == viewer_id),
+            )
+        ).encode('ascii'))
+
+    def discard(self, post_ids):
+        with self.lock:
+            for post_id in post_ids:
+                self.entries.pop(post_id, None)
+
+def _json_bool(value):
+    return 'true' if value else 'false'
+
+post_fragments = PostFragmentCache()
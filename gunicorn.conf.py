@@ -0,0 +1,37 @@
+"""
+Gunicorn settings for Chirp: gunicorn -c gunicorn.conf.py
+
+The app is built once in the master (preload_app) and shared by the forked workers
+copy-on-write, so workers start in milliseconds and the imported code and module
+data is stored once. CHIRP_BIND, CHIRP_WORKERS and CHIRP_THREADS override the
+defaults below; app settings come from CHIRP_* variables as usual (see config.py).
+"""
+import gc
+import multiprocessing
+import os
+
+wsgi_app = 'app:create_app()'
+bind = os.environ.get('CHIRP_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('CHIRP_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('CHIRP_THREADS', 1))
+preload_app = True
+timeout = 30
+
+# Recycling is cheap with a preloaded master, and it bounds any slow growth in a worker
+max_requests = 2000
+max_requests_jitter = 200
+
+def when_ready(server):
+    # Everything allocated so far (modules, the app) is moved out of the collector's
+    # reach, so collections in the workers don't write to those pages and un-share them
+    gc.collect()
+    gc.freeze()
+
+def post_fork(server, worker):
+    from models import db
+
+    # A connection pool must not be shared across processes: drop any inherited
+    # connections (without closing them, which would close the master's) so each
+    # worker opens its own
+    with server.app.wsgi().app_context():
+        db.engine.dispose(close=False)
@@ -0,0 +1,189 @@
+from flask import Blueprint, render_template, redirect, url_for, request, jsonify
+from flask_login import current_user, login_required
+from sqlalchemy import or_
+from models import db, User, Message
+from auth import find_active_user
+from ratelimit import rate_limiter
+from archive import archive_store
+from pagination import get_page_size, encode_cursor, get_cursor, fetch_page, keyset_before
+
+bp = Blueprint('messaging', __name__)
+
+# --- Direct Messages ---
+
+@bp.route('/messages', defaults={'partner_username': None})
+@bp.route('/messages/<partner_username>')
+@login_required
+def chat_view(partner_username):
+    """
+    Renders the Direct Messages page.
+    If partner_username is provided (e.g., /messages/alice), it tells the Jinja template 
+    to load that specific chat history immediately.
+    """
+    
+    if partner_username:
+        partner = find_active_user(partner_username)
+        if not partner:
+            return redirect(url_for('pages.messages', partner_username=None))
+    
+    return render_template(
+        'messages.html', 
+        active_page='messages', 
+        partner_username=partner_username 
+    )
+
+@bp.route('/api/messages/conversations', methods=['GET'])
+@login_required
+def get_conversations():
+    """
+    Fetches a list of users the current user has exchanged messages with (their 'inbox').
+    This is complex as it requires finding unique partners and the last message time.
+    """
+    partner_ids_sent = db.session.query(Message.recipient_id).filter(Message.sender_id == current_user.id)
+    partner_ids_received = db.session.query(Message.sender_id).filter(Message.recipient_id == current_user.id)
+    
+    partner_ids_subquery = partner_ids_sent.union(partner_ids_received).distinct().subquery()
+    
+    partners = User.query.filter(User.id.in_(partner_ids_subquery)).all()
+    
+    conversations = []
+    
+    for partner in partners:
+        last_message = Message.query.filter(
+            or_(
+                (Message.sender_id == current_user.id) & (Message.recipient_id == partner.id),
+                (Message.sender_id == partner.id) & (Message.recipient_id == current_user.id)
+            )
+        ).order_by(Message.timestamp.desc()).first()
+        
+        unread_count = Message.query.filter_by(
+            sender_id=partner.id, 
+            recipient_id=current_user.id, 
+            is_read=False
+        ).count()
+
+        if last_message:
+            conversations.append({
+                'partner_username': partner.username,
+                'partner_id': partner.id,
+                'last_message_content': last_message.content,
+                'last_message_time': last_message.timestamp.isoformat(),
+                'unread_count': unread_count,
+                'profile_image': partner.profile_image or 'uploads/default-avatar.jpg',
+            })
+
+    conversations.sort(key=lambda x: x['last_message_time'], reverse=True)
+    
+    return jsonify({'success': True, 'conversations': conversations})
+
+@bp.route('/api/messages/<partner_username>', methods=['GET'])
+@login_required
+def get_messages(partner_username):
+    """
+    Loads the history of messages between the current user and a specific partner, oldest first.
+    Returns every message still in the main database; when older ones have been archived,
+    pass the returned 'next_cursor' as ?before= to page back through them.
+    """
+    partner = find_active_user(partner_username)
+    
+    if not partner:
+        return jsonify({'success': False, 'message': 'Partner not found.'}), 404
+
+    query = Message.query.filter(
+        or_(
+            (Message.sender_id == current_user.id) & (Message.recipient_id == partner.id),
+            (Message.sender_id == partner.id) & (Message.recipient_id == current_user.id)
+        )
+    )
+    # How archive.py files a conversation
+    owner_id, peer_id = sorted((current_user.id, partner.id))
+    before = get_cursor('before')
+    
+    if before is None:
+        messages = query.order_by(Message.timestamp.desc(), Message.id.desc()).all()
+        next_cursor = None
+        if archive_store.has_rows('message', owner_id, peer_id):
+            if messages:
+                next_cursor = encode_cursor(messages[-1].timestamp, messages[-1].id)
+            else:
+                messages, next_cursor = archive_store.extend_page(
+                    'message', [], None, None, get_page_size(), owner_id, peer_id
+                )
+    else:
+        limit = get_page_size()
+        messages, next_cursor = fetch_page(
+            query.filter(keyset_before(Message.timestamp, Message.id, before))
+                .order_by(Message.timestamp.desc(), Message.id.desc()),
+            limit,
+            lambda msg: (msg.timestamp, msg.id)
+        )
+        messages, next_cursor = archive_store.extend_page(
+            'message', messages, next_cursor, before, limit, owner_id, peer_id
+        )
+    messages.reverse()
+    
+    Message.query.filter_by(
+        sender_id=partner.id, 
+        recipient_id=current_user.id, 
+        is_read=False
+    ).update({'is_read': True}, synchronize_session='fetch')
+    db.session.commit()
+    
+    messages_list = [
+        {
+            'id': msg.id,
+            'content': msg.content,
+            'timestamp': msg.timestamp.isoformat(),
+            'is_read': msg.is_read,
+            'is_outgoing': msg.sender_id == current_user.id,
+            'sender_username': current_user.username if msg.sender_id == current_user.id else partner.username,
+        }
+        for msg in messages
+    ]
+    
+    return jsonify({
+        'success': True, 
+        'messages': messages_list,
+        'partner_username': partner.username,
+        'next_cursor': next_cursor
+    })
+
+
+@bp.route('/api/messages/<partner_username>', methods=['POST'])
+@login_required
+@rate_limiter.limit('message')
+def send_message(partner_username):
+    """
+    Sends a new message from the current user to the specified partner.
+    """
+    partner = find_active_user(partner_username)
+    data = request.get_json()
+    content = data.get('content')
+
+    if not partner or not content:
+        return jsonify({'success': False, 'message': 'Invalid data or recipient.'}), 400
+    
+    if current_user.id == partner.id:
+        return jsonify({'success': False, 'message': 'Cannot message yourself.'}), 400
+
+    new_message = Message(
+        sender_id=current_user.id,
+        recipient_id=partner.id,
+        content=content,
+        is_read=False 
+    )
+    
+    db.session.add(new_message)
+    db.session.commit()
+    
+    return jsonify({
+        'success': True,
+        'message_data': {
+            'id': new_message.id,
+            'content': new_message.content,
+            'timestamp': new_message.timestamp.isoformat(),
+            'is_read': new_message.is_read,
+            'is_outgoing': True,
+            'sender_username': current_user.username
+        }
+    }), 201
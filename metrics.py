@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# How many recent observations each timer keeps for its percentiles
+TIMER_WINDOW = 1000
+
+class Metrics:
+    """
+    Per-process counters and timers, read through GET /api/metrics.
+    Timers keep their last TIMER_WINDOW durations for percentiles plus running totals.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.timers = {}    # name -> {'count', 'total', 'max', 'recent': deque}
+
+    def increment(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        with self.lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                timer = self.timers[name] = {'count': 0, 'total': 0.0, 'max': 0.0,
+                                             'recent': deque(maxlen=TIMER_WINDOW)}
+            timer['count'] += 1
+            timer['total'] += seconds
+            timer['max'] = max(timer['max'], seconds)
+            timer['recent'].append(seconds)
+
+    @contextmanager
+    def timer(self, name):
+        """Times the enclosed block into the named timer."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def snapshot(self):
+        """Returns {'counters': {...}, 'timers': {name: {count, avg_ms, p50_ms, p95_ms, max_ms}}}."""
+        with self.lock:
+            counters = dict(self.counters)
+            timers = {}
+            for name, timer in self.timers.items():
+                recent = sorted(timer['recent'])
+                timers[name] = {
+                    'count': timer['count'],
+                    'avg_ms': round(timer['total'] / timer['count'] * 1000, 3),
+                    'p50_ms': round(_percentile(recent, 0.50) * 1000, 3),
+                    'p95_ms': round(_percentile(recent, 0.95) * 1000, 3),
+                    'max_ms': round(timer['max'] * 1000, 3),
+                }
+        return {'counters': counters, 'timers': timers}
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+metrics = Metrics()
@@ -8,6 +8,8 @@ db = SQLAlchemy()
 class Notification(db.Model):
     __tablename__ = 'notification'
     
+    # AUTOINCREMENT: ids are never handed out again once archive.py moves the newest rows
+    # out, so an id always means the same row, hot or archived
     id = db.Column(db.Integer, primary_key=True)
     
     # The user who is being notified (i.e., the user who was mentioned)
@@ -27,6 +29,24 @@ class Notification(db.Model):
     # A flag to check if the user has viewed it
     is_read = db.Column(db.Boolean, default=False)
     
+    # How many events this row stands for: unread 'new_post' notifications are coalesced
+    # into one row per recipient (see notifications.py). NULL on older rows means 1.
+    group_count = db.Column(db.Integer, nullable=True, default=1)
+    
+    __table_args__ = (
+        # Finds a recipient's open new_post group
+        db.Index('ix_notification_user_type_read_timestamp', 'user_id', 'type', 'is_read', 'timestamp'),
+        # Finds the old read rows compaction deletes, across all users; only holds read rows
+        db.Index('ix_notification_read_timestamp', 'timestamp', sqlite_where=is_read.is_(True)),
+        # Keyset pagination of a user's notifications, newest first
+        db.Index('ix_notification_user_timestamp', 'user_id', 'timestamp', 'id'),
+        # Finds the notifications to delete along with a post
+        db.Index('ix_notification_post', 'post_id'),
+        # Finds the notifications a deleted account caused for others
+        db.Index('ix_notification_actor', 'actor_id'),
+        {'sqlite_autoincrement': True},
+    )
+    
     # Relationships
     user = db.relationship('User', foreign_keys=[user_id], backref=db.backref('notifications', lazy='dynamic'))
     actor = db.relationship('User', foreign_keys=[actor_id]) # User who caused the notification
@@ -38,6 +58,8 @@ class Notification(db.Model):
 class Message(db.Model):
     __tablename__ = 'message'
     
+    # AUTOINCREMENT: ids are never handed out again once archive.py moves the newest rows
+    # out, so an id always means the same row, hot or archived
     id = db.Column(db.Integer, primary_key=True)
     
     # The user who sent the message
@@ -50,6 +72,14 @@ class Message(db.Model):
     timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
     
     is_read = db.Column(db.Boolean, default=False)
+    
+    __table_args__ = (
+        # Counts a user's unread messages for the sidebar without scanning their inbox
+        db.Index('ix_message_recipient_read', 'recipient_id', 'is_read'),
+        # Finds a deleted account's sent messages
+        db.Index('ix_message_sender', 'sender_id'),
+        {'sqlite_autoincrement': True},
+    )
 
     # Relationships
     sender = db.relationship('User', foreign_keys=[sender_id], backref=db.backref('sent_messages', lazy='dynamic'))
@@ -68,7 +98,12 @@ class Follow(db.Model):
     
     timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
 
-    __table_args__ = (db.UniqueConstraint('follower_id', 'followed_id', name='_follower_followed_uc'),)
+    __table_args__ = (
+        db.UniqueConstraint('follower_id', 'followed_id', name='_follower_followed_uc'),
+        # Keyset pagination of following/followers lists walks (user, timestamp, id) in order
+        db.Index('ix_follows_follower_timestamp', 'follower_id', 'timestamp', 'id'),
+        db.Index('ix_follows_followed_timestamp', 'followed_id', 'timestamp', 'id'),
+    )
 
     follower = db.relationship('User', foreign_keys=[follower_id], backref=db.backref('following_relationships', lazy='dynamic'))
     followed = db.relationship('User', foreign_keys=[followed_id], backref=db.backref('follower_relationships', lazy='dynamic'))
@@ -87,11 +122,23 @@ class User(UserMixin, db.Model):
     profile_image = db.Column(db.String(255), nullable=True)  
     banner_image = db.Column(db.String(255), nullable=True)   
     
+    # Set by DELETE /api/account: the account is hidden and locked at once and its
+    # rows are removed in the background (see purge.py), the user row last
+    deleted_at = db.Column(db.DateTime, nullable=True)
+    
+    # username.lower() from Python, for case-insensitive search (see user_search.py): SQLite's
+    # lower() only folds ASCII. Set on insert; NULL on older rows until flask init-db fills it in.
+    lowered_username = db.Column(db.String(80), nullable=True,
+                                 default=lambda context: context.get_current_parameters()['username'].lower())
+    
     posts = db.relationship('Post', backref='author', lazy='dynamic')
     
     reactions = db.relationship('Reaction', backref='reactor', lazy='dynamic')
     
     comments = db.relationship('Comment', backref='commenter', lazy='dynamic')
+    
+    # Case-insensitive exact and prefix username lookups (see user_search.py)
+    __table_args__ = (db.Index('ix_user_lowered_username', 'lowered_username'),)
 
     def set_password(self, password):
         """Hashes the password for secure storage."""
@@ -115,6 +162,8 @@ class User(UserMixin, db.Model):
 class Post(db.Model):
     __tablename__ = 'post'
     
+    # AUTOINCREMENT: ids are never handed out again once archive.py moves the newest rows
+    # out, so an id always means the same row, hot or archived
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
@@ -124,32 +173,251 @@ class Post(db.Model):
     
     comments = db.relationship('Comment', backref='post', lazy='dynamic', cascade='all, delete-orphan')
     
+    # Profile pages walk a user's posts newest first, one keyset page at a time
+    __table_args__ = (db.Index('ix_post_user_timestamp', 'user_id', 'timestamp', 'id'), {'sqlite_autoincrement': True})
+    
     def __repr__(self):
         return f'<Post {self.id} by {self.user_id}>'
 
 class Reaction(db.Model):
-    __tablename__ = 'reaction'
+    __tablename__ = 'post_reaction'
+    
+    # One row per (user, post). `flags` is a bitmask of the reaction types the user
+    # has set on the post, each with its own timestamp. Rows whose flags drop to 0
+    # are deleted. Read and write it through reactions.py rather than directly.
+    LIKE = 1
+    RETWEET = 2
+    BOOKMARK = 4
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), primary_key=True)
+    
+    flags = db.Column(db.SmallInteger, nullable=False, default=0)
+    
+    liked_at = db.Column(db.DateTime, nullable=True)
+    retweeted_at = db.Column(db.DateTime, nullable=True)
+    bookmarked_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        # Per-post counts are answered from this index alone
+        db.Index('ix_post_reaction_post_flags', 'post_id', 'flags'),
+        # Liked/retweeted/bookmarked lists page through one user's rows by time;
+        # partial indexes only hold the rows that have that flag set
+        db.Index('ix_post_reaction_user_liked', 'user_id', 'liked_at',
+                 sqlite_where=liked_at.isnot(None)),
+        db.Index('ix_post_reaction_user_retweeted', 'user_id', 'retweeted_at',
+                 sqlite_where=retweeted_at.isnot(None)),
+        db.Index('ix_post_reaction_user_bookmarked', 'user_id', 'bookmarked_at',
+                 sqlite_where=bookmarked_at.isnot(None)),
+        # Clustered on (user_id, post_id): the viewer's state for a post is one primary-key probe
+        {'sqlite_with_rowid': False},
+    )
+
+    def __repr__(self):
+        return f'<Reaction flags={self.flags} on Post {self.post_id} by User {self.user_id}>'
+
+class PostMention(db.Model):
+    __tablename__ = 'post_mention'
+    
+    # One row per user @mentioned in a post, written with the post (see entities.py).
+    # The post's timestamp is copied in so a user's mentions page straight off the index.
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    timestamp = db.Column(db.DateTime, nullable=False)
     
+    __table_args__ = (
+        db.Index('ix_post_mention_user_timestamp', 'user_id', 'timestamp', 'post_id'),
+        {'sqlite_with_rowid': False},
+    )
+    
+    def __repr__(self):
+        return f'<PostMention of User {self.user_id} in Post {self.post_id}>'
+
+class PostHashtag(db.Model):
+    __tablename__ = 'post_hashtag'
+    
+    # One row per distinct #tag in a post, lowercased, written with the post (see entities.py)
+    tag = db.Column(db.String(100), primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), primary_key=True)
+    timestamp = db.Column(db.DateTime, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_post_hashtag_tag_timestamp', 'tag', 'timestamp', 'post_id'),
+        db.Index('ix_post_hashtag_post', 'post_id'),
+        {'sqlite_with_rowid': False},
+    )
+    
+    def __repr__(self):
+        return f'<PostHashtag #{self.tag} on Post {self.post_id}>'
+
+class TrendingSnapshot(db.Model):
+    __tablename__ = 'trending_worker_snapshot'
+    
+    # Serialized counts of one trending window ('1h', '24h') as recorded by one worker
+    # process; each worker merges the others' rows into its own view (see trending.py)
+    window = db.Column(db.String(10), primary_key=True)
+    worker = db.Column(db.String(32), primary_key=True)
+    payload = db.Column(db.LargeBinary, nullable=False)
+    saved_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<TrendingSnapshot {self.window} of {self.worker} at {self.saved_at}>'
+
+class UserTrigram(db.Model):
+    __tablename__ = 'user_trigram'
+    
+    # Trigram index over lowercased usernames, padded as '^name$' (see user_search.py).
+    # A substring search only reads the posting lists of the query's trigrams.
+    trigram = db.Column(db.String(3), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    
+    __table_args__ = (
+        db.Index('ix_user_trigram_user', 'user_id'),
+        {'sqlite_with_rowid': False},
+    )
+    
+    def __repr__(self):
+        return f'<UserTrigram {self.trigram!r} for User {self.user_id}>'
+
+class ChangeLog(db.Model):
+    __tablename__ = 'change_log'
+    
+    # Append-only log of changes to posts, read by GET /api/sync (see sync.py). The id is
+    # the sync token, so AUTOINCREMENT keeps ids from being reused after compaction.
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
+    # 'created', 'deleted', 'counts' (comments changed), 'reaction' (a user's reaction
+    # state and the counts changed) or 'follows' (a user's timeline membership changed)
+    kind = db.Column(db.String(20), nullable=False)
+    # No foreign keys: entries outlive the posts and users they mention
+    post_id = db.Column(db.Integer, nullable=True)
+    # Author of the post, so read_changes can pick out the entries about a viewer's
+    # timeline (NULL on 'counts' and 'reaction' entries written before it was set)
+    author_id = db.Column(db.Integer, nullable=True)
+    # The user whose reaction or follows changed
+    user_id = db.Column(db.Integer, nullable=True)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
     
-    type = db.Column(db.String(20), nullable=False) 
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = ({'sqlite_autoincrement': True},)
+    
+    def __repr__(self):
+        return f'<ChangeLog {self.id} {self.kind} Post {self.post_id}>'
+
+class PurgeJob(db.Model):
+    __tablename__ = 'purge_job'
     
-    __table_args__ = (db.UniqueConstraint('user_id', 'post_id', 'type', name='_user_post_type_uc'),)
+    # Deletion too large for one request, carried out in small batches by the purge
+    # worker (see purge.py). Each batch commits on its own, so a job interrupted by a
+    # crash is picked up again where it stopped.
+    id = db.Column(db.Integer, primary_key=True)
+    # What is being purged: 'post' or 'user' (an account)
+    kind = db.Column(db.String(20), nullable=False)
+    target_id = db.Column(db.Integer, nullable=False)
+    # 'pending', 'running' or 'done'
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    deleted_rows = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Refreshed after every batch; a running job whose heartbeat goes stale is taken over
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    
+    __table_args__ = (db.Index('ix_purge_job_status_id', 'status', 'id'),)
+    
+    def __repr__(self):
+        return f'<PurgeJob {self.id} {self.kind} {self.target_id} {self.status}>'
+
+class ArchiveIndex(db.Model):
+    __tablename__ = 'archive_index'
+
+    # What one dated archive database (see archive.py) holds for one owner: a user's
+    # posts or notifications, or the messages between two users (owner_id < peer_id).
+    # Reads only open the archives when a page reaches back past newest_at.
+    kind = db.Column(db.String(20), primary_key=True)
+    owner_id = db.Column(db.Integer, primary_key=True)
+    peer_id = db.Column(db.Integer, primary_key=True, default=0)
+    # Year of the archive, which holds the rows timestamped in that year
+    archive = db.Column(db.Integer, primary_key=True)
+
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    oldest_at = db.Column(db.DateTime, nullable=False)
+    newest_at = db.Column(db.DateTime, nullable=False)
+    # Finds the archive holding a post by its id
+    min_id = db.Column(db.Integer, nullable=False)
+    max_id = db.Column(db.Integer, nullable=False)
 
     def __repr__(self):
-        return f'<Reaction {self.type} on Post {self.post_id} by User {self.user_id}>'
+        return f'<ArchiveIndex {self.kind} {self.owner_id}/{self.peer_id} in {self.archive}>'
 
 class Comment(db.Model):
     __tablename__ = 'comment'
     
+    # AUTOINCREMENT: ids are never handed out again once archive.py moves the newest rows
+    # out, so an id always means the same row, hot or archived
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False, index=True)
+    # Top-level comments have no parent; replies point at the top-level comment they answer
+    parent_id = db.Column(db.Integer, db.ForeignKey('comment.id'), nullable=True)
     content = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Covers the commented-posts profile tab: group one user's comments by post, latest first
+        db.Index('ix_comment_user_post_timestamp', 'user_id', 'post_id', 'timestamp'),
+        # Covers paging through a post's top-level comments and a thread's replies in order
+        db.Index('ix_comment_post_parent_timestamp', 'post_id', 'parent_id', 'timestamp', 'id'),
+        {'sqlite_autoincrement': True},
+    )
+    
+    def __repr__(self):
+        return f'<Comment {self.id} on Post {self.post_id} by User {self.user_id}>'
+
+class PostStats(db.Model):
+    __tablename__ = 'post_stats'
+    
+    # Denormalized per-post like/retweet/comment counts (see counters.py). Cold posts are
+    # updated in the same transaction as the reaction; hot posts are updated in
+    # batches by each worker's counter buffer.
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), primary_key=True)
+    
+    like_count = db.Column(db.Integer, nullable=False, default=0)
+    retweet_count = db.Column(db.Integer, nullable=False, default=0)
+    # Replies included. NULL on rows created before comments were counted here;
+    # get_live_counts fills it in on first read.
+    comment_count = db.Column(db.Integer, nullable=True, default=0)
+    
+    # Set once a post's counts have gone through a counter buffer, so buffered deltas
+    # lost in a worker crash are recomputed from post_reaction by reconciliation
+    dirty = db.Column(db.Boolean, nullable=False, default=False, index=True)
+    flushed_at = db.Column(db.DateTime, nullable=True)
+    # When a delta was last buffered for the post (refreshed at most once per flush
+    # interval); reconciliation leaves the row alone while deltas may still be in flight
+    buffered_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<PostStats for Post {self.post_id}>'
+
+class UserStats(db.Model):
+    __tablename__ = 'user_stats'
+    
+    # One row per user, kept up to date by the write routes (see stats.py).
+    # `flask repair-user-stats` recomputes every row from the source tables.
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    
+    follower_count = db.Column(db.Integer, nullable=False, default=0)
+    following_count = db.Column(db.Integer, nullable=False, default=0)
+    post_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Engagement received on the user's own posts
+    likes_received = db.Column(db.Integer, nullable=False, default=0)
+    retweets_received = db.Column(db.Integer, nullable=False, default=0)
+    comments_received = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Unread notification rows, for the nav badge. NULL on rows created before the
+    # column existed; get_user_stats fills it in on first read.
+    unread_notifications = db.Column(db.Integer, nullable=True, default=0)
+    
+    user = db.relationship('User', backref=db.backref('stats', uselist=False))
+
     def __repr__(self):
-        return f'<Comment {self.id} on Post {self.post_id} by User {self.user_id}>'
\ No newline at end of file
+        return f'<UserStats for User {self.user_id}>'
@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, update, delete, exists, literal, func, or_, and_
+from models import db, Notification, Follow, UserStats
+from stats import bump_user_stats
+
+# Unread new_post notifications newer than this are folded into one row per recipient
+DEFAULT_COALESCE_WINDOW = timedelta(hours=6)
+
+def _open_new_post_group(cutoff):
+    """Filter for a recipient's unread new_post notifications that can still absorb new posts."""
+    return (
+        Notification.type == 'new_post',
+        Notification.is_read.is_(False),
+        Notification.timestamp >= cutoff,
+    )
+
+def notify_followers_of_post(actor_id, post_id, exclude_user_ids=(), window=DEFAULT_COALESCE_WINDOW):
+    """
+    Tells actor_id's followers about a new post in the current transaction; the caller commits.
+    A follower who already has an unread new_post notification from the last `window` gets
+    that row bumped (group_count + 1, pointing at this post) instead of a new one, so a burst
+    of posts shows up as one "N new chirps" entry. Every step is a single set-based
+    statement, however many followers the actor has.
+    """
+    now = datetime.utcnow()
+    cutoff = now - window
+
+    follower_ids = select(Follow.follower_id).where(Follow.followed_id == actor_id)
+    if exclude_user_ids:
+        follower_ids = follower_ids.where(Follow.follower_id.notin_(exclude_user_ids))
+
+    # Followers without an open group get a fresh unread row, so their badge goes up by one
+    has_open_group = exists().where(Notification.user_id == Follow.follower_id, *_open_new_post_group(cutoff))
+    new_recipient_ids = follower_ids.where(~has_open_group)
+
+    db.session.execute(
+        update(UserStats)
+            .where(UserStats.user_id.in_(new_recipient_ids))
+            .values(unread_notifications=UserStats.unread_notifications + 1)
+    )
+
+    db.session.execute(
+        insert(Notification).from_select(
+            ['user_id', 'actor_id', 'post_id', 'type', 'timestamp', 'is_read', 'group_count'],
+            new_recipient_ids.add_columns(
+                literal(actor_id), literal(post_id), literal('new_post'), literal(now), literal(False), literal(1)
+            )
+        )
+    )
+
+    # Everyone else already has an unread row; it absorbs this post without changing their badge.
+    # Rows inserted above start at group_count 1 and are excluded by their post_id.
+    open_group_ids = select(func.max(Notification.id))\
+        .where(Notification.user_id.in_(follower_ids), Notification.post_id != post_id,
+               *_open_new_post_group(cutoff))\
+        .group_by(Notification.user_id)
+
+    db.session.execute(
+        update(Notification)
+            .where(Notification.id.in_(open_group_ids))
+            .values(
+                group_count=func.coalesce(Notification.group_count, 1) + 1,
+                actor_id=actor_id,
+                post_id=post_id,
+                timestamp=now,
+            )
+    )
+
+def mark_notifications_read(user_id, until=None):
+    """
+    Marks user_id's unread notifications as read, up to and including the (timestamp, id)
+    position `until` (everything when it is None), and lowers their unread counter to match.
+    Rows coalesced after the client fetched its page sort later, so they stay unread.
+    Runs in the current transaction; the caller commits. Returns the number marked.
+    """
+    query = Notification.query.filter(Notification.user_id == user_id, Notification.is_read.is_(False))
+    if until is not None:
+        timestamp, row_id = until
+        query = query.filter(or_(
+            Notification.timestamp < timestamp,
+            and_(Notification.timestamp == timestamp, Notification.id <= row_id)
+        ))
+
+    marked = query.update({'is_read': True}, synchronize_session=False)
+    if marked:
+        bump_user_stats(user_id, unread_notifications=-marked)
+    return marked
+
+def compact_notifications(older_than_days, batch_size=1000):
+    """
+    Deletes read notifications older than older_than_days, batch_size rows per
+    transaction so the table is never locked for long. Returns the number deleted.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    deleted = 0
+
+    while True:
+        batch = select(Notification.id)\
+            .where(Notification.is_read.is_(True), Notification.timestamp < cutoff)\
+            .limit(batch_size)
+
+        result = db.session.execute(
+            delete(Notification).where(Notification.id.in_(batch))
+        )
+        db.session.commit()
+
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            break
+
+    return deleted
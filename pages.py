@@ -0,0 +1,80 @@
+from flask import Blueprint, current_app, render_template, redirect, url_for
+from flask_login import current_user, login_required
+from posts import build_bootstrap_payload, build_bookmarks_payload
+from social import build_profile_payload
+
+bp = Blueprint('pages', __name__)
+
+# --- Frontend Routes (Serving HTML) ---
+
+@bp.route('/')
+
+@bp.route('/signup', methods=['GET'])
+def signup():
+    """Serve the sign-up page."""
+    if current_user.is_authenticated:
+        return redirect(url_for('pages.timeline'))
+    return render_template('signup.html')
+
+@bp.route('/login', methods=['GET'])
+def login():
+    """Serve the sign-in page."""
+    if current_user.is_authenticated:
+        return redirect(url_for('pages.timeline'))
+    return render_template('login.html') 
+
+@bp.route('/timeline')
+@login_required 
+def timeline():
+    """Serve the main timeline page, with the /api/bootstrap payload embedded when SSR_FIRST_PAGE is on."""
+    return render_template('timeline.html', active_page='timeline',
+                           initial_data=build_initial_data(lambda: build_bootstrap_payload(None))) 
+
+@bp.route('/bookmarks')
+@login_required
+def bookmarks_page():
+    """Serves the bookmarks view page (bookmarks.html), with the /api/bookmarks payload embedded when SSR_FIRST_PAGE is on."""
+    return render_template('bookmarks.html', active_page='bookmarks',
+                           initial_data=build_initial_data(build_bookmarks_payload)) 
+
+@bp.route('/profile/<username>')
+@login_required
+def profile(username):
+    """Serves the user profile page (profile.html), with the /api/profile payload embedded when SSR_FIRST_PAGE is on."""
+
+    return render_template('profile.html', active_page='profile', target_username=username,
+                           initial_data=build_initial_data(lambda: build_profile_payload(username)[0]))
+
+def build_initial_data(build_payload):
+    """
+    Returns the API payload a page would otherwise fetch on load, for base.html to embed
+    as inline JSON, or None when SSR_FIRST_PAGE is off. The client renders it through
+    the same code path as the API response.
+    """
+    if not current_app.config['SSR_FIRST_PAGE']:
+        return None
+    return {'success': True, **build_payload()}
+
+@bp.route('/relationships/<view_type>/<username>')
+@login_required
+def relationships_page(view_type, username):
+    """Serves the page listing followers or following."""
+    return render_template('relationships.html', active_page='profile', target_username=username, view_type=view_type)
+
+@bp.route('/notifications')
+@login_required
+def notifications():
+    """Renders the Notifications page."""
+    return render_template('notifications.html', active_page='notifications')
+
+@bp.route('/messages')
+@login_required
+def messages():
+    """Renders the Direct Messages page."""
+    return render_template('messages.html', active_page='messages' )
+
+@bp.route('/search')
+@login_required
+def search_page():
+    """Renders the Search page."""
+    return render_template('search.html', active_page='search')
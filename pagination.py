@@ -0,0 +1,74 @@
+from datetime import datetime
+from flask import request, jsonify
+from sqlalchemy import or_, and_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor that was not produced by encode_cursor."""
+
+def handle_invalid_cursor(error):
+    """Error handler for InvalidCursor, registered by create_app."""
+    return jsonify({'success': False, 'message': 'Invalid cursor.'}), 400
+
+def get_page_size(args=None):
+    """Reads the optional 'limit' query parameter (of `args`, or the current request's), clamped to MAX_PAGE_SIZE."""
+    args = request.args if args is None else args
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except (TypeError, ValueError):
+        limit = DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def encode_cursor(timestamp, row_id):
+    """Encodes a (timestamp, id) keyset position as an opaque cursor string."""
+    return f"{timestamp.isoformat()}_{row_id}"
+
+def decode_cursor(cursor):
+    """Decodes a cursor made by encode_cursor back into a (timestamp, id) tuple."""
+    try:
+        timestamp, row_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (AttributeError, ValueError):
+        raise InvalidCursor(cursor)
+
+def get_cursor(param='cursor'):
+    """
+    Decodes a cursor query parameter ('cursor' unless given) into a (timestamp, id) tuple.
+    Returns None for the first page.
+    """
+    cursor = request.args.get(param)
+    if not cursor:
+        return None
+    return decode_cursor(cursor)
+
+def fetch_page(query, limit, position):
+    """
+    Runs an already ordered query for one page of rows.
+    position(row) returns the row's (timestamp, id) keyset position, used to build the next cursor.
+    Returns (rows, next_cursor), where next_cursor is None on the last page.
+    """
+    rows = query.limit(limit + 1).all()
+    
+    if len(rows) <= limit:
+        return rows, None
+    
+    rows = rows[:limit]
+    return rows, encode_cursor(*position(rows[-1]))
+
+def keyset_before(timestamp_column, id_column, cursor):
+    """Filter for rows that come after `cursor` when ordered by (timestamp, id) descending."""
+    timestamp, row_id = cursor
+    return or_(
+        timestamp_column < timestamp,
+        and_(timestamp_column == timestamp, id_column < row_id)
+    )
+
+def keyset_after(timestamp_column, id_column, cursor):
+    """Filter for rows that come after `cursor` when ordered by (timestamp, id) ascending."""
+    timestamp, row_id = cursor
+    return or_(
+        timestamp_column > timestamp,
+        and_(timestamp_column == timestamp, id_column > row_id)
+    )
@@ -0,0 +1,784 @@
+import os
+from collections import Counter, defaultdict
+from flask import Blueprint, current_app, request, jsonify
+from flask_login import current_user, login_required
+from sqlalchemy import func
+from models import db, User, Post, Reaction, Comment, Notification, Message, PostMention, PostHashtag
+from stats import get_user_stats, bump_user_stats
+from reactions import (
+    is_reaction_type, reacted_at, get_viewer_reactions, get_reaction_counts,
+    count_reactions, toggle_reaction, set_reaction_states
+)
+from counters import counter_buffer, record_count_change, record_comment_change, get_live_counts
+from notifications import notify_followers_of_post
+from entities import index_posts, normalize_tag, extract_hashtags
+from trending import trending_engine
+from ranking import rank_top_timeline
+from metrics import metrics
+from fragments import post_fragments
+from serializer import utc_isoformat
+from purge import purge_worker, count_post_dependents, delete_posts_now, detach_post
+from archive import archive_store
+from sync import log_change, log_reaction_changes, current_sync_token, read_changes
+from ratelimit import rate_limiter
+from pagination import InvalidCursor, get_page_size, get_cursor, fetch_page, keyset_before, keyset_after
+
+bp = Blueprint('posts', __name__)
+
+# --- Post Serialization Helpers ---
+
+def serialize_posts(rows):
+    """
+    Serializes (Post, author) pairs into the post objects rendered by createPostElement,
+    as RawJSON built from each post's cached fragment (see fragments.py).
+    Counts and the current user's reaction state are loaded for the whole page at once.
+    Posts may also be archived post rows (see archive.py), whose counts come from their archive.
+    """
+    post_ids = [post.id for post, _ in rows if isinstance(post, Post)]
+    counts = get_live_counts(post_ids)
+    viewer_reactions = get_viewer_reactions(current_user.id, post_ids)
+    
+    archived = [post for post, _ in rows if not isinstance(post, Post)]
+    if archived:
+        archived_counts, archived_reactions = archive_store.describe_posts(current_user.id, archived)
+        counts.update(archived_counts)
+        viewer_reactions.update(archived_reactions)
+    
+    return [
+        post_fragments.render(post, author, counts[post.id], viewer_reactions[post.id], current_user.id)
+        for post, author in rows
+    ]
+
+# --- Core Chirp API Routes ---
+
+@bp.route('/api/posts', methods=['POST'])
+@login_required
+@rate_limiter.limit('post')
+def create_post():
+    """
+    Handles creating a new post (chirp) and creates notifications for any @mentions 
+    found within the content.
+    """
+    data = request.get_json()
+    content = data.get('content')
+    
+    if not content:
+        return jsonify({'success': False, 'message': 'Content cannot be empty'}), 400
+
+    new_post = Post(user_id=current_user.id, content=content)
+    db.session.add(new_post)
+    bump_user_stats(current_user.id, post_count=1)
+    db.session.flush()
+
+    # Writes the mention/hashtag index rows, resolving every @username in one query
+    mentioned_users = index_posts([new_post])[new_post.id]
+
+    mentioned_user_ids = set() 
+
+    for mentioned_user_id, _ in mentioned_users:
+        if mentioned_user_id != current_user.id:
+            mentioned_user_ids.add(mentioned_user_id) 
+            
+            notification = Notification(
+                user_id=mentioned_user_id,
+                actor_id=current_user.id,
+                post_id=new_post.id,
+                type='mention' 
+            )
+            # Added before the bump, so a stats row built from scratch already counts it
+            db.session.add(notification)
+            bump_user_stats(mentioned_user_id, unread_notifications=1)
+    
+    notify_followers_of_post(current_user.id, new_post.id, exclude_user_ids=mentioned_user_ids)
+    log_change('created', new_post.id, author_id=current_user.id)
+    db.session.commit()
+    
+    trending_engine.record(extract_hashtags(new_post.content), new_post.timestamp)
+    
+    return jsonify({
+        'success': True, 
+        'post': {
+            'id': new_post.id,
+            'username': current_user.username,
+            'handle': '@' + current_user.username,
+            'time': 'Just now',
+            'timestamp': utc_isoformat(new_post.timestamp),
+            'content': new_post.content,
+            'likes': 0,
+            'retweets': 0,
+            'comments': 0,
+            'profile_image': current_user.profile_image or 'uploads/default-avatar.jpg',
+        'canDelete': True
+        }
+    }), 201
+
+@bp.route('/api/posts', methods=['GET'])
+@login_required
+def get_timeline_posts():
+    """
+    Fetches posts for the timeline.
+    Shows ONLY posts from users that the current user is following + their own posts.
+    With ?mode=top, returns a page of recent posts from followed and two-hop accounts
+    ranked by engagement instead (see get_top_timeline_posts).
+    """
+    if request.args.get('mode') == 'top':
+        return get_top_timeline_posts()
+
+    posts, next_cursor = get_timeline_page(get_cursor(), get_page_size())
+    
+    return jsonify({
+        'success': True,
+        'posts': posts,
+        'next_cursor': next_cursor
+    })
+
+def get_timeline_author_ids():
+    """The ids whose posts make up the current user's timeline: everyone they follow, and themselves."""
+    author_ids = {rel.followed_id for rel in current_user.following_relationships}
+    author_ids.add(current_user.id)
+    return author_ids
+
+def get_timeline_page(cursor, limit):
+    """Returns (serialized posts, next_cursor) for one page of the current user's timeline, newest first."""
+    query = db.session.query(Post, User)\
+        .join(User, User.id == Post.user_id)\
+        .filter(Post.user_id.in_(get_timeline_author_ids()))
+    
+    if cursor:
+        query = query.filter(keyset_before(Post.timestamp, Post.id, cursor))
+    
+    rows, next_cursor = fetch_page(
+        query.order_by(Post.timestamp.desc(), Post.id.desc()),
+        limit,
+        lambda row: (row[0].timestamp, row[0].id)
+    )
+    return serialize_posts(rows), next_cursor
+
+def get_top_timeline_posts():
+    """
+    The ?mode=top timeline: candidates are ranked on every request, so pages are
+    addressed by offset ('cursor' is the number of posts already shown).
+    """
+    limit = get_page_size()
+    cursor = request.args.get('cursor')
+    try:
+        offset = int(cursor) if cursor else 0
+    except ValueError:
+        raise InvalidCursor(cursor)
+    if offset < 0:
+        raise InvalidCursor(cursor)
+
+    ranked_ids = rank_top_timeline(current_user.id, current_app.config['TOP_TIMELINE'])
+    page_ids = ranked_ids[offset:offset + limit]
+
+    rows_by_id = {
+        post.id: (post, user) for post, user in db.session.query(Post, User)
+            .join(User, User.id == Post.user_id)
+            .filter(Post.id.in_(page_ids))
+    } if page_ids else {}
+    rows = [rows_by_id[post_id] for post_id in page_ids if post_id in rows_by_id]
+
+    return jsonify({
+        'success': True,
+        'posts': serialize_posts(rows),
+        'next_cursor': str(offset + limit) if offset + limit < len(ranked_ids) else None
+    })
+
+def get_sync_token():
+    """
+    Reads the ?since sync token. Returns None when absent.
+    Raises ValueError for anything that is not a token.
+    """
+    since = request.args.get('since')
+    return int(since) if since else None
+
+def get_timeline_delta(since):
+    """
+    Builds the delta sync payload for the current user's cached timeline after token
+    `since`: new timeline posts, deleted post ids, fresh counts for posts whose counts
+    changed and the viewer's reaction state where it changed, plus the next token.
+    Returns None when the client has to refetch its timeline instead (see read_changes).
+    """
+    changes = read_changes(current_user.id, since, get_timeline_author_ids()) if since is not None else None
+    if changes is None:
+        return None
+    
+    rows = db.session.query(Post, User)\
+        .join(User, User.id == Post.user_id)\
+        .filter(Post.id.in_(changes['created']))\
+        .order_by(Post.timestamp.desc(), Post.id.desc())\
+        .all() if changes['created'] else []
+    
+    # Only posts that still exist, so counts are never built for a deleted post
+    touched_ids = changes['changed'] | changes['reacted']
+    existing_ids = [post_id for (post_id,) in db.session.query(Post.id).filter(Post.id.in_(touched_ids))] if touched_ids else []
+    counts = get_live_counts([post_id for post_id in existing_ids if post_id in changes['changed']])
+    viewer_reactions = get_viewer_reactions(
+        current_user.id, [post_id for post_id in existing_ids if post_id in changes['reacted']]
+    )
+    
+    return {
+        'reset': False,
+        'token': changes['token'],
+        'posts': serialize_posts(rows),
+        'deleted': sorted(changes['deleted']),
+        'counts': counts,
+        'reactions': {
+            post_id: {
+                'isLiked': 'LIKE' in reacted,
+                'isRetweeted': 'RETWEET' in reacted,
+                'isBookmarked': 'BOOKMARK' in reacted,
+            }
+            for post_id, reacted in viewer_reactions.items()
+        }
+    }
+
+@bp.route('/api/sync', methods=['GET'])
+@login_required
+def sync_timeline():
+    """
+    Delta sync for the client's cached timeline (see get_timeline_delta).
+    Answers {'reset': true} with a token when the client should refetch /api/posts
+    instead (no or stale token, too far behind, or the viewer's follows changed).
+    """
+    try:
+        since = get_sync_token()
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid sync token.'}), 400
+    
+    delta = get_timeline_delta(since) or {'reset': True, 'token': current_sync_token()}
+    return jsonify({'success': True, 'userId': current_user.id, **delta})
+
+@bp.route('/api/bootstrap', methods=['GET'])
+@login_required
+def bootstrap():
+    """
+    Everything the timeline page needs on load, in one round trip: the viewer's identity,
+    unread notification and message counts, and the timeline. With a valid ?since token
+    the timeline part is a delta for the client's cache (as from /api/sync), otherwise
+    it is the first page plus the token it is current as of.
+    All parts share the request's session and its already loaded current_user.
+    """
+    try:
+        since = get_sync_token()
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid sync token.'}), 400
+    
+    return jsonify({'success': True, **build_bootstrap_payload(since)})
+
+def build_bootstrap_payload(since):
+    """Builds the /api/bootstrap response body for the current user and sync token `since`."""
+    timeline_part = get_timeline_delta(since)
+    if timeline_part is None:
+        # The token is taken before the page, so changes in between are replayed by the next sync
+        token = current_sync_token()
+        posts, next_cursor = get_timeline_page(None, get_page_size())
+        timeline_part = {'reset': True, 'token': token, 'posts': posts, 'next_cursor': next_cursor}
+    
+    unread_messages = Message.query.filter_by(recipient_id=current_user.id, is_read=False).count()
+    
+    return {
+        'viewer': {
+            'id': current_user.id,
+            'username': current_user.username,
+            'profile_image': current_user.profile_image or 'uploads/default-avatar.jpg',
+        },
+        'unreadNotifications': get_user_stats(current_user.id).unread_notifications,
+        'unreadMessages': unread_messages,
+        'timeline': timeline_part
+    }
+
+@bp.route('/api/metrics', methods=['GET'])
+@login_required
+def get_metrics():
+    """Returns this worker's counters and timers."""
+    return jsonify({'success': True, 'pid': os.getpid(), **metrics.snapshot()})
+
+# --- Reaction/Bookmark API Routes ---
+
+# The UserStats counter on the post author that each reaction type feeds
+REACTION_RECEIVED_FIELDS = {'LIKE': 'likes_received', 'RETWEET': 'retweets_received'}
+
+MAX_REACTION_BATCH = 100
+
+@bp.route('/api/react', methods=['POST'])
+@login_required
+@rate_limiter.limit('react')
+def react_to_post():
+    """Handles LIKE, RETWEET, and BOOKMARK actions."""
+    data = request.get_json()
+    post_id = data.get('postId')
+    reaction_type = data.get('reactionType') 
+    
+    if not is_reaction_type(reaction_type):
+        return jsonify({'success': False, 'message': 'Invalid reaction type'}), 400
+    
+    post = Post.query.get(post_id)
+    if not post:
+        return jsonify({'success': False, 'message': 'Post not found'}), 404
+    
+    toggled = toggle_reaction(current_user.id, post.id, reaction_type)
+    record_count_change(post.id, reaction_type, 1 if toggled else -1)
+    log_reaction_changes(current_user.id, {post.id: post.user_id})
+
+    received_field = REACTION_RECEIVED_FIELDS.get(reaction_type)
+    if received_field:
+        bump_user_stats(post.user_id, **{received_field: 1 if toggled else -1})
+    
+    db.session.commit()
+
+    if reaction_type == 'BOOKMARK':
+        new_count = count_reactions(post.id, reaction_type)
+    else:
+        counts = get_live_counts([post.id])[post.id]
+        new_count = counts['likes'] if reaction_type == 'LIKE' else counts['retweets']
+
+    return jsonify({
+        'success': True,
+        'reactionType': reaction_type,
+        'newCount': new_count,
+        'toggled': toggled
+    })
+
+@bp.route('/api/reactions/batch', methods=['POST'])
+@login_required
+@rate_limiter.limit('react', charge=False)
+def batch_react():
+    """
+    Applies many LIKE, RETWEET and BOOKMARK changes in one request.
+    Expects {"operations": [{"postId": 1, "type": "LIKE", "state": true}, ...]}.
+    Each operation says whether the reaction should end up set, so retried or repeated
+    requests are harmless; later operations on the same reaction win.
+    Returns the final counts and reaction state of every post touched.
+    """
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+    
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'success': False, 'message': 'operations must be a non-empty list'}), 400
+    
+    if len(operations) > MAX_REACTION_BATCH:
+        return jsonify({'success': False, 'message': f'At most {MAX_REACTION_BATCH} operations per batch'}), 400
+    
+    states = {}
+    for operation in operations:
+        post_id = operation.get('postId') if isinstance(operation, dict) else None
+        reaction_type = operation.get('type') if isinstance(operation, dict) else None
+        state = operation.get('state') if isinstance(operation, dict) else None
+        
+        if type(post_id) is not int or not is_reaction_type(reaction_type) or not isinstance(state, bool):
+            return jsonify({'success': False, 'message': 'Each operation needs an integer postId, a reaction type and a boolean state'}), 400
+        
+        states[(post_id, reaction_type)] = state
+    
+    # Each operation counts against the react limit, as it would as a request of its own
+    rate_limiter.check('react', request.remote_addr, current_user.id, cost=len(operations))
+    
+    requested_ids = {post_id for post_id, _ in states}
+    post_authors = dict(db.session.query(Post.id, Post.user_id).filter(Post.id.in_(requested_ids)))
+    
+    changes = set_reaction_states(
+        current_user.id,
+        {key: state for key, state in states.items() if key[0] in post_authors}
+    )
+    
+    received_deltas = defaultdict(Counter)
+    for post_id, reaction_type, delta in changes:
+        record_count_change(post_id, reaction_type, delta)
+        received_field = REACTION_RECEIVED_FIELDS.get(reaction_type)
+        if received_field:
+            received_deltas[post_authors[post_id]][received_field] += delta
+    
+    for author_id, deltas in received_deltas.items():
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if deltas:
+            bump_user_stats(author_id, **deltas)
+    
+    log_reaction_changes(current_user.id, {post_id: post_authors[post_id] for post_id, _, _ in changes})
+    db.session.commit()
+    
+    touched_ids = list(post_authors)
+    counts = get_live_counts(touched_ids)
+    viewer_reactions = get_viewer_reactions(current_user.id, touched_ids)
+    
+    return jsonify({
+        'success': True,
+        'posts': {
+            post_id: {
+                'likes': counts[post_id]['likes'],
+                'retweets': counts[post_id]['retweets'],
+                'isLiked': 'LIKE' in viewer_reactions[post_id],
+                'isRetweeted': 'RETWEET' in viewer_reactions[post_id],
+                'isBookmarked': 'BOOKMARK' in viewer_reactions[post_id],
+            }
+            for post_id in touched_ids
+        },
+        'missingPostIds': sorted(requested_ids - post_authors.keys())
+    })
+
+# --- Delete Post API Route ---
+
+@bp.route('/api/posts/<int:post_id>', methods=['DELETE'])
+@login_required
+def delete_post(post_id):
+    """
+    Deletes a post. Only the author can delete their own post.
+    Its reactions, comments, notifications and index rows go with it through set-based
+    deletes; for posts with more than POST_DELETE_INLINE_LIMIT of those, the post
+    disappears right away and the rest is purged in the background (see purge.py).
+    """
+    post = Post.query.get(post_id)
+    
+    if not post:
+        return delete_archived_post(post_id)
+    
+    if post.user_id != current_user.id:
+        return jsonify({'success': False, 'message': 'You can only delete your own posts'}), 403
+    
+    # Exact counts rather than the buffered ones, since these are taken off the author's totals for good
+    reaction_counts = get_reaction_counts([post.id])[post.id]
+    comment_count = Comment.query.filter_by(post_id=post.id).count()
+    
+    purge_later = count_post_dependents(post.id) > current_app.config['POST_DELETE_INLINE_LIMIT']
+    if purge_later:
+        detach_post(post.id)
+    else:
+        delete_posts_now([post.id])
+    log_change('deleted', post.id, author_id=post.user_id)
+    bump_user_stats(
+        post.user_id,
+        post_count=-1,
+        likes_received=-reaction_counts['likes'],
+        retweets_received=-reaction_counts['retweets'],
+        comments_received=-comment_count
+    )
+    db.session.commit()
+    counter_buffer.discard(post_id)
+    post_fragments.discard([post_id])
+    if purge_later:
+        purge_worker.wake()
+    
+    return jsonify({
+        'success': True,
+        'message': 'Post deleted successfully'
+    })
+
+def delete_archived_post(post_id):
+    """Deletes one of the current user's archived posts (see archive.py), for delete_post."""
+    post = archive_store.find_post(post_id)
+    
+    if post is None:
+        return jsonify({'success': False, 'message': 'Post not found'}), 404
+    
+    if post.user_id != current_user.id:
+        return jsonify({'success': False, 'message': 'You can only delete your own posts'}), 403
+    
+    counts = archive_store.delete_post(post)
+    # Notifications about it may still be in the main database
+    delete_posts_now([post.id])
+    log_change('deleted', post.id, author_id=post.user_id)
+    bump_user_stats(
+        post.user_id,
+        post_count=-1,
+        likes_received=-counts['likes'],
+        retweets_received=-counts['retweets'],
+        comments_received=-counts['comments']
+    )
+    db.session.commit()
+    post_fragments.discard([post_id])
+    
+    return jsonify({
+        'success': True,
+        'message': 'Post deleted successfully'
+    })
+
+# --- Bookmarks API Route ---
+
+@bp.route('/api/bookmarks', methods=['GET'])
+@login_required
+def get_bookmarks():
+    """
+    Fetches one page of the posts the current user has bookmarked, most recently bookmarked first.
+    Pass the returned next_cursor as ?cursor to load the next page.
+    """
+    return jsonify({'success': True, **build_bookmarks_payload()})
+
+def build_bookmarks_payload():
+    """Builds the /api/bookmarks response body (one page) for the current user."""
+    rows, next_cursor = get_reacted_posts_page(current_user, 'BOOKMARK')
+    
+    return {'posts': serialize_posts(rows), 'next_cursor': next_cursor}
+
+# --- Comments API Routes ---
+
+def serialize_comments(rows, reply_counts=None):
+    """Serializes (Comment, author) pairs for the comment modal."""
+    return [
+        {
+            'id': comment.id,
+            'parentId': comment.parent_id,
+            'username': author.username,
+            'handle': '@' + author.username,
+            'content': comment.content,
+            'timestamp': utc_isoformat(comment.timestamp),
+            'canDelete': comment.user_id == current_user.id,
+            'replyCount': reply_counts.get(comment.id, 0) if reply_counts is not None else None
+        }
+        for comment, author in rows
+    ]
+
+def get_reply_counts(post_id, comment_ids):
+    """Returns {comment_id: number of replies} for a page of top-level comments, in one grouped query."""
+    if not comment_ids:
+        return {}
+    
+    return dict(
+        db.session.query(Comment.parent_id, func.count(Comment.id))
+            .filter(Comment.post_id == post_id, Comment.parent_id.in_(comment_ids))
+            .group_by(Comment.parent_id)
+    )
+
+@bp.route('/api/posts/<int:post_id>/comments', methods=['GET'])
+@login_required
+def get_comments(post_id):
+    """
+    Fetches one page of a post's comments, oldest first.
+    Without ?parent_id this pages through top-level comments, each with its reply count;
+    with ?parent_id=<comment id> it pages through that thread's replies instead.
+    Pass the returned next_cursor as ?cursor to load the following page.
+    """
+    parent_id = request.args.get('parent_id', type=int)
+    cursor = get_cursor()
+    limit = get_page_size()
+    
+    post = Post.query.get(post_id)
+    if not post:
+        # Archived posts keep their comments in the archive
+        archived_post = archive_store.find_post(post_id)
+        if archived_post is None:
+            return jsonify({'success': False, 'message': 'Post not found'}), 404
+        
+        rows, next_cursor, reply_counts, comment_count = archive_store.get_comments_page(
+            archived_post, parent_id, cursor, limit
+        )
+        return jsonify({
+            'success': True,
+            'comments': serialize_comments(rows, reply_counts),
+            'commentCount': comment_count,
+            'next_cursor': next_cursor
+        })
+    
+    query = db.session.query(Comment, User)\
+        .join(User, User.id == Comment.user_id)\
+        .filter(Comment.post_id == post_id, Comment.parent_id == parent_id)
+    
+    if cursor:
+        query = query.filter(keyset_after(Comment.timestamp, Comment.id, cursor))
+    
+    rows, next_cursor = fetch_page(
+        query.order_by(Comment.timestamp.asc(), Comment.id.asc()),
+        limit,
+        lambda row: (row[0].timestamp, row[0].id)
+    )
+    
+    reply_counts = None
+    if parent_id is None:
+        reply_counts = get_reply_counts(post_id, [comment.id for comment, _ in rows])
+    
+    return jsonify({
+        'success': True,
+        'comments': serialize_comments(rows, reply_counts),
+        'commentCount': get_live_counts([post_id])[post_id]['comments'],
+        'next_cursor': next_cursor
+    })
+
+@bp.route('/api/posts/<int:post_id>/comments', methods=['POST'])
+@login_required
+@rate_limiter.limit('comment')
+def add_comment(post_id):
+    """
+    Adds a new comment to a specific post.
+    An optional parentId makes it a reply; replies to a reply join the same top-level thread.
+    """
+    post = Post.query.get(post_id)
+    if not post:
+        return jsonify({'success': False, 'message': 'Post not found'}), 404
+    
+    data = request.get_json()
+    content = data.get('content')
+    parent_id = data.get('parentId')
+    
+    if not content or not content.strip():
+        return jsonify({'success': False, 'message': 'Comment cannot be empty'}), 400
+    
+    if parent_id is not None:
+        parent = Comment.query.get(parent_id) if type(parent_id) is int else None
+        if not parent or parent.post_id != post_id:
+            return jsonify({'success': False, 'message': 'Parent comment not found'}), 404
+        parent_id = parent.parent_id or parent.id
+    
+    new_comment = Comment(
+        user_id=current_user.id,
+        post_id=post_id,
+        parent_id=parent_id,
+        content=content.strip()
+    )
+    
+    db.session.add(new_comment)
+    record_comment_change(post_id, 1)
+    log_change('counts', post_id, author_id=post.user_id)
+    bump_user_stats(post.user_id, comments_received=1)
+    db.session.commit()
+    
+    comment_count = get_live_counts([post_id])[post_id]['comments']
+    
+    return jsonify({
+        'success': True,
+        'comment': serialize_comments([(new_comment, current_user)], None if parent_id else {})[0],
+        'newCommentCount': comment_count
+    }), 201
+
+@bp.route('/api/comments/<int:comment_id>', methods=['DELETE'])
+@login_required
+def delete_comment(comment_id):
+    """
+    Deletes a comment (only by the user who created it).
+    Deleting a top-level comment also deletes its replies.
+    """
+    comment = Comment.query.get(comment_id)
+    
+    if not comment:
+        return jsonify({'success': False, 'message': 'Comment not found'}), 404
+    
+    if comment.user_id != current_user.id:
+        return jsonify({'success': False, 'message': 'Not authorized to delete this comment'}), 403
+    
+    post_id = comment.post_id
+    post_author_id = comment.post.user_id
+    
+    deleted = 1
+    if comment.parent_id is None:
+        deleted += Comment.query.filter_by(post_id=post_id, parent_id=comment.id)\
+            .delete(synchronize_session=False)
+    
+    db.session.delete(comment)
+    record_comment_change(post_id, -deleted)
+    log_change('counts', post_id, author_id=post_author_id)
+    bump_user_stats(post_author_id, comments_received=-deleted)
+    db.session.commit()
+    
+    comment_count = get_live_counts([post_id])[post_id]['comments']
+    
+    return jsonify({
+        'success': True,
+        'message': 'Comment deleted successfully',
+        'newCommentCount': comment_count
+    })
+
+# --- Mentions and Hashtags ---
+
+def get_indexed_posts_page(index_model, condition):
+    """
+    Returns one page of (Post, author) pairs from a mention/hashtag index table,
+    newest first, as (rows, next_cursor). Paging walks the index's (key, timestamp, post_id) order.
+    """
+    limit = get_page_size()
+    cursor = get_cursor()
+    
+    query = db.session.query(Post, User, index_model.timestamp, index_model.post_id)\
+        .join(index_model, index_model.post_id == Post.id)\
+        .join(User, User.id == Post.user_id)\
+        .filter(condition)
+    
+    if cursor:
+        query = query.filter(keyset_before(index_model.timestamp, index_model.post_id, cursor))
+    
+    rows, next_cursor = fetch_page(
+        query.order_by(index_model.timestamp.desc(), index_model.post_id.desc()),
+        limit,
+        lambda row: (row[2], row[3])
+    )
+    
+    return [(post, author) for post, author, _, _ in rows], next_cursor
+
+@bp.route('/api/hashtags/<tag>', methods=['GET'])
+@login_required
+def get_hashtag_posts(tag):
+    """Fetches one page of posts tagged #tag (case-insensitive), newest first."""
+    tag = normalize_tag(tag)
+    if not tag:
+        return jsonify({'success': False, 'message': 'Invalid hashtag'}), 400
+    
+    rows, next_cursor = get_indexed_posts_page(PostHashtag, PostHashtag.tag == tag)
+    
+    return jsonify({
+        'success': True,
+        'tag': tag,
+        'posts': serialize_posts(rows),
+        'next_cursor': next_cursor
+    })
+
+TRENDING_WINDOWS = ('1h', '24h')
+
+@bp.route('/api/trending', methods=['GET'])
+@login_required
+def get_trending():
+    """
+    Returns the top hashtags over ?window=1h (default) or 24h, with approximate counts.
+    Served from the in-memory trending engine, so the cost does not grow with post volume.
+    """
+    window = request.args.get('window', '1h')
+    if window not in TRENDING_WINDOWS:
+        return jsonify({'success': False, 'message': 'window must be 1h or 24h'}), 400
+    
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    
+    return jsonify({
+        'success': True,
+        'window': window,
+        'trending': [{'tag': tag, 'count': count} for tag, count in trending_engine.top(window, limit)]
+    })
+
+@bp.route('/api/mentions', methods=['GET'])
+@login_required
+def get_mentions():
+    """Fetches one page of posts that @mention the current user, newest first."""
+    rows, next_cursor = get_indexed_posts_page(PostMention, PostMention.user_id == current_user.id)
+    
+    return jsonify({
+        'success': True,
+        'posts': serialize_posts(rows),
+        'next_cursor': next_cursor
+    })
+
+# --- Reacted Posts (Bookmarks and Profile Tabs) ---
+
+def get_reacted_posts_query(user, reaction_type):
+    """
+    Query for (Post, author, reacted_at, post_id) rows of the posts the user has
+    set reaction_type on, most recent reaction first. Post and author come from a single join.
+    """
+    reacted_at_column = reacted_at(reaction_type)
+    
+    return db.session.query(Post, User, reacted_at_column, Post.id)\
+        .join(Reaction, Reaction.post_id == Post.id)\
+        .join(User, User.id == Post.user_id)\
+        .filter(Reaction.user_id == user.id, reacted_at_column.isnot(None))\
+        .order_by(reacted_at_column.desc(), Post.id.desc())
+
+def get_reacted_posts_page(user, reaction_type):
+    """
+    Returns one page of (Post, author) pairs the user reacted to with reaction_type,
+    newest reaction first, as (rows, next_cursor).
+    """
+    limit = get_page_size()
+    cursor = get_cursor()
+    
+    query = get_reacted_posts_query(user, reaction_type)
+    
+    if cursor:
+        query = query.filter(keyset_before(reacted_at(reaction_type), Post.id, cursor))
+    
+    rows, next_cursor = fetch_page(query, limit, lambda row: (row[2], row[3]))
+    
+    return [(post, author) for post, author, _, _ in rows], next_cursor
@@ -0,0 +1,415 @@
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, update, bindparam, func, or_, and_, tuple_
+from sqlalchemy.orm import aliased
+from models import (
+    db, User, Post, Reaction, Comment, Notification, Message, Follow,
+    PostMention, PostStats, UserStats, UserTrigram, PurgeJob
+)
+from entities import unindex_posts
+from reactions import types_from_flags
+from sync import log_change
+from archive import archive_store
+
+def count_post_dependents(post_id):
+    """Returns how many reaction, comment and notification rows hang off a post."""
+    return sum(
+        db.session.query(func.count()).select_from(model).filter(model.post_id == post_id).scalar()
+        for model in (Reaction, Comment, Notification)
+    )
+
+def _subtract_counts(column, key_column, amounts):
+    """
+    Subtracts {key: amount} from a counter column with one executemany UPDATE.
+    Rows that don't exist yet are skipped: they are computed from the (already
+    purged) source tables when first read.
+    """
+    rows = [{'target_id': key, 'amount': amount} for key, amount in amounts.items() if amount]
+    if not rows:
+        return
+
+    db.session.connection().execute(
+        update(key_column.class_)
+        .where(key_column == bindparam('target_id'))
+        .values({column.key: column - bindparam('amount')}),
+        rows
+    )
+
+def _release_unread(notifications, skip_user_id=None):
+    """Takes the unread ones among deleted (user_id, is_read) notifications off their recipients' counters."""
+    unread = Counter(user_id for user_id, is_read in notifications if not is_read and user_id != skip_user_id)
+    _subtract_counts(UserStats.unread_notifications, UserStats.user_id, unread)
+
+def delete_posts_now(post_ids):
+    """
+    Deletes posts and every row that hangs off them (reactions, comments, notifications,
+    the mention/hashtag index and post_stats) with one set-based statement per table,
+    in the current transaction. The caller adjusts the authors' stats and commits.
+    """
+    unread_counts = db.session.query(Notification.user_id, func.count())\
+        .filter(Notification.post_id.in_(post_ids), Notification.is_read.is_(False))\
+        .group_by(Notification.user_id)\
+        .all()
+
+    for model in (Reaction, Comment, Notification, PostStats):
+        db.session.execute(delete(model).where(model.post_id.in_(post_ids)))
+    _subtract_counts(UserStats.unread_notifications, UserStats.user_id, dict(unread_counts))
+    unindex_posts(post_ids)
+    db.session.execute(delete(Post).where(Post.id.in_(post_ids)))
+
+def detach_post(post_id):
+    """
+    Deletes a post and its small side rows now and queues a purge job for its
+    reactions, comments and notifications, in the current transaction.
+    Rows left behind no longer join to a post, so they drop out of every listing.
+    """
+    unindex_posts([post_id])
+    db.session.execute(delete(PostStats).where(PostStats.post_id == post_id))
+    db.session.execute(delete(Post).where(Post.id == post_id))
+    db.session.add(PurgeJob(kind='post', target_id=post_id))
+
+def _delete_post_dependents(post_ids, batch_size):
+    """
+    Deletes up to batch_size of the reactions, comments and notifications of post_ids
+    (a list, or a select of post ids), one table at a time. Returns the number deleted.
+    """
+    keys = db.session.query(Reaction.user_id, Reaction.post_id)\
+        .filter(Reaction.post_id.in_(post_ids))\
+        .limit(batch_size)\
+        .all()
+    if keys:
+        db.session.execute(delete(Reaction).where(tuple_(Reaction.user_id, Reaction.post_id).in_(keys)))
+        return len(keys)
+
+    comment_ids = [comment_id for (comment_id,) in db.session.query(Comment.id)
+                   .filter(Comment.post_id.in_(post_ids))
+                   .limit(batch_size)]
+    if comment_ids:
+        db.session.execute(delete(Comment).where(Comment.id.in_(comment_ids)))
+        return len(comment_ids)
+
+    notifications = db.session.query(Notification.id, Notification.user_id, Notification.is_read)\
+        .filter(Notification.post_id.in_(post_ids))\
+        .limit(batch_size)\
+        .all()
+    if notifications:
+        db.session.execute(delete(Notification).where(Notification.id.in_([row[0] for row in notifications])))
+        _release_unread([(user_id, is_read) for _, user_id, is_read in notifications])
+        return len(notifications)
+
+    return 0
+
+def _purge_post_batch(post_id, batch_size):
+    """Deletes the next batch of a detached post's rows. Returns the number deleted; 0 means nothing is left."""
+    return _delete_post_dependents([post_id], batch_size)
+
+# --- Account purge: each step deletes up to batch_size rows and returns how many ---
+
+def _delete_user_posts(user_id, batch_size):
+    # Their reactions, comments and notifications are gone by the time this step runs
+    post_ids = [post_id for (post_id,) in db.session.query(Post.id)
+                .filter(Post.user_id == user_id)
+                .limit(batch_size)]
+    if not post_ids:
+        return 0
+
+    unindex_posts(post_ids)
+    db.session.execute(delete(PostStats).where(PostStats.post_id.in_(post_ids)))
+    db.session.execute(delete(Post).where(Post.id.in_(post_ids)))
+    for post_id in post_ids:
+        log_change('deleted', post_id, author_id=user_id)
+    return len(post_ids)
+
+def _delete_user_reactions(user_id, batch_size):
+    """The user's reactions on other posts, taken off those posts' counts and their authors' stats."""
+    rows = db.session.query(Reaction.post_id, Reaction.flags, Post.user_id)\
+        .outerjoin(Post, Post.id == Reaction.post_id)\
+        .filter(Reaction.user_id == user_id)\
+        .limit(batch_size)\
+        .all()
+    if not rows:
+        return 0
+
+    post_likes, post_retweets = Counter(), Counter()
+    author_likes, author_retweets = Counter(), Counter()
+    for post_id, flags, author_id in rows:
+        types = types_from_flags(flags)
+        if author_id is None:
+            continue  # Post already deleted
+        if 'LIKE' in types:
+            post_likes[post_id] += 1
+            author_likes[author_id] += 1
+        if 'RETWEET' in types:
+            post_retweets[post_id] += 1
+            author_retweets[author_id] += 1
+
+    db.session.execute(delete(Reaction).where(
+        Reaction.user_id == user_id, Reaction.post_id.in_([post_id for post_id, _, _ in rows])
+    ))
+    _subtract_counts(PostStats.like_count, PostStats.post_id, post_likes)
+    _subtract_counts(PostStats.retweet_count, PostStats.post_id, post_retweets)
+    _subtract_counts(UserStats.likes_received, UserStats.user_id, author_likes)
+    _subtract_counts(UserStats.retweets_received, UserStats.user_id, author_retweets)
+    return len(rows)
+
+def _delete_user_comments(user_id, batch_size):
+    """
+    The user's comments and the replies under their top-level ones, taken off the posts'
+    counts. Other users' replies go first, so a batch never grows past batch_size.
+    """
+    parent = aliased(Comment)
+    # Replies sit on their parent's post, which lets the join use ix_comment_post_parent_timestamp
+    removed = db.session.query(Comment.id, Comment.post_id)\
+        .join(parent, and_(parent.id == Comment.parent_id, parent.post_id == Comment.post_id))\
+        .filter(parent.user_id == user_id, Comment.user_id != user_id)\
+        .limit(batch_size)\
+        .all()
+    if not removed:
+        removed = db.session.query(Comment.id, Comment.post_id)\
+            .filter(Comment.user_id == user_id)\
+            .limit(batch_size)\
+            .all()
+    if not removed:
+        return 0
+
+    per_post = Counter(post_id for _, post_id in removed)
+    authors = dict(db.session.query(Post.id, Post.user_id).filter(Post.id.in_(list(per_post))))
+    per_author = Counter()
+    for post_id, count in per_post.items():
+        if post_id in authors:
+            per_author[authors[post_id]] += count
+
+    db.session.execute(delete(Comment).where(Comment.id.in_([comment_id for comment_id, _ in removed])))
+    _subtract_counts(PostStats.comment_count, PostStats.post_id, per_post)
+    _subtract_counts(UserStats.comments_received, UserStats.user_id, per_author)
+    return len(removed)
+
+def _delete_user_notifications(user_id, batch_size):
+    """Notifications to the user, and those they caused for others."""
+    rows = db.session.query(Notification.id, Notification.user_id, Notification.is_read)\
+        .filter(or_(Notification.user_id == user_id, Notification.actor_id == user_id))\
+        .limit(batch_size)\
+        .all()
+    if not rows:
+        return 0
+
+    db.session.execute(delete(Notification).where(Notification.id.in_([row[0] for row in rows])))
+    _release_unread([(recipient_id, is_read) for _, recipient_id, is_read in rows], skip_user_id=user_id)
+    return len(rows)
+
+def _delete_user_messages(user_id, batch_size):
+    message_ids = [message_id for (message_id,) in db.session.query(Message.id)
+                   .filter(or_(Message.sender_id == user_id, Message.recipient_id == user_id))
+                   .limit(batch_size)]
+    if message_ids:
+        db.session.execute(delete(Message).where(Message.id.in_(message_ids)))
+    return len(message_ids)
+
+def _delete_user_follows(user_id, batch_size):
+    """Follows in both directions, taken off the other side's counters."""
+    rows = db.session.query(Follow.id, Follow.follower_id, Follow.followed_id)\
+        .filter(or_(Follow.follower_id == user_id, Follow.followed_id == user_id))\
+        .limit(batch_size)\
+        .all()
+    if not rows:
+        return 0
+
+    lost_followers = Counter(followed_id for _, follower_id, followed_id in rows if follower_id == user_id)
+    lost_following = Counter(follower_id for _, follower_id, followed_id in rows if followed_id == user_id)
+
+    db.session.execute(delete(Follow).where(Follow.id.in_([row[0] for row in rows])))
+    _subtract_counts(UserStats.follower_count, UserStats.user_id, lost_followers)
+    _subtract_counts(UserStats.following_count, UserStats.user_id, lost_following)
+    for follower_id in lost_following:
+        # Their timelines lose this author
+        log_change('follows', user_id=follower_id)
+    return len(rows)
+
+def _delete_user_mentions(user_id, batch_size):
+    keys = db.session.query(PostMention.post_id)\
+        .filter(PostMention.user_id == user_id)\
+        .limit(batch_size)\
+        .all()
+    if keys:
+        db.session.execute(delete(PostMention).where(
+            PostMention.user_id == user_id, PostMention.post_id.in_([post_id for (post_id,) in keys])
+        ))
+    return len(keys)
+
+def _delete_user_row(user_id, batch_size):
+    if db.session.get(User, user_id) is None:
+        return 0
+
+    for model in (UserTrigram, UserStats):
+        db.session.execute(delete(model).where(model.user_id == user_id))
+    db.session.execute(delete(User).where(User.id == user_id))
+    return 1
+
+# Run in order; each step is only reached once the previous ones have nothing left,
+# so a job that is resumed simply continues with whatever remains
+USER_PURGE_STEPS = (
+    lambda user_id, batch_size: _delete_post_dependents(select(Post.id).where(Post.user_id == user_id), batch_size),
+    _delete_user_posts,
+    _delete_user_reactions,
+    _delete_user_comments,
+    _delete_user_notifications,
+    _delete_user_messages,
+    _delete_user_follows,
+    _delete_user_mentions,
+    archive_store.purge_user_batch,
+    _delete_user_row,
+)
+
+def _purge_user_batch(user_id, batch_size):
+    """Deletes the next batch of a tombstoned account's data. Returns the number deleted; 0 means it is all gone."""
+    for step in USER_PURGE_STEPS:
+        removed = step(user_id, batch_size)
+        if removed:
+            return removed
+    return 0
+
+def tombstone_user(user):
+    """
+    Marks an account deleted and queues the purge of its data, in the current
+    transaction. Returns the PurgeJob. Tombstoned users can't log in and are hidden
+    from search and profiles at once; their rows are removed by the purge worker.
+    """
+    user.deleted_at = datetime.utcnow()
+    db.session.execute(delete(UserTrigram).where(UserTrigram.user_id == user.id))
+    job = PurgeJob(kind='user', target_id=user.id)
+    db.session.add(job)
+    return job
+
+# Batch function for each PurgeJob.kind: (target_id, batch_size) -> rows deleted, 0 when done
+PURGE_HANDLERS = {
+    'post': _purge_post_batch,
+    'user': _purge_user_batch,
+}
+
+class PurgeWorker:
+    """
+    Per-process background runner for purge jobs.
+
+    Jobs are claimed with a conditional UPDATE, so with several workers each job runs
+    in one of them. A job deletes batch_size rows per transaction and pauses `pause`
+    seconds between batches, so it never holds SQLite's write lock for long. Progress
+    is committed with every batch; a job whose heartbeat is older than stale_after
+    seconds (its worker died) is claimed again and carries on from what is left.
+    The thread starts with a process's first request and also checks for work every
+    poll_interval seconds; `flask run-purge-jobs` drains the queue from the command line.
+    """
+
+    def __init__(self, batch_size=500, pause=0.05, poll_interval=30.0, stale_after=300.0):
+        self.batch_size = batch_size
+        self.pause = pause
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+
+        self._wakeup = threading.Event()
+        self._worker_pid = None
+        self._app = None
+
+    def init_app(self, app):
+        """Reads PURGE_* settings from the app config and starts the worker with the first request."""
+        self._app = app
+        self.batch_size = app.config.get('PURGE_BATCH_SIZE', self.batch_size)
+        self.pause = app.config.get('PURGE_BATCH_PAUSE', self.pause)
+        self.poll_interval = app.config.get('PURGE_POLL_INTERVAL', self.poll_interval)
+        self.stale_after = app.config.get('PURGE_STALE_AFTER', self.stale_after)
+
+        app.before_request(self._ensure_worker)
+
+    def wake(self):
+        """Asks the worker to look for jobs now (e.g. right after queueing one)."""
+        self._ensure_worker()
+        self._wakeup.set()
+
+    def _claimable(self, now):
+        return or_(
+            PurgeJob.status == 'pending',
+            and_(PurgeJob.status == 'running', PurgeJob.heartbeat_at < now - timedelta(seconds=self.stale_after))
+        )
+
+    def _claim(self):
+        """Claims the oldest runnable job and returns its id, or None."""
+        while True:
+            now = datetime.utcnow()
+            job_id = db.session.query(PurgeJob.id)\
+                .filter(self._claimable(now))\
+                .order_by(PurgeJob.id)\
+                .limit(1)\
+                .scalar()
+            if job_id is None:
+                return None
+
+            claimed = db.session.execute(
+                update(PurgeJob)
+                .where(PurgeJob.id == job_id, self._claimable(now))
+                .values(status='running', heartbeat_at=now)
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                return job_id
+
+    def run_job(self, job_id):
+        """Runs a claimed job to completion. Returns the number of rows it deleted in this run."""
+        job = db.session.get(PurgeJob, job_id)
+        handler = PURGE_HANDLERS[job.kind]
+        deleted = 0
+
+        while True:
+            try:
+                removed = handler(job.target_id, self.batch_size)
+                job.deleted_rows += removed
+                job.heartbeat_at = datetime.utcnow()
+                if not removed:
+                    job.status = 'done'
+                    job.finished_at = job.heartbeat_at
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                # Left 'running': the job is retried once its heartbeat goes stale
+                job.last_error = str(e)
+                db.session.commit()
+                raise
+
+            deleted += removed
+            if not removed:
+                return deleted
+            time.sleep(self.pause)
+
+    def run_pending(self):
+        """Claims and runs jobs until none are left. Must run inside an app context. Returns the number of jobs run."""
+        jobs = 0
+        while True:
+            job_id = self._claim()
+            if job_id is None:
+                return jobs
+            self.run_job(job_id)
+            jobs += 1
+
+    def _ensure_worker(self):
+        # Started lazily so each forked worker gets its own thread
+        if self._worker_pid == os.getpid() or self._app is None:
+            return
+
+        self._worker_pid = os.getpid()
+        threading.Thread(target=self._run_worker, name='purge-worker', daemon=True).start()
+
+    def _run_worker(self):
+        while True:
+            with self._app.app_context():
+                try:
+                    self.run_pending()
+                except Exception as e:
+                    print(f"Error running purge jobs: {e}")
+                finally:
+                    db.session.remove()
+
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+purge_worker = PurgeWorker()
@@ -0,0 +1,202 @@
+import math
+import threading
+import time
+from functools import wraps
+from flask import request, jsonify
+from flask_login import current_user
+from metrics import metrics
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+# Per endpoint group: token bucket per client IP and per user, as 'N/period'
+# (bursts of up to N, refilled at N per period). Overridden by the RATE_LIMITS config.
+# For 'login' the user key is the username being tried, so one account can't be
+# brute-forced from many addresses.
+RATE_LIMIT_DEFAULTS = {
+    'login': {'ip': '20/minute', 'user': '10/minute'},
+    'post': {'ip': '60/minute', 'user': '20/minute'},
+    'react': {'ip': '300/minute', 'user': '120/minute'},
+    'comment': {'ip': '120/minute', 'user': '30/minute'},
+    'message': {'ip': '120/minute', 'user': '60/minute'},
+    'export': {'ip': '30/hour', 'user': '10/hour'},
+}
+
+def parse_rate(rate):
+    """Parses 'N/period' into (capacity, tokens per second)."""
+    count, period = rate.split('/')
+    return int(count), int(count) / PERIODS[period.strip()]
+
+class RateLimited(Exception):
+    """Raised when a request is over a limit or shed; answered with 429 and Retry-After."""
+
+    def __init__(self, retry_after, message='Too many requests. Please slow down.'):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.message = message
+
+def handle_rate_limited(error):
+    response = jsonify({'success': False, 'message': error.message, 'retryAfter': error.retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+class RateLimitBackend:
+    """
+    Storage for token buckets. The in-memory backend limits each worker process on
+    its own (so the effective limit is per worker); a backend on a store shared by
+    every process, e.g. Redis with the refill-and-take below in a Lua script, makes
+    the limits global. take() must be atomic per key.
+    """
+
+    def take(self, key, capacity, rate, cost=1):
+        """
+        Takes `cost` tokens from bucket `key`, which holds up to `capacity` tokens and
+        refills at `rate` tokens per second. Returns 0 when they were taken, otherwise
+        the seconds until enough tokens will be there (nothing is taken then).
+        """
+        raise NotImplementedError
+
+class MemoryBackend(RateLimitBackend):
+    """Token buckets in a dict, per process. Full buckets are pruned once there are more than max_keys."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.buckets = {}   # key -> [tokens, updated_at, capacity, rate]
+
+    def take(self, key, capacity, rate, cost=1):
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                if len(self.buckets) >= self.max_keys:
+                    self._prune(now)
+                bucket = self.buckets[key] = [capacity, now, capacity, rate]
+
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if tokens >= cost:
+                bucket[0] = tokens - cost
+                return 0
+            bucket[0] = tokens
+            return (cost - tokens) / rate
+
+    def _prune(self, now):
+        # A bucket that has refilled completely is the same as no bucket
+        self.buckets = {
+            key: bucket for key, bucket in self.buckets.items()
+            if bucket[0] + (now - bucket[1]) * bucket[3] < bucket[2]
+        }
+
+class RateLimiter:
+    """
+    Token-bucket limits and write backpressure for the mutating endpoints.
+
+    Views opt in with @rate_limiter.limit('<group>'). A request is refused with 429
+    and Retry-After when its IP's or user's bucket for the group is empty, or, as
+    backpressure, when this process already has write_queue_limit writes in flight
+    or recent writes have been slower than write_latency_limit seconds (other
+    processes holding SQLite's write lock show up there). The latency signal decays
+    while no writes complete, so shedding stops by itself once the backlog clears.
+    Refusals are counted in metrics as ratelimit.throttled.<group> and ratelimit.shed.
+    """
+
+    def __init__(self, backend=None, write_queue_limit=32, write_latency_limit=2.0):
+        self.backend = backend or MemoryBackend()
+        self.enabled = True
+        self.rules = {}
+        self.write_queue_limit = write_queue_limit
+        self.write_latency_limit = write_latency_limit
+        self.latency_half_life = 1.0
+
+        self.lock = threading.Lock()
+        self.writes_in_flight = 0
+        self.write_latency = 0.0    # Moving average of write durations, in seconds
+        self.write_latency_at = 0.0
+        self.set_rules({})
+
+    def init_app(self, app):
+        """Reads RATE_LIMIT* and WRITE_* settings from the app config and registers the 429 handler."""
+        self.enabled = app.config.get('RATE_LIMIT_ENABLED', self.enabled)
+        self.write_queue_limit = app.config.get('WRITE_QUEUE_LIMIT', self.write_queue_limit)
+        self.write_latency_limit = app.config.get('WRITE_LATENCY_LIMIT', self.write_latency_limit)
+        self.set_rules(app.config.get('RATE_LIMITS', {}))
+        app.register_error_handler(RateLimited, handle_rate_limited)
+
+    def set_rules(self, overrides):
+        rules = {group: dict(limits) for group, limits in RATE_LIMIT_DEFAULTS.items()}
+        for group, limits in overrides.items():
+            rules.setdefault(group, {}).update(limits)
+        self.rules = {
+            group: {scope: parse_rate(rate) for scope, rate in limits.items() if rate}
+            for group, limits in rules.items()
+        }
+
+    def check(self, group, ip, user_key=None, cost=1):
+        """
+        Takes `cost` tokens (one per operation) from the group's IP and user buckets.
+        Raises RateLimited if either doesn't hold enough. A cost above a bucket's
+        capacity is charged as a full bucket, so it can still go through.
+        """
+        if not self.enabled:
+            return
+
+        limits = self.rules[group]
+        retry_after = 0
+        for scope, key in (('ip', ip), ('user', user_key)):
+            if scope in limits and key is not None:
+                capacity, rate = limits[scope]
+                retry_after = max(retry_after, self.backend.take(f"{group}:{scope}:{key}", capacity, rate, min(cost, capacity)))
+
+        if retry_after:
+            metrics.increment('ratelimit.throttled')
+            metrics.increment(f'ratelimit.throttled.{group}')
+            raise RateLimited(retry_after)
+
+    def _current_latency(self, now):
+        return self.write_latency * 0.5 ** ((now - self.write_latency_at) / self.latency_half_life)
+
+    def begin_write(self):
+        """Admits a write or raises RateLimited to shed it. Pair with end_write()."""
+        with self.lock:
+            overloaded = self.writes_in_flight >= self.write_queue_limit or \
+                self._current_latency(time.monotonic()) > self.write_latency_limit
+            if not overloaded:
+                self.writes_in_flight += 1
+                return time.monotonic()
+
+        metrics.increment('ratelimit.shed')
+        raise RateLimited(1, 'The server is busy. Please try again shortly.')
+
+    def end_write(self, started):
+        now = time.monotonic()
+        with self.lock:
+            self.writes_in_flight -= 1
+            self.write_latency = self._current_latency(now) * 0.8 + (now - started) * 0.2
+            self.write_latency_at = now
+
+    def limit(self, group, user_key=None, write=True, charge=True):
+        """
+        Decorator applying the group's limits, and write backpressure unless write=False,
+        to a view. user_key() returns the per-user bucket key; by default the logged-in
+        user's id, so put this below @login_required. With charge=False the view takes
+        its tokens itself with check(), e.g. one per operation of a batch.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if charge:
+                    key = user_key() if user_key else (current_user.id if current_user.is_authenticated else None)
+                    self.check(group, request.remote_addr, key)
+                if not (self.enabled and write):
+                    return view(*args, **kwargs)
+
+                started = self.begin_write()
+                try:
+                    return view(*args, **kwargs)
+                finally:
+                    self.end_write(started)
+            return wrapper
+        return decorator
+
+rate_limiter = RateLimiter()
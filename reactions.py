@@ -0,0 +1,203 @@
+from datetime import datetime
+from sqlalchemy import func, case, inspect, text, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, Reaction
+
+# Maps the API's reaction type names to their bit in Reaction.flags
+REACTION_FLAGS = {
+    'LIKE': Reaction.LIKE,
+    'RETWEET': Reaction.RETWEET,
+    'BOOKMARK': Reaction.BOOKMARK,
+}
+
+# The column recording when each reaction type was set
+REACTED_AT_COLUMNS = {
+    'LIKE': 'liked_at',
+    'RETWEET': 'retweeted_at',
+    'BOOKMARK': 'bookmarked_at',
+}
+
+def is_reaction_type(reaction_type):
+    """Checks whether reaction_type is one of 'LIKE', 'RETWEET' or 'BOOKMARK'."""
+    return reaction_type in REACTION_FLAGS
+
+def has_reaction(reaction_type):
+    """SQL expression that is true for rows with reaction_type set."""
+    return Reaction.flags.op('&')(REACTION_FLAGS[reaction_type]) != 0
+
+def reacted_at(reaction_type):
+    """The Reaction column holding when reaction_type was set (NULL when it is not set)."""
+    return getattr(Reaction, REACTED_AT_COLUMNS[reaction_type])
+
+def types_from_flags(flags):
+    """Expands a flags bitmask into the set of reaction type names it contains."""
+    return {reaction_type for reaction_type, flag in REACTION_FLAGS.items() if flags & flag}
+
+def get_viewer_reactions(user_id, post_ids):
+    """Returns {post_id: set of reaction types} that user_id has on each of post_ids, in one query."""
+    reactions = {post_id: set() for post_id in post_ids}
+    if not reactions:
+        return reactions
+
+    rows = db.session.query(Reaction.post_id, Reaction.flags).filter(
+        Reaction.user_id == user_id,
+        Reaction.post_id.in_(post_ids)
+    )
+
+    for post_id, flags in rows:
+        reactions[post_id] = types_from_flags(flags)
+
+    return reactions
+
+def get_reaction_counts(post_ids):
+    """Returns {post_id: {'likes': n, 'retweets': n}} for post_ids from one grouped query."""
+    counts = {post_id: {'likes': 0, 'retweets': 0} for post_id in post_ids}
+    if not counts:
+        return counts
+
+    rows = db.session.query(
+            Reaction.post_id,
+            func.count(case((has_reaction('LIKE'), 1))),
+            func.count(case((has_reaction('RETWEET'), 1)))
+        )\
+        .filter(Reaction.post_id.in_(post_ids))\
+        .group_by(Reaction.post_id)
+
+    for post_id, likes, retweets in rows:
+        counts[post_id] = {'likes': likes, 'retweets': retweets}
+
+    return counts
+
+def count_reactions(post_id, reaction_type):
+    """Counts the users who have reaction_type set on a post."""
+    return Reaction.query.filter(Reaction.post_id == post_id, has_reaction(reaction_type)).count()
+
+def set_reaction(user_id, post_id, reaction_type, state):
+    """
+    Sets or clears one reaction type for (user, post) in the current session; the caller commits.
+    Returns True if this changed anything, False if the reaction was already in that state.
+    """
+    flag = REACTION_FLAGS[reaction_type]
+    reaction = db.session.get(Reaction, (user_id, post_id))
+
+    if bool(reaction and reaction.flags & flag) == state:
+        return False
+
+    if state:
+        if reaction is None:
+            reaction = Reaction(user_id=user_id, post_id=post_id, flags=0)
+            db.session.add(reaction)
+        reaction.flags |= flag
+        setattr(reaction, REACTED_AT_COLUMNS[reaction_type], datetime.utcnow())
+    else:
+        reaction.flags &= ~flag
+        setattr(reaction, REACTED_AT_COLUMNS[reaction_type], None)
+        if reaction.flags == 0:
+            db.session.delete(reaction)
+
+    return True
+
+def toggle_reaction(user_id, post_id, reaction_type):
+    """Flips one reaction type for (user, post) in the current session. Returns the new state."""
+    reaction = db.session.get(Reaction, (user_id, post_id))
+    state = not (reaction and reaction.flags & REACTION_FLAGS[reaction_type])
+    set_reaction(user_id, post_id, reaction_type, state)
+    return state
+
+def set_reaction_states(user_id, states):
+    """
+    Applies {(post_id, reaction_type): state} for one user in the current transaction; the caller commits.
+    Existing rows are read with one query, changed rows are written with one upsert and rows
+    left without any flag are removed with one delete. Operations that already match the
+    stored state are no-ops, which makes retries safe.
+    Returns [(post_id, reaction_type, +1 or -1)] for the reactions that actually changed.
+    """
+    post_ids = {post_id for post_id, _ in states}
+    if not post_ids:
+        return []
+
+    rows = {
+        post_id: {'user_id': user_id, 'post_id': post_id, 'flags': 0,
+                  'liked_at': None, 'retweeted_at': None, 'bookmarked_at': None}
+        for post_id in post_ids
+    }
+
+    existing = db.session.query(
+            Reaction.post_id, Reaction.flags,
+            Reaction.liked_at, Reaction.retweeted_at, Reaction.bookmarked_at
+        )\
+        .filter(Reaction.user_id == user_id, Reaction.post_id.in_(post_ids))
+
+    for post_id, flags, liked_at, retweeted_at, bookmarked_at in existing:
+        rows[post_id].update(flags=flags, liked_at=liked_at,
+                             retweeted_at=retweeted_at, bookmarked_at=bookmarked_at)
+
+    now = datetime.utcnow()
+    changes = []
+
+    for (post_id, reaction_type), state in states.items():
+        row = rows[post_id]
+        flag = REACTION_FLAGS[reaction_type]
+
+        if bool(row['flags'] & flag) == state:
+            continue
+
+        row['flags'] ^= flag
+        row[REACTED_AT_COLUMNS[reaction_type]] = now if state else None
+        changes.append((post_id, reaction_type, 1 if state else -1))
+
+    changed_ids = {post_id for post_id, _, _ in changes}
+    upserts = [rows[post_id] for post_id in changed_ids if rows[post_id]['flags']]
+    cleared = [post_id for post_id in changed_ids if not rows[post_id]['flags']]
+
+    if upserts:
+        statement = sqlite_insert(Reaction)
+        db.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=['user_id', 'post_id'],
+                set_={column: statement.excluded[column]
+                      for column in ('flags', 'liked_at', 'retweeted_at', 'bookmarked_at')}
+            ),
+            upserts
+        )
+
+    if cleared:
+        db.session.execute(
+            delete(Reaction).where(Reaction.user_id == user_id, Reaction.post_id.in_(cleared))
+        )
+
+    return changes
+
+def migrate_legacy_reactions(drop_legacy=False):
+    """
+    Copies rows from the old one-row-per-type 'reaction' table into post_reaction,
+    folding each (user, post) pair's types into one flags value. Pairs that already
+    exist in post_reaction are merged flag by flag, so it is safe to re-run.
+    Returns the number of rows written, or None when there is no legacy table.
+    """
+    if 'reaction' not in inspect(db.engine).get_table_names():
+        return None
+
+    result = db.session.execute(text("""
+        INSERT INTO post_reaction (user_id, post_id, flags, liked_at, retweeted_at, bookmarked_at)
+        SELECT user_id,
+               post_id,
+               SUM(CASE type WHEN 'LIKE' THEN :like WHEN 'RETWEET' THEN :retweet WHEN 'BOOKMARK' THEN :bookmark END),
+               MAX(CASE WHEN type = 'LIKE' THEN COALESCE(timestamp, CURRENT_TIMESTAMP) END),
+               MAX(CASE WHEN type = 'RETWEET' THEN COALESCE(timestamp, CURRENT_TIMESTAMP) END),
+               MAX(CASE WHEN type = 'BOOKMARK' THEN COALESCE(timestamp, CURRENT_TIMESTAMP) END)
+        FROM reaction
+        WHERE type IN ('LIKE', 'RETWEET', 'BOOKMARK')
+        GROUP BY user_id, post_id
+        ON CONFLICT (user_id, post_id) DO UPDATE SET
+            flags = post_reaction.flags | excluded.flags,
+            liked_at = COALESCE(post_reaction.liked_at, excluded.liked_at),
+            retweeted_at = COALESCE(post_reaction.retweeted_at, excluded.retweeted_at),
+            bookmarked_at = COALESCE(post_reaction.bookmarked_at, excluded.bookmarked_at)
+    """), {'like': Reaction.LIKE, 'retweet': Reaction.RETWEET, 'bookmark': Reaction.BOOKMARK})
+
+    if drop_legacy:
+        db.session.execute(text('DROP TABLE reaction'))
+
+    db.session.commit()
+    return result.rowcount
@@ -0,0 +1,101 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex, CreateTable
+from models import db
+
+# Indexes and tables the models no longer define, dropped from databases that still have them
+OBSOLETE_INDEXES = (
+    'ix_user_username_lower',   # lower(username); replaced by user.lowered_username
+)
+OBSOLETE_TABLES = (
+    'trending_snapshot',        # one shared row per window; replaced by trending_worker_snapshot
+)
+
+def add_missing_columns():
+    """
+    Adds columns that exist on the models but not yet in the database, since
+    create_all() never alters existing tables. Only nullable columns can be added this
+    way; their existing rows start out NULL. Returns the 'table.column' names added.
+    """
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+
+            if not column.nullable:
+                raise RuntimeError(f"Cannot add NOT NULL column {table.name}.{column.name} to an existing table")
+
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            db.session.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+            added.append(f"{table.name}.{column.name}")
+
+    db.session.commit()
+    return added
+
+def missing_autoincrement():
+    """Names of the existing tables whose model asks for AUTOINCREMENT but that were created without it."""
+    with db.engine.connect() as connection:
+        created = dict(connection.execute(text("SELECT name, sql FROM sqlite_master WHERE type = 'table'")).all())
+
+    return [
+        table.name for table in db.metadata.sorted_tables
+        if table.dialect_options['sqlite']['autoincrement']
+        and table.name in created and 'AUTOINCREMENT' not in created[table.name].upper()
+    ]
+
+def add_autoincrement():
+    """
+    Rebuilds the tables from missing_autoincrement() with AUTOINCREMENT, which SQLite
+    can't add to an existing table: each is copied into a new table that replaces it,
+    with the next id picked up after the highest one it held. Their indexes are dropped
+    along with the old table; upgrade_schema() creates them again. Must run after
+    add_missing_columns(). Returns the names of the tables rebuilt.
+    """
+    names = missing_autoincrement()
+    tables = {table.name: table for table in db.metadata.sorted_tables}
+    preparer = db.engine.dialect.identifier_preparer
+
+    with db.engine.begin() as connection:
+        for name in names:
+            table = tables[name]
+            quoted, rebuilt = preparer.format_table(table), preparer.quote(f'{name}_rebuild')
+            create = str(CreateTable(table).compile(dialect=db.engine.dialect))
+            connection.execute(text(create.replace(f'CREATE TABLE {quoted} ', f'CREATE TABLE {rebuilt} ', 1)))
+
+            columns = ', '.join(preparer.quote(column.name) for column in table.columns)
+            connection.execute(text(f'INSERT INTO {rebuilt} ({columns}) SELECT {columns} FROM {quoted}'))
+            # Foreign keys aren't enforced, so other tables keep referencing the name
+            connection.execute(text(f'DROP TABLE {quoted}'))
+            connection.execute(text(f'ALTER TABLE {rebuilt} RENAME TO {quoted}'))
+
+    return names
+
+def upgrade_schema():
+    """
+    Brings the database up to date with the models: creates missing tables, then adds
+    missing columns, AUTOINCREMENT and indexes to the tables that already existed.
+    Returns the 'table.column' names added.
+    """
+    db.create_all()
+    added = add_missing_columns()
+    add_autoincrement()
+
+    # IF NOT EXISTS rather than checkfirst: reflection skips expression indexes,
+    # so checkfirst would try to create them again
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                connection.execute(CreateIndex(index, if_not_exists=True))
+        for name in OBSOLETE_INDEXES:
+            connection.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+        for name in OBSOLETE_TABLES:
+            connection.execute(text(f'DROP TABLE IF EXISTS "{name}"'))
+
+    return added
@@ -1,9 +1,11 @@
-from app import app
+from app import create_app
 from models import db, User, Post, Follow
+from user_search import index_users
 from datetime import datetime, timedelta
 import random
 
-def seed_database():
+def seed_database(app=None):
+    app = app or create_app()
     with app.app_context():
         print("🌱 Starting enhanced database seeding...")
         
@@ -34,6 +36,7 @@ def seed_database():
                 
                 db.session.add(new_user)
                 db.session.flush()  # Get the user ID without committing
+                index_users([new_user])
                 
                 created_users[user_data['username']] = new_user
                 print(f"   ✅ Created user: {user_data['username']}")
@@ -0,0 +1,76 @@
+import json
+import re
+import uuid
+from datetime import date, datetime
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional: the stdlib encoder is used instead
+    orjson = None
+
+# orjson can only embed pre-serialized JSON from 3.9.6 on
+BACKEND = 'orjson' if orjson is not None and hasattr(orjson, 'Fragment') else 'json'
+
+class RawJSON(bytes):
+    """Already serialized JSON (UTF-8), embedded verbatim wherever it appears in a dumps() payload."""
+
+def utc_isoformat(timestamp):
+    """Formats a naive UTC datetime (as stored by the models) as ISO 8601 with a Z suffix."""
+    return timestamp.isoformat() + 'Z'
+
+def _default(value):
+    if isinstance(value, datetime):
+        return utc_isoformat(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+if BACKEND == 'orjson':
+    def _orjson_default(value):
+        if isinstance(value, RawJSON):
+            return orjson.Fragment(bytes(value))
+        return _default(value)
+
+    def dumps(value):
+        """Serializes value to compact JSON bytes."""
+        return orjson.dumps(value, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
+else:
+    def dumps(value):
+        """Serializes value to compact JSON bytes."""
+        # json can't emit raw text, so each RawJSON is encoded as a unique placeholder
+        # string and spliced back into the output afterwards
+        fragments = []
+        markers = []
+
+        def default(value):
+            if isinstance(value, RawJSON):
+                if not markers:
+                    markers.append(uuid.uuid4().hex)
+                fragments.append(value)
+                return f"{markers[0]}{len(fragments) - 1}"
+            return _default(value)
+
+        encoded = json.dumps(value, default=default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        if not fragments:
+            return encoded
+        return re.sub(
+            f'"{markers[0]}(\\d+)"'.encode('ascii'),
+            lambda match: fragments[int(match.group(1))],
+            encoded
+        )
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by dumps(): orjson when it is installed, the stdlib
+    encoder otherwise. Responses are built straight from the encoded bytes.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj) + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,554 @@
+from flask import Blueprint, request, jsonify
+from flask_login import current_user, login_required
+from sqlalchemy import func
+from models import db, User, Post, Follow, Comment, Notification
+from stats import get_user_stats, bump_user_stats
+from notifications import mark_notifications_read
+from user_search import search_usernames
+from typeahead import username_typeahead
+from sync import log_change
+from pagination import get_page_size, encode_cursor, decode_cursor, get_cursor, fetch_page, keyset_before
+from auth import find_active_user
+from posts import serialize_posts, get_reacted_posts_page
+from archive import archive_store
+
+bp = Blueprint('social', __name__)
+
+# --- Profile API Route ---
+
+@bp.route('/api/profile/<username>', methods=['GET'])
+@login_required
+def get_profile(username):
+    """
+    Fetches a user's profile information and one page of their posts.
+    Profile counters come from the precomputed UserStats row; pass the returned
+    'next_cursor' as ?cursor= to load older posts.
+    """
+    payload, status = build_profile_payload(username)
+    return jsonify(payload), status
+
+def build_profile_payload(username):
+    """Builds the /api/profile/<username> response body, as (payload, HTTP status)."""
+    user = find_active_user(username)
+    
+    if user is None:
+        return {'success': False, 'message': f'User {username} not found.'}, 404
+    
+    stats = get_user_stats(user.id)
+    
+    is_following = Follow.query.filter_by(
+        follower_id=current_user.id,
+        followed_id=user.id
+    ).first() is not None
+    
+    limit = get_page_size()
+    cursor = get_cursor()
+    
+    query = Post.query.filter_by(user_id=user.id)
+    if cursor:
+        query = query.filter(keyset_before(Post.timestamp, Post.id, cursor))
+    
+    posts, next_cursor = fetch_page(
+        query.order_by(Post.timestamp.desc(), Post.id.desc()),
+        limit,
+        lambda post: (post.timestamp, post.id)
+    )
+    # Older posts may have been moved to the archive
+    posts, next_cursor = archive_store.extend_page('post', posts, next_cursor, cursor, limit, user.id)
+    
+    posts_list = serialize_posts([(post, user) for post in posts])
+    
+    profile_data = {
+        'username': user.username,
+        'handle': '@' + user.username,
+        'followerCount': stats.follower_count,
+        'followingCount': stats.following_count,
+        'postCount': stats.post_count,
+        'isFollowing': is_following,
+        'isOwnProfile': user.id == current_user.id,
+        'joinedDate': user.created_at.strftime('%B %Y') if hasattr(user, 'created_at') and user.created_at else 'Unknown',
+        'totalLikes': stats.likes_received,
+        'totalRetweets': stats.retweets_received,
+        'totalComments': stats.comments_received,
+        'profileImage': f"/static/{user.profile_image}" if user.profile_image else '/static/uploads/default-avatar.jpg',
+        'bannerImage': f"/static/{user.banner_image}" if user.banner_image else None,
+    }
+    
+    return {
+        'success': True,
+        'profile': profile_data,
+        'posts': posts_list,
+        'next_cursor': next_cursor
+    }, 200
+
+@bp.route('/api/notifications', methods=['GET'])
+@login_required
+def api_load_notifications():
+    """
+    Fetches one page of the current user's notifications, newest first.
+    Pass the returned next_cursor as ?before to load older ones. Reading does not mark
+    anything as read: the client posts the first page's high_water_mark to
+    /api/notifications/read once it has shown them.
+    """
+    before = get_cursor('before')
+    limit = get_page_size()
+    
+    query = db.session.query(Notification, User.username.label('actor_username'))\
+        .join(User, Notification.actor_id == User.id)\
+        .filter(Notification.user_id == current_user.id)
+    
+    if before:
+        query = query.filter(keyset_before(Notification.timestamp, Notification.id, before))
+    
+    notifications, next_cursor = fetch_page(
+        query.order_by(Notification.timestamp.desc(), Notification.id.desc()),
+        limit,
+        lambda row: (row[0].timestamp, row[0].id)
+    )
+
+    notifications_list = []
+    for notification, actor_username in notifications:
+        notifications_list.append({
+            'id': notification.id,
+            'post_id': notification.post_id,
+            'actor_id': notification.actor_id,
+            'actor_username': actor_username,
+            'type': notification.type, 
+            'group_count': notification.group_count or 1,
+            'is_read': notification.is_read,
+            'timestamp': notification.timestamp.isoformat() 
+        })
+
+    high_water_mark = None
+    if notifications and not before:
+        newest = notifications[0][0]
+        high_water_mark = encode_cursor(newest.timestamp, newest.id)
+
+    return jsonify({
+        'success': True, 
+        'notifications': notifications_list,
+        'next_cursor': next_cursor,
+        'high_water_mark': high_water_mark
+    })
+
+@bp.route('/api/notifications/unread_count', methods=['GET'])
+@login_required
+def get_unread_notification_count():
+    """Returns the current user's unread notification count from their stats row."""
+    return jsonify({
+        'success': True,
+        'unreadCount': get_user_stats(current_user.id).unread_notifications
+    })
+
+@bp.route('/api/notifications/read', methods=['POST'])
+@login_required
+def mark_notifications_read_route():
+    """
+    Marks notifications as read.
+    Expects {"until": <high_water_mark>} to mark everything up to that notification;
+    without it, every notification is marked read.
+    """
+    data = request.get_json(silent=True) or {}
+    until = data.get('until')
+    
+    marked = mark_notifications_read(current_user.id, decode_cursor(until) if until else None)
+    db.session.commit()
+    
+    return jsonify({
+        'success': True,
+        'marked': marked,
+        'unreadCount': get_user_stats(current_user.id).unread_notifications
+    })
+
+# --- Profile Interaction Endpoints (Liked, Retweeted, Commented) ---
+
+@bp.route('/api/profile/<username>/liked', methods=['GET'])
+@login_required
+def get_user_liked_posts(username):
+    """
+    Fetches one page of posts that the user has liked, most recently liked first.
+    """
+    user = find_active_user(username)
+    
+    if user is None:
+        return jsonify({'success': False, 'message': f'User {username} not found.'}), 404
+    
+    rows, next_cursor = get_reacted_posts_page(user, 'LIKE')
+    
+    return jsonify({
+        'success': True,
+        'posts': serialize_posts(rows),
+        'next_cursor': next_cursor
+    })
+
+@bp.route('/api/profile/<username>/retweeted', methods=['GET'])
+@login_required
+def get_user_retweeted_posts(username):
+    """
+    Fetches one page of posts that the user has retweeted, most recently retweeted first.
+    """
+    user = find_active_user(username)
+    
+    if user is None:
+        return jsonify({'success': False, 'message': f'User {username} not found.'}), 404
+    
+    rows, next_cursor = get_reacted_posts_page(user, 'RETWEET')
+    
+    return jsonify({
+        'success': True,
+        'posts': serialize_posts(rows),
+        'next_cursor': next_cursor
+    })
+
+@bp.route('/api/profile/<username>/commented', methods=['GET'])
+@login_required
+def get_user_commented_posts(username):
+    """
+    Fetches one page of posts that the user has commented on.
+    Each post appears once, ordered by the user's latest comment on it.
+    """
+    user = find_active_user(username)
+    
+    if user is None:
+        return jsonify({'success': False, 'message': f'User {username} not found.'}), 404
+    
+    limit = get_page_size()
+    cursor = get_cursor()
+    
+    last_commented = db.session.query(
+            Comment.post_id.label('post_id'),
+            func.max(Comment.timestamp).label('last_commented_at')
+        )\
+        .filter(Comment.user_id == user.id)\
+        .group_by(Comment.post_id)\
+        .subquery()
+    
+    query = db.session.query(Post, User, last_commented.c.last_commented_at)\
+        .join(last_commented, last_commented.c.post_id == Post.id)\
+        .join(User, User.id == Post.user_id)
+    
+    if cursor:
+        query = query.filter(keyset_before(last_commented.c.last_commented_at, Post.id, cursor))
+    
+    rows, next_cursor = fetch_page(
+        query.order_by(last_commented.c.last_commented_at.desc(), Post.id.desc()),
+        limit,
+        lambda row: (row[2], row[0].id)
+    )
+    
+    return jsonify({
+        'success': True,
+        'posts': serialize_posts([(post, author) for post, author, _ in rows]),
+        'next_cursor': next_cursor
+    })
+
+@bp.route('/api/follow', methods=['POST'])
+@login_required
+def toggle_follow():
+    data = request.get_json()
+    target_username = data.get('username')
+    
+    target_user = find_active_user(target_username)
+
+    if target_user is None:
+        return jsonify({'success': False, 'message': 'User not found'}), 404
+        
+    if target_user.id == current_user.id:
+        return jsonify({'success': False, 'message': 'Cannot follow yourself'}), 400
+
+    follow_relationship = Follow.query.filter_by(
+        follower_id=current_user.id, 
+        followed_id=target_user.id
+    ).first()
+
+    if follow_relationship:
+        db.session.delete(follow_relationship)
+        bump_user_stats(current_user.id, following_count=-1)
+        bump_user_stats(target_user.id, follower_count=-1)
+        log_change('follows', user_id=current_user.id)
+        db.session.commit()
+        username_typeahead.update_user(target_user.id, follower_delta=-1)
+        return jsonify({
+            'success': True, 
+            'action': 'unfollowed', 
+            'message': f'Unfollowed {target_username}'
+        })
+    else:
+        new_follow = Follow(follower_id=current_user.id, followed_id=target_user.id)
+        db.session.add(new_follow)
+        bump_user_stats(current_user.id, following_count=1)
+        bump_user_stats(target_user.id, follower_count=1)
+        log_change('follows', user_id=current_user.id)
+        db.session.commit()
+        username_typeahead.update_user(target_user.id, follower_delta=1)
+        return jsonify({
+            'success': True, 
+            'action': 'followed', 
+            'message': f'Now following {target_username}'
+        })
+
+@bp.route('/api/follow', methods=['GET'])
+@login_required
+def get_following():
+    """
+    Returns a list of users the current user is following.
+    This list will be used to populate the 'Start a new message' section.
+    """
+    
+    following_users = [
+        follow.followed 
+        for follow in current_user.following_relationships
+    ]
+    
+    following_list = [
+        {
+            'id': user.id,
+            'username': user.username,
+            'profile_image': user.profile_image or 'uploads/default-avatar.jpg',
+        }
+        for user in following_users
+    ]
+    
+    return jsonify({'success': True, 'following': following_list})
+
+@bp.route('/api/typeahead', methods=['GET'])
+@login_required
+def typeahead():
+    """
+    Completes a username prefix from the in-memory index, most followed users first.
+    Expected usage: GET /api/typeahead?q=al&limit=8
+    """
+    query = request.args.get('q', '').strip().lstrip('@')
+    limit = max(1, request.args.get('limit', 8, type=int))
+    
+    return jsonify({
+        'success': True,
+        'users': username_typeahead.complete(query, limit=limit, exclude_user_id=current_user.id)
+    })
+
+@bp.route('/api/users/search', methods=['GET'])
+@login_required
+def search_users():
+    """
+    Searches users by username prefix for the new-message picker.
+    Served from the same in-memory index as /api/typeahead.
+    """
+    query = request.args.get('q', '').strip()
+    
+    if not query:
+        return jsonify({'success': True, 'users': []})
+
+    return jsonify({
+        'success': True,
+        'users': username_typeahead.complete(query, limit=10, exclude_user_id=current_user.id)
+    })
+
+def get_followed_ids(follower_id, user_ids):
+    """
+    Returns the subset of user_ids that follower_id follows.
+    Resolves the follow state for a whole page of users in one query.
+    """
+    if not user_ids:
+        return set()
+    
+    rows = db.session.query(Follow.followed_id).filter(
+        Follow.follower_id == follower_id,
+        Follow.followed_id.in_(user_ids)
+    ).all()
+    
+    return {followed_id for (followed_id,) in rows}
+
+def serialize_user_relationship(user_obj, is_following):
+    """
+    Helper function to serialize user data for relationship lists.
+    is_following says whether the current logged-in user follows this user.
+    """
+    return {
+        'username': user_obj.username,
+        'user_id': user_obj.id,
+        'isFollowing': is_following,
+        'profile_image': user_obj.profile_image or 'uploads/default-avatar.jpg',
+    }
+
+@bp.route('/api/relationships/<view_type>/<username>', methods=['GET'])
+@login_required
+def get_relationships(view_type, username):
+    """
+    Fetches one page of users that the target user is following or is followed by.
+    view_type can be 'following' or 'followers'.
+    Pages are ordered newest follow first; pass the returned 'next_cursor' as ?cursor= to continue.
+    """
+    target_user = find_active_user(username)
+    
+    if target_user is None:
+        return jsonify({'success': False, 'message': f'User {username} not found.'}), 404
+
+    if view_type == 'following':
+        owner_column, listed_column = Follow.follower_id, Follow.followed_id
+
+    elif view_type == 'followers':
+        owner_column, listed_column = Follow.followed_id, Follow.follower_id
+        
+    else:
+        return jsonify({'success': False, 'message': 'Invalid relationship view type.'}), 400
+
+    limit = get_page_size()
+    cursor = get_cursor()
+
+    query = db.session.query(User, Follow.timestamp, Follow.id)\
+        .join(Follow, listed_column == User.id)\
+        .filter(owner_column == target_user.id)
+
+    if cursor:
+        query = query.filter(keyset_before(Follow.timestamp, Follow.id, cursor))
+
+    rows, next_cursor = fetch_page(
+        query.order_by(Follow.timestamp.desc(), Follow.id.desc()),
+        limit,
+        lambda row: (row[1], row[2])
+    )
+
+    followed_ids = get_followed_ids(current_user.id, [user.id for user, _, _ in rows])
+
+    serialized_users = [
+        serialize_user_relationship(user, user.id in followed_ids) 
+        for user, _, _ in rows
+    ]
+    
+    return jsonify({
+        'success': True,
+        'users': serialized_users,
+        'next_cursor': next_cursor,
+        'current_user': current_user.username,
+        'profile_image': current_user.profile_image or 'uploads/default-avatar.jpg',
+    })
+
+
+@bp.route('/api/search_user', methods=['GET'])
+@login_required
+def search_user():
+    """
+    Searches for a user based on a partial or full username query.
+    Expected usage: GET /api/search_user?q=alice
+    """
+    query = request.args.get('q')
+    
+    if not query:
+        return jsonify({'success': False, 'message': 'Search query cannot be empty.'}), 400
+
+    user = find_active_user(query)
+    
+    if user is None:
+         user = User.query.filter(User.username.ilike(query), User.deleted_at.is_(None)).first()
+
+    if user is None:
+        return jsonify({'success': True, 'user': None}) 
+
+    if user.id == current_user.id:
+        return jsonify({'success': True, 'user': None})
+        
+    is_following = Follow.query.filter_by(
+        follower_id=current_user.id,
+        followed_id=user.id
+    ).first() is not None
+    
+    user_data = {
+        'username': user.username,
+        'user_id': user.id,
+        'isFollowing': is_following,
+        'profile_image': user.profile_image or 'uploads/default-avatar.jpg',
+    }
+    
+    return jsonify({
+        'success': True,
+        'user': user_data
+    })
+
+@bp.route('/api/search', methods=['GET'])
+@login_required
+def search():
+    """
+    Universal search endpoint that searches for both users and posts.
+    Expected usage: GET /api/search?q=query&type=users OR GET /api/search?q=query&type=chirps
+    """
+    query = request.args.get('q', '').strip()
+    search_type = request.args.get('type', 'users')  
+    
+    if not query:
+        return jsonify({'success': False, 'message': 'Search query cannot be empty'}), 400
+    
+    if search_type == 'users':
+        users = search_usernames(query, exclude_user_id=current_user.id, limit=20)
+        followed_ids = get_followed_ids(current_user.id, [user.id for user in users])
+        
+        users_list = []
+        for user in users:
+            users_list.append({
+                'username': user.username,
+                'user_id': user.id,
+                'profile_image': user.profile_image or 'uploads/default-avatar.jpg',
+                'isFollowing': user.id in followed_ids
+            })
+        
+        return jsonify({
+            'success': True,
+            'results': users_list,
+            'type': 'users'
+        })
+    
+    elif search_type == 'chirps':
+        rows = db.session.query(Post, User)\
+            .join(User, User.id == Post.user_id)\
+            .filter(Post.content.ilike(f'%{query}%'))\
+            .order_by(Post.timestamp.desc())\
+            .limit(20)\
+            .all()
+        
+        posts_list = serialize_posts(rows)
+        
+        return jsonify({
+            'success': True,
+            'results': posts_list,
+            'type': 'chirps'
+        })
+    
+    else:
+        return jsonify({'success': False, 'message': 'Invalid search type'}), 400
+
+@bp.route('/api/remove_follower', methods=['POST'])
+@login_required
+def remove_follower():
+    """
+    Allows the current logged-in user to remove a specific user from their list of followers.
+    The current user is the 'followed_id', and the target is the 'follower_id'.
+    """
+    data = request.get_json()
+    follower_username = data.get('follower_username')
+    
+    target_follower = User.query.filter_by(username=follower_username).first()
+
+    if target_follower is None:
+        return jsonify({'success': False, 'message': 'Target user not found'}), 404
+        
+    if target_follower.id == current_user.id:
+        return jsonify({'success': False, 'message': 'Cannot remove yourself'}), 400
+
+    follow_relationship = Follow.query.filter_by(
+        follower_id=target_follower.id, 
+        followed_id=current_user.id 
+    ).first()
+
+    if follow_relationship is None:
+        return jsonify({'success': False, 'message': f'{follower_username} is not following you.'}), 400
+
+    db.session.delete(follow_relationship)
+    bump_user_stats(target_follower.id, following_count=-1)
+    bump_user_stats(current_user.id, follower_count=-1)
+    log_change('follows', user_id=target_follower.id)
+    db.session.commit()
+    username_typeahead.update_user(current_user.id, follower_delta=-1)
+    
+    return jsonify({
+        'success': True, 
+        'message': f'Successfully removed {follower_username} as a follower.'
+    })
@@ -9,6 +9,192 @@ const PROFILE_HEADER_ID = 'profile-header';
 const PROFILE_POST_COUNT_ID = 'profile-post-count';               
 const BOOKMARKS_CONTAINER_ID = 'bookmarks-container';
 
+/**
+ * Calls onVisible whenever the end of `container` scrolls into view.
+ * Used by paginated lists to fetch their next page. Returns the observer so
+ * callers can disconnect it once there are no more pages.
+ */
+function setupInfiniteScroll(container, onVisible) {
+    let sentinel = container.nextElementSibling;
+    if (!sentinel || !sentinel.classList.contains('scroll-sentinel')) {
+        sentinel = document.createElement('div');
+        sentinel.className = 'scroll-sentinel';
+        container.after(sentinel);
+    }
+
+    const observer = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) {
+            onVisible();
+        }
+    }, { rootMargin: '400px' });
+
+    observer.observe(sentinel);
+    return observer;
+}
+
+/**
+ * Returns the page data the server embedded for this view (the same payload as the
+ * view's API endpoint), or null. It only describes the page as served, so it is
+ * handed out once and later reloads go to the API.
+ */
+function takeInitialData() {
+    const script = document.getElementById('initial-data');
+    if (!script) return null;
+    
+    script.remove();
+    try {
+        return JSON.parse(script.textContent);
+    } catch (error) {
+        console.error('Error reading embedded page data:', error);
+        return null;
+    }
+}
+
+/**
+ * Formats an API timestamp (ISO 8601, UTC) in the viewer's time zone, e.g. "Oct 05".
+ * withTime adds the year and time: "Oct 05, 2025 at 08:30 PM".
+ */
+function formatPostTimestamp(timestamp, withTime = false) {
+    const date = new Date(timestamp);
+    if (isNaN(date)) return '';
+    
+    const day = date.toLocaleDateString('en-US', { month: 'short', day: '2-digit' });
+    if (!withTime) return day;
+    
+    const time = date.toLocaleTimeString('en-US', { hour: '2-digit', minute: '2-digit' });
+    return `${day}, ${date.getFullYear()} at ${time}`;
+}
+
+/**
+ * Returns a version of fn that only runs once calls have stopped for `wait` ms.
+ */
+function debounce(fn, wait) {
+    let timer = null;
+    return (...args) => {
+        clearTimeout(timer);
+        timer = setTimeout(() => fn(...args), wait);
+    };
+}
+
+// --- Username Typeahead ---
+
+const TYPEAHEAD_DEBOUNCE_MS = 150;
+const TYPEAHEAD_CACHE_TTL_MS = 60000;
+const TYPEAHEAD_CACHE_SIZE = 100;
+const typeaheadCache = new Map();
+
+/**
+ * Fetches username completions for a prefix from /api/typeahead.
+ * Results are cached per prefix for a minute, so retyping or backspacing is free.
+ */
+async function fetchTypeahead(prefix) {
+    const key = prefix.toLowerCase();
+    const cached = typeaheadCache.get(key);
+    if (cached && Date.now() - cached.time < TYPEAHEAD_CACHE_TTL_MS) {
+        return cached.users;
+    }
+
+    const response = await fetch(`/api/typeahead?q=${encodeURIComponent(prefix)}`);
+    const data = await response.json();
+    const users = data.success ? data.users : [];
+
+    typeaheadCache.set(key, { users, time: Date.now() });
+    if (typeaheadCache.size > TYPEAHEAD_CACHE_SIZE) {
+        typeaheadCache.delete(typeaheadCache.keys().next().value);
+    }
+    return users;
+}
+
+/**
+ * Adds @mention autocomplete to a textarea: typing @ and a few letters shows
+ * matching usernames; arrow keys, Enter/Tab or a click insert the selection.
+ */
+function setupMentionAutocomplete(textarea) {
+    if (!textarea || textarea.dataset.mentionAutocomplete) return;
+    textarea.dataset.mentionAutocomplete = 'true';
+
+    const menu = document.createElement('ul');
+    menu.className = 'mention-suggestions';
+    menu.hidden = true;
+    textarea.after(menu);
+
+    let suggestions = [];
+    let selected = 0;
+
+    const currentMention = () => {
+        const beforeCaret = textarea.value.slice(0, textarea.selectionStart);
+        const match = beforeCaret.match(/(^|\s)@(\w+)$/);
+        return match ? { prefix: match[2], start: beforeCaret.length - match[2].length - 1 } : null;
+    };
+
+    const hide = () => {
+        menu.hidden = true;
+        suggestions = [];
+    };
+
+    const render = () => {
+        menu.innerHTML = suggestions.map((user, index) => `
+            <li class="${index === selected ? 'selected' : ''}" data-index="${index}">@${user.username}</li>
+        `).join('');
+        menu.hidden = suggestions.length === 0;
+    };
+
+    const insert = (user) => {
+        const mention = currentMention();
+        if (!mention) return hide();
+
+        const caret = textarea.selectionStart;
+        const replacement = `@${user.username} `;
+        textarea.value = textarea.value.slice(0, mention.start) + replacement + textarea.value.slice(caret);
+        textarea.selectionStart = textarea.selectionEnd = mention.start + replacement.length;
+        textarea.focus();
+        hide();
+    };
+
+    const update = debounce(async () => {
+        const mention = currentMention();
+        if (!mention) return hide();
+
+        try {
+            const users = await fetchTypeahead(mention.prefix);
+            // Ignore results for a prefix the user has already typed past
+            const latest = currentMention();
+            if (!latest || latest.prefix !== mention.prefix) return;
+
+            suggestions = users;
+            selected = 0;
+            render();
+        } catch (error) {
+            console.error('Error loading mention suggestions:', error);
+        }
+    }, TYPEAHEAD_DEBOUNCE_MS);
+
+    textarea.addEventListener('input', update);
+    textarea.addEventListener('blur', () => setTimeout(hide, 150));
+
+    textarea.addEventListener('keydown', (event) => {
+        if (menu.hidden || suggestions.length === 0) return;
+
+        if (event.key === 'ArrowDown' || event.key === 'ArrowUp') {
+            event.preventDefault();
+            selected = (selected + (event.key === 'ArrowDown' ? 1 : suggestions.length - 1)) % suggestions.length;
+            render();
+        } else if (event.key === 'Enter' || event.key === 'Tab') {
+            event.preventDefault();
+            insert(suggestions[selected]);
+        } else if (event.key === 'Escape') {
+            hide();
+        }
+    });
+
+    menu.addEventListener('mousedown', (event) => {
+        const item = event.target.closest('li');
+        if (!item) return;
+        event.preventDefault();
+        insert(suggestions[Number(item.dataset.index)]);
+    });
+}
+
 /**
  * Creates and returns the inner HTML for a post's action buttons.
  * This function is used by createPostElement and when updating a post's reactions.
@@ -166,70 +352,137 @@ async function handleNewChirp(event) {
     }
 }
 
-async function handleReaction(event) {
+function handleReaction(event) {
     const actionButton = event.currentTarget;
     const postElement = actionButton.closest('.post');
     const postId = postElement.dataset.postId;
     const reactionType = actionButton.dataset.reactionType;
     
-    const iconElement = actionButton.querySelector('i');
-    let countElement = actionButton.querySelector('span');
-
-    const activeClass = `active-${reactionType}`;
-    
     if (reactionType === 'COMMENT') {
         showCommentModal(postId);
         return;
     }
     
-    console.log(`Attempting Reaction: ${reactionType} on Post ID: ${postId}`);
+    const newState = !actionButton.classList.contains('active');
+    const countElement = actionButton.querySelector('span');
+    const currentCount = parseInt(countElement.textContent, 10) || 0;
+    
+    // Update every copy of the post right away; the server's answer corrects the counts on flush
+    document.querySelectorAll(`.post[data-post-id="${postId}"] .action-button[data-reaction-type="${reactionType}"]`).forEach(button => {
+        renderReactionButton(button, reactionType, newState, reactionType === 'BOOKMARK' ? undefined : currentCount + (newState ? 1 : -1));
+    });
 
+    if (reactionType === 'BOOKMARK' && window.location.pathname.startsWith('/bookmarks') && !newState) {
+         postElement.remove(); 
+    }
+    
+    queueReaction(postId, reactionType, newState);
+}
+
+/**
+ * Shows a reaction button as set or unset, optionally with a new count.
+ */
+function renderReactionButton(actionButton, reactionType, active, count) {
+    const iconElement = actionButton.querySelector('i');
+    const countElement = actionButton.querySelector('span');
+    
+    actionButton.classList.toggle('active', active);
+    actionButton.classList.toggle(`active-${reactionType}`, active);
+    
+    if (iconElement && reactionType !== 'RETWEET') {
+        iconElement.classList.toggle('fas', active);
+        iconElement.classList.toggle('far', !active);
+    }
+    
+    if (countElement && count !== undefined) {
+        countElement.textContent = count > 0 ? count : '';
+    }
+}
+
+// --- Reaction Batching ---
+// Clicks are applied to the page immediately and sent to /api/reactions/batch in groups.
+// Each queued entry is the state the user wants, so repeated clicks collapse into one
+// operation and a retried batch cannot flip anything back.
+
+const REACTION_FLUSH_DELAY_MS = 400;
+const REACTION_BATCH_LIMIT = 50;
+const pendingReactions = new Map();
+let reactionFlushTimer = null;
+
+function queueReaction(postId, reactionType, state) {
+    pendingReactions.set(`${postId}:${reactionType}`, { postId: Number(postId), type: reactionType, state });
+    
+    clearTimeout(reactionFlushTimer);
+    if (pendingReactions.size >= REACTION_BATCH_LIMIT) {
+        flushReactions();
+    } else {
+        reactionFlushTimer = setTimeout(flushReactions, REACTION_FLUSH_DELAY_MS);
+    }
+}
+
+function takePendingReactions() {
+    clearTimeout(reactionFlushTimer);
+    reactionFlushTimer = null;
+    
+    const operations = Array.from(pendingReactions.values());
+    pendingReactions.clear();
+    return operations;
+}
+
+async function flushReactions() {
+    const operations = takePendingReactions();
+    if (operations.length === 0) return;
+    
     try {
-        const response = await fetch('/api/react', { 
-            method: 'POST', 
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ postId, reactionType }) 
+        const response = await fetch('/api/reactions/batch', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ operations })
         });
         
         const data = await response.json();
-
+        
         if (response.ok && data.success) {
-            const newCount = data.newCount;
-
-            if (data.toggled) {
-                actionButton.classList.add('active', activeClass);
-                
-                if (iconElement) {
-                    iconElement.classList.remove('far');
-                    iconElement.classList.add('fas');
-                }
-                
-            } else {
-                actionButton.classList.remove('active', activeClass);
-                
-                if (iconElement && reactionType !== 'RETWEET') {
-                    iconElement.classList.remove('fas');
-                    iconElement.classList.add('far');
-                }
-            }
-            
-            countElement.textContent = newCount > 0 ? newCount : '';
-
-            if (reactionType === 'BOOKMARK' && window.location.pathname.startsWith('/bookmarks') && !data.toggled) {
-                 postElement.remove(); 
-            }
-
+            Object.entries(data.posts).forEach(([postId, postState]) => {
+                applyServerReactionState(postId, postState);
+            });
         } else {
             alert(`Error processing reaction: ${data.message || 'Server error'}`);
         }
     } catch (error) {
-        console.error('Error handling reaction:', error);
+        console.error('Error sending reactions:', error);
         alert('Network error while reacting to post.');
     }
 }
 
+/**
+ * Renders the server's final state for a post, skipping reactions the user has
+ * changed again since the batch was sent.
+ */
+function applyServerReactionState(postId, postState) {
+    const reactionStates = {
+        LIKE: [postState.isLiked, postState.likes],
+        RETWEET: [postState.isRetweeted, postState.retweets],
+        BOOKMARK: [postState.isBookmarked, undefined],
+    };
+    
+    Object.entries(reactionStates).forEach(([reactionType, [active, count]]) => {
+        if (pendingReactions.has(`${postId}:${reactionType}`)) return;
+        
+        document.querySelectorAll(`.post[data-post-id="${postId}"] .action-button[data-reaction-type="${reactionType}"]`).forEach(button => {
+            renderReactionButton(button, reactionType, active, count);
+        });
+    });
+}
+
+// Don't lose queued reactions when the user navigates away
+window.addEventListener('pagehide', () => {
+    const operations = takePendingReactions();
+    if (operations.length > 0) {
+        navigator.sendBeacon('/api/reactions/batch', new Blob([JSON.stringify({ operations })], { type: 'application/json' }));
+    }
+});
+
 // --- Delete Post Handler ---
 async function handleDeletePost(event) {
     event.stopPropagation(); 
@@ -291,7 +544,7 @@ function createPostElement(postData) {
                 <div class="post-header">
                     <span class="username clickable-username" data-username="${postData.username}">${postData.username}</span>
                     <span class="handle">${postData.handle}</span>
-                    <span class="handle time">· ${postData.time}</span>
+                    <span class="handle time">· ${postData.time || formatPostTimestamp(postData.timestamp)}</span>
                     ${postData.canDelete ? `
                         <button class="delete-post-btn" data-post-id="${postData.id}" title="Delete chirp">
                             <i class="fa-solid fa-trash"></i>
@@ -338,6 +591,9 @@ function createPostElement(postData) {
 // --- Comment Modal Functions ---
 let commentModalInitialized = false; 
 
+// Paging state for the comments currently shown in the modal
+let commentsState = { postId: null, nextCursor: null, loading: false, replyTo: null };
+
 function setupCommentModal() {
     if (commentModalInitialized) return; 
     
@@ -364,6 +620,11 @@ function setupCommentModal() {
     if (commentForm) {
         commentForm.addEventListener('submit', submitComment);
     }
+    
+    const commentsList = document.getElementById('comments-list');
+    if (commentsList) {
+        commentsList.addEventListener('click', handleCommentsListClick);
+    }
 }
 
 function showCommentModal(postId) {
@@ -373,42 +634,170 @@ function showCommentModal(postId) {
     modal.style.display = 'block';
     modal.dataset.postId = postId;
     
+    setReplyTarget(null);
     loadComments(postId);
 }
 
+function createCommentHTML(comment) {
+    const isTopLevel = comment.parentId === null;
+    const replyCount = comment.replyCount || 0;
+    
+    return `
+        <div class="comment" data-comment-id="${comment.id}">
+            <div class="comment-header">
+                <a href="/profile/${comment.username}">
+                    <strong>${comment.username}</strong>
+                </a>
+                <span class="handle">${comment.handle}</span>
+                <span class="time">${formatPostTimestamp(comment.timestamp, true)}</span>
+                ${comment.canDelete ? `
+                    <button class="delete-comment-btn" data-comment-id="${comment.id}">
+                        <i class="fa-solid fa-trash"></i>
+                    </button>
+                ` : ''}
+            </div>
+            <div class="comment-content">${comment.content}</div>
+            <div class="comment-actions">
+                <button class="reply-comment-btn" data-comment-id="${isTopLevel ? comment.id : comment.parentId}" data-username="${comment.username}">Reply</button>
+                ${isTopLevel ? `
+                    <button class="view-replies-btn" data-comment-id="${comment.id}" data-reply-count="${replyCount}" ${replyCount > 0 ? '' : 'hidden'}>
+                        View ${replyCount} ${replyCount === 1 ? 'reply' : 'replies'}
+                    </button>
+                ` : ''}
+            </div>
+            ${isTopLevel ? `<div class="comment-replies" data-comment-id="${comment.id}"></div>` : ''}
+        </div>
+    `;
+}
+
+function renderCommentsPage(container, comments, nextCursor, moreLabel) {
+    container.querySelector(':scope > .load-more-comments')?.remove();
+    container.insertAdjacentHTML('beforeend', comments.map(createCommentHTML).join(''));
+    
+    if (nextCursor) {
+        container.insertAdjacentHTML('beforeend', `<button class="load-more-comments">${moreLabel}</button>`);
+    }
+}
+
 async function loadComments(postId) {
+    commentsState = { postId, nextCursor: null, loading: false, replyTo: commentsState.replyTo };
+    
+    const commentsList = document.getElementById('comments-list');
+    if (!commentsList) return;
+    
+    commentsList.innerHTML = '';
+    await loadMoreComments();
+    
+    if (commentsState.postId === postId && !commentsList.querySelector('.comment')) {
+        commentsList.innerHTML = '<p class="no-comments" style="padding: 20px; text-align: center; color: #666;">No comments yet. Be the first to comment!</p>';
+    }
+}
+
+async function loadMoreComments() {
+    const state = commentsState;
+    if (state.loading) return;
+    state.loading = true;
+    
     try {
-        const response = await fetch(`/api/posts/${postId}/comments`);
+        const params = new URLSearchParams();
+        if (state.nextCursor) params.set('cursor', state.nextCursor);
+        
+        const response = await fetch(`/api/posts/${state.postId}/comments?${params}`);
         const data = await response.json();
         
+        // The modal may have been reopened on another post meanwhile
+        if (state !== commentsState || !data.success) return;
+        
         const commentsList = document.getElementById('comments-list');
         if (!commentsList) return;
         
-        if (data.success && data.comments.length > 0) {
-            commentsList.innerHTML = data.comments.map(comment => `
-                <div class="comment" data-comment-id="${comment.id}">
-                    <div class="comment-header">
-                        <a href="/profile/${comment.username}">
-                            <strong>${comment.username}</strong>
-                        </a>
-                        <span class="handle">${comment.handle}</span>
-                        <span class="time">${comment.time}</span>
-                        ${comment.canDelete ? `
-                            <button class="delete-comment-btn" data-comment-id="${comment.id}">
-                                <i class="fa-solid fa-trash"></i>
-                            </button>
-                        ` : ''}
-                    </div>
-                    <div class="comment-content">${comment.content}</div>
-                </div>
-            `).join('');
-            
-            attachDeleteCommentListeners();
-        } else {
-            commentsList.innerHTML = '<p style="padding: 20px; text-align: center; color: #666;">No comments yet. Be the first to comment!</p>';
-        }
+        state.nextCursor = data.next_cursor;
+        renderCommentsPage(commentsList, data.comments, data.next_cursor, 'Show more comments');
+        updateCommentCount(state.postId, data.commentCount);
     } catch (error) {
         console.error('Error loading comments:', error);
+    } finally {
+        state.loading = false;
+    }
+}
+
+async function loadReplies(commentId, cursor = null) {
+    const repliesContainer = document.querySelector(`.comment-replies[data-comment-id="${commentId}"]`);
+    if (!repliesContainer || repliesContainer.dataset.loading) return;
+    repliesContainer.dataset.loading = 'true';
+    
+    try {
+        const params = new URLSearchParams({ parent_id: commentId });
+        if (cursor) params.set('cursor', cursor);
+        
+        const response = await fetch(`/api/posts/${commentsState.postId}/comments?${params}`);
+        const data = await response.json();
+        
+        if (data.success) {
+            renderCommentsPage(repliesContainer, data.comments, data.next_cursor, 'Show more replies');
+            repliesContainer.dataset.nextCursor = data.next_cursor || '';
+            repliesContainer.dataset.loaded = 'true';
+        }
+    } catch (error) {
+        console.error('Error loading replies:', error);
+    } finally {
+        delete repliesContainer.dataset.loading;
+    }
+}
+
+function setReplyTarget(target) {
+    commentsState.replyTo = target;
+    
+    const form = document.getElementById('comment-form');
+    if (!form) return;
+    
+    let banner = form.querySelector('.replying-to');
+    if (!target) {
+        banner?.remove();
+        return;
+    }
+    
+    if (!banner) {
+        banner = document.createElement('div');
+        banner.className = 'replying-to';
+        form.prepend(banner);
+    }
+    banner.innerHTML = `Replying to @${target.username} <button type="button" class="cancel-reply-btn">Cancel</button>`;
+    banner.querySelector('.cancel-reply-btn').onclick = () => setReplyTarget(null);
+    document.getElementById('comment-input')?.focus();
+}
+
+function setReplyCount(commentId, count) {
+    const button = document.querySelector(`.view-replies-btn[data-comment-id="${commentId}"]`);
+    if (!button) return;
+    
+    button.dataset.replyCount = count;
+    button.textContent = `View ${count} ${count === 1 ? 'reply' : 'replies'}`;
+    button.hidden = count === 0;
+}
+
+async function handleCommentsListClick(event) {
+    const target = event.target.closest('button');
+    if (!target) return;
+    
+    if (target.classList.contains('load-more-comments')) {
+        const repliesContainer = target.closest('.comment-replies');
+        if (repliesContainer) {
+            loadReplies(repliesContainer.dataset.commentId, repliesContainer.dataset.nextCursor);
+        } else {
+            loadMoreComments();
+        }
+    } else if (target.classList.contains('view-replies-btn')) {
+        const repliesContainer = document.querySelector(`.comment-replies[data-comment-id="${target.dataset.commentId}"]`);
+        if (repliesContainer?.dataset.loaded) {
+            repliesContainer.hidden = !repliesContainer.hidden;
+        } else {
+            loadReplies(target.dataset.commentId);
+        }
+    } else if (target.classList.contains('reply-comment-btn')) {
+        setReplyTarget({ commentId: Number(target.dataset.commentId), username: target.dataset.username });
+    } else if (target.classList.contains('delete-comment-btn')) {
+        deleteComment(target.dataset.commentId);
     }
 }
 
@@ -426,52 +815,73 @@ async function submitComment(event) {
     
     if (!content) return;
     
+    const replyTo = commentsState.replyTo;
+    
     try {
         const response = await fetch(`/api/posts/${postId}/comments`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ content })
+            body: JSON.stringify({ content, parentId: replyTo ? replyTo.commentId : null })
         });
         
         const data = await response.json();
         
         if (data.success) {
             contentInput.value = '';
-            loadComments(postId);
+            setReplyTarget(null);
             updateCommentCount(postId, data.newCommentCount);
+            
+            if (replyTo) {
+                const repliesContainer = document.querySelector(`.comment-replies[data-comment-id="${data.comment.parentId}"]`);
+                const button = document.querySelector(`.view-replies-btn[data-comment-id="${data.comment.parentId}"]`);
+                setReplyCount(data.comment.parentId, Number(button?.dataset.replyCount || 0) + 1);
+                
+                // Only append once the thread's loaded pages reach its end, so replies stay in order
+                if (repliesContainer?.dataset.loaded && !repliesContainer.dataset.nextCursor) {
+                    repliesContainer.insertAdjacentHTML('beforeend', createCommentHTML(data.comment));
+                    repliesContainer.hidden = false;
+                }
+            } else if (!commentsState.nextCursor) {
+                const commentsList = document.getElementById('comments-list');
+                commentsList?.querySelector('.no-comments')?.remove();
+                commentsList?.insertAdjacentHTML('beforeend', createCommentHTML(data.comment));
+            }
         }
     } catch (error) {
         console.error('Error submitting comment:', error);
     }
 }
 
-function attachDeleteCommentListeners() {
-    document.querySelectorAll('.delete-comment-btn').forEach(button => {
-        button.addEventListener('click', async function() {
-            const commentId = this.dataset.commentId;
-            const modal = document.getElementById('comment-modal');
-            if (!modal) return;
-            
-            const postId = modal.dataset.postId;
+async function deleteComment(commentId) {
+    const modal = document.getElementById('comment-modal');
+    if (!modal) return;
+    
+    const postId = modal.dataset.postId;
+    
+    if (!confirm('Delete this comment?')) return;
+    
+    try {
+        const response = await fetch(`/api/comments/${commentId}`, {
+            method: 'DELETE'
+        });
+        
+        const data = await response.json();
+        
+        if (data.success) {
+            const commentElement = document.querySelector(`.comment[data-comment-id="${commentId}"]`);
+            const repliesContainer = commentElement?.parentElement.closest('.comment-replies');
+            commentElement?.remove();
             
-            if (confirm('Delete this comment?')) {
-                try {
-                    const response = await fetch(`/api/comments/${commentId}`, {
-                        method: 'DELETE'
-                    });
-                    
-                    const data = await response.json();
-                    
-                    if (data.success) {
-                        loadComments(postId);
-                        updateCommentCount(postId, data.newCommentCount);
-                    }
-                } catch (error) {
-                    console.error('Error deleting comment:', error);
-                }
+            if (repliesContainer) {
+                const button = document.querySelector(`.view-replies-btn[data-comment-id="${repliesContainer.dataset.commentId}"]`);
+                setReplyCount(repliesContainer.dataset.commentId, Math.max(0, Number(button?.dataset.replyCount || 0) - 1));
             }
-        });
-    });
+            
+            updateCommentCount(postId, data.newCommentCount);
+        }
+    } catch (error) {
+        console.error('Error deleting comment:', error);
+    }
 }
 
 function updateCommentCount(postId, count) {
@@ -576,38 +986,236 @@ function setupChirpModal() {
     }
 }
 
+// --- Timeline Cache (IndexedDB) ---
+// The timeline's posts are kept in IndexedDB together with the sync token they are
+// current as of, so a visit renders from the local store straight away and then only
+// fetches what changed since (the delta sync of GET /api/bootstrap and /api/sync). Without IndexedDB the timeline is
+// simply fetched every time.
+const TIMELINE_CACHE_DB = 'chirp-cache';
+let timelineCacheDb = null;
+
+function idbRequest(request) {
+    return new Promise((resolve, reject) => {
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+function openTimelineCache() {
+    if (!timelineCacheDb) {
+        timelineCacheDb = new Promise(resolve => {
+            if (!window.indexedDB) {
+                resolve(null);
+                return;
+            }
+            const request = indexedDB.open(TIMELINE_CACHE_DB, 1);
+            request.onupgradeneeded = () => {
+                request.result.createObjectStore('posts', { keyPath: 'id' });
+                request.result.createObjectStore('meta');
+            };
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => resolve(null);  // e.g. private browsing: run uncached
+        });
+    }
+    return timelineCacheDb;
+}
+
+// Returns { token, userId, posts } or null when nothing is cached
+async function readTimelineCache() {
+    try {
+        const db = await openTimelineCache();
+        if (!db) return null;
+        
+        const tx = db.transaction(['posts', 'meta'], 'readonly');
+        const [meta, posts] = await Promise.all([
+            idbRequest(tx.objectStore('meta').get('timeline')),
+            idbRequest(tx.objectStore('posts').getAll())
+        ]);
+        return meta ? { ...meta, posts } : null;
+    } catch (error) {
+        console.error('Error reading timeline cache:', error);
+        return null;
+    }
+}
+
+// Stores posts (replacing the cached set when replace is true) and the new token
+async function writeTimelineCache(meta, posts, deletedIds = [], replace = false) {
+    try {
+        const db = await openTimelineCache();
+        if (!db) return;
+        
+        const tx = db.transaction(['posts', 'meta'], 'readwrite');
+        const store = tx.objectStore('posts');
+        if (replace) store.clear();
+        deletedIds.forEach(id => store.delete(id));
+        posts.forEach(post => store.put(post));
+        tx.objectStore('meta').put(meta, 'timeline');
+        
+        await new Promise((resolve, reject) => {
+            tx.oncomplete = resolve;
+            tx.onerror = () => reject(tx.error);
+        });
+    } catch (error) {
+        console.error('Error writing timeline cache:', error);
+    }
+}
+
+// Applies a /api/sync delta to the cached posts; returns the posts that changed
+function applyTimelineDelta(cachedPosts, delta) {
+    const postsById = new Map(cachedPosts.map(post => [post.id, post]));
+    const updated = [];
+    
+    delta.posts.forEach(post => {
+        postsById.set(post.id, post);
+        updated.push(post);
+    });
+    
+    Object.entries(delta.counts).forEach(([id, counts]) => {
+        const post = postsById.get(Number(id));
+        if (!post) return;
+        Object.assign(post, counts);
+        updated.push(post);
+    });
+    
+    Object.entries(delta.reactions).forEach(([id, state]) => {
+        const post = postsById.get(Number(id));
+        if (!post) return;
+        Object.assign(post, state);
+        updated.push(post);
+    });
+    
+    delta.deleted.forEach(id => postsById.delete(id));
+    return { posts: [...postsById.values()], updated };
+}
+
+function renderTimelinePosts(timeline, posts) {
+    if (posts.length > 0) {
+        timeline.innerHTML = '';
+        // Post ids increase with creation time, so this is newest first
+        [...posts].sort((a, b) => b.id - a.id).forEach(postData => {
+            timeline.appendChild(createPostElement(postData));
+        });
+    } else {
+        timeline.innerHTML = '<p style="padding: 20px; text-align: center; color: #666;">No chirps to show. Follow users to see their chirps!</p>';
+    }
+}
+
 // --- Timeline Page Functions ---
+let timelineState = null;
+
 async function loadTimeline() {
     const timeline = document.getElementById(TIMELINE_ID);
     if (!timeline) return;
     
+    // A server-rendered page carries the first timeline page already
+    const initial = takeInitialData();
+    const cached = await readTimelineCache();
+    if (cached && !initial) {
+        renderTimelinePosts(timeline, cached.posts);
+    }
+    
     try {
-        const response = await fetch('/api/posts');
-        const data = await response.json();
+        let data = initial;
+        if (!data) {
+            // One round trip for the timeline, the sidebar badges and the viewer
+            const since = cached ? cached.token : '';
+            const response = await fetch(`/api/bootstrap?since=${since}`);
+            data = await response.json();
+        }
+        if (!data.success) throw new Error(data.message);
         
-        if (data.success && data.posts.length > 0) {
-            timeline.innerHTML = '';
-            data.posts.forEach(postData => {
-                const postElement = createPostElement(postData);
-                timeline.appendChild(postElement);
-            });
+        renderNotificationBadge(data.unreadNotifications);
+        renderMessageBadge(data.unreadMessages);
+        
+        let delta = data.timeline;
+        if (!delta.reset && (!cached || cached.userId !== data.viewer.id)) {
+            // A delta for someone else's cache: start over from the first page
+            const pageResponse = await fetch('/api/posts');
+            const page = await pageResponse.json();
+            if (!page.success) throw new Error(page.message);
+            delta = { reset: true, token: delta.token, posts: page.posts, next_cursor: page.next_cursor };
+        }
+        
+        const meta = { token: delta.token, userId: data.viewer.id };
+        let posts;
+        if (delta.reset) {
+            posts = delta.posts;
+            meta.nextCursor = delta.next_cursor;
+            renderTimelinePosts(timeline, posts);
+            await writeTimelineCache(meta, posts, [], true);
         } else {
-            timeline.innerHTML = '<p style="padding: 20px; text-align: center; color: #666;">No chirps to show. Follow users to see their chirps!</p>';
+            const applied = applyTimelineDelta(cached.posts, delta);
+            posts = applied.posts;
+            meta.nextCursor = cached.nextCursor;
+            if (applied.updated.length > 0 || delta.deleted.length > 0) {
+                renderTimelinePosts(timeline, posts);
+            }
+            await writeTimelineCache(meta, applied.updated, delta.deleted);
         }
+        
+        startTimelineScroll(timeline, meta);
     } catch (error) {
         console.error('Error loading timeline:', error);
-        timeline.innerHTML = '<p style="padding: 20px; text-align: center; color: red;">Error loading timeline.</p>';
+        if (!cached) {
+            timeline.innerHTML = '<p style="padding: 20px; text-align: center; color: red;">Error loading timeline.</p>';
+        }
+    }
+}
+
+function startTimelineScroll(timeline, meta) {
+    if (timelineState && timelineState.observer) {
+        timelineState.observer.disconnect();
+    }
+    
+    timelineState = { meta, loading: false, observer: null };
+    if (meta.nextCursor) {
+        timelineState.observer = setupInfiniteScroll(timeline, loadMoreTimeline);
+    }
+}
+
+async function loadMoreTimeline() {
+    const state = timelineState;
+    if (!state || state.loading || !state.meta.nextCursor) return;
+    
+    state.loading = true;
+    try {
+        const response = await fetch(`/api/posts?cursor=${encodeURIComponent(state.meta.nextCursor)}`);
+        const data = await response.json();
+        
+        if (state !== timelineState || !data.success) return;
+        
+        const timeline = document.getElementById(TIMELINE_ID);
+        data.posts.forEach(postData => {
+            timeline.appendChild(createPostElement(postData));
+        });
+        
+        state.meta.nextCursor = data.next_cursor;
+        await writeTimelineCache(state.meta, data.posts);
+        
+        if (!data.next_cursor && state.observer) {
+            state.observer.disconnect();
+            state.observer = null;
+        }
+    } catch (error) {
+        console.error('Error loading more posts:', error);
+    } finally {
+        state.loading = false;
     }
 }
 
 // --- Bookmarks Page Functions ---
+let bookmarksState = null;
+
 async function loadBookmarks() {
     const container = document.getElementById(BOOKMARKS_CONTAINER_ID);
     if (!container) return;
     
     try {
-        const response = await fetch('/api/bookmarks');
-        const data = await response.json();
+        let data = takeInitialData();
+        if (!data) {
+            const response = await fetch('/api/bookmarks');
+            data = await response.json();
+        }
         
         if (data.success && data.posts.length > 0) {
             container.innerHTML = '';
@@ -615,6 +1223,11 @@ async function loadBookmarks() {
                 const postElement = createPostElement(postData);
                 container.appendChild(postElement);
             });
+            
+            bookmarksState = { nextCursor: data.next_cursor, loading: false, observer: null };
+            if (data.next_cursor) {
+                bookmarksState.observer = setupInfiniteScroll(container, loadMoreBookmarks);
+            }
         } else {
             container.innerHTML = '<p style="padding: 20px; text-align: center; color: #666;">No bookmarks yet. Start bookmarking chirps!</p>';
         }
@@ -624,6 +1237,33 @@ async function loadBookmarks() {
     }
 }
 
+async function loadMoreBookmarks() {
+    const state = bookmarksState;
+    if (!state || state.loading || !state.nextCursor) return;
+    
+    state.loading = true;
+    try {
+        const response = await fetch(`/api/bookmarks?cursor=${encodeURIComponent(state.nextCursor)}`);
+        const data = await response.json();
+        if (!data.success) return;
+        
+        const container = document.getElementById(BOOKMARKS_CONTAINER_ID);
+        data.posts.forEach(postData => {
+            container.appendChild(createPostElement(postData));
+        });
+        
+        state.nextCursor = data.next_cursor;
+        if (!data.next_cursor && state.observer) {
+            state.observer.disconnect();
+            state.observer = null;
+        }
+    } catch (error) {
+        console.error('Error loading more bookmarks:', error);
+    } finally {
+        state.loading = false;
+    }
+}
+
 // --- Initialization ---
 document.addEventListener('DOMContentLoaded', () => {
     
@@ -678,6 +1318,8 @@ document.addEventListener('DOMContentLoaded', () => {
 /* --- PROFILE PAGE LOGIC --- */
 
 let currentProfileUsername = null;
+let currentProfilePostCount = 0;
+let profilePostsState = null;
 
 async function loadProfile(username) {
     currentProfileUsername = username; 
@@ -685,7 +1327,6 @@ async function loadProfile(username) {
     const profileDetailsContainer = document.getElementById(PROFILE_DETAILS_CONTAINER_ID);
     const profilePostsContainer = document.getElementById(PROFILE_POSTS_CONTAINER_ID);
     const profileHeaderElement = document.getElementById(PROFILE_HEADER_ID);
-    const profilePostCountElement = document.getElementById(PROFILE_POST_COUNT_ID);
 
     if (!profileDetailsContainer || !profilePostsContainer || !profileHeaderElement) {
         console.log('Profile containers not found in the DOM.');
@@ -696,10 +1337,13 @@ async function loadProfile(username) {
     profilePostsContainer.innerHTML = '';
 
     try {
-        const response = await fetch(`/api/profile/${username}`);
-        const data = await response.json();
+        let data = takeInitialData();
+        if (!data) {
+            const response = await fetch(`/api/profile/${username}`);
+            data = await response.json();
+        }
 
-        if (!response.ok || !data.success) {
+        if (!data.success) {
             profileHeaderElement.innerHTML = '<h2>Not Found</h2><p>User not found.</p>';
             profileDetailsContainer.innerHTML = '<p style="padding: 20px; text-align: center; color: red;">This user does not exist.</p>';
             return;
@@ -789,16 +1433,9 @@ async function loadProfile(username) {
         if (totalRetweetsElement) totalRetweetsElement.textContent = profile.totalRetweets || 0;
         if (totalCommentsElement) totalCommentsElement.textContent = profile.totalComments || 0;
 
-        const posts = data.posts;
-        if (posts.length === 0) {
-            profilePostsContainer.innerHTML = '<p style="padding: 20px; text-align: center;">This user has not posted anything yet.</p>';
-        } else {
-            profilePostCountElement.textContent = `${posts.length} Chirp${posts.length === 1 ? '' : 's'}`;
-            posts.forEach(postData => {
-                const postElement = createPostElement(postData);
-                profilePostsContainer.appendChild(postElement);
-            });
-        }
+        currentProfilePostCount = profile.postCount;
+        startProfilePosts(username, 'chirps');
+        appendProfilePosts(data);
 
     } catch (error) {
         console.error('Error loading profile:', error);
@@ -825,81 +1462,120 @@ function setupProfileTabs(username) {
     });
 }
 
+const PROFILE_TABS = {
+    chirps: { path: '', emptyMessage: () => 'This user has not posted anything yet.' },
+    liked: { path: '/liked', emptyMessage: (username) => `${username} hasn't liked any chirps yet.` },
+    retweeted: { path: '/retweeted', emptyMessage: (username) => `${username} hasn't retweeted any chirps yet.` },
+    commented: { path: '/commented', emptyMessage: (username) => `${username} hasn't commented on any chirps yet.` },
+};
+
+/**
+ * Resets the profile posts list for a tab. Any page still in flight for the
+ * previous tab is ignored when it arrives.
+ */
+function startProfilePosts(username, tabType) {
+    if (profilePostsState && profilePostsState.observer) {
+        profilePostsState.observer.disconnect();
+    }
+
+    const tab = PROFILE_TABS[tabType] || PROFILE_TABS.chirps;
+    profilePostsState = {
+        username: username,
+        tabType: tabType,
+        endpoint: `/api/profile/${username}${tab.path}`,
+        emptyMessage: tab.emptyMessage(username),
+        isFirstPage: true,
+        nextCursor: null,
+        loading: false,
+        observer: null
+    };
+    return profilePostsState;
+}
+
+/**
+ * Renders one page of profile posts and arms infinite scroll for the next one.
+ */
+function appendProfilePosts(data) {
+    const state = profilePostsState;
+    const profilePostsContainer = document.getElementById(PROFILE_POSTS_CONTAINER_ID);
+    const profilePostCountElement = document.getElementById(PROFILE_POST_COUNT_ID);
+    if (!state || !profilePostsContainer) return;
+
+    if (state.isFirstPage) {
+        state.isFirstPage = false;
+        profilePostsContainer.innerHTML = '';
+
+        if (profilePostCountElement) {
+            profilePostCountElement.textContent = state.tabType === 'chirps'
+                ? `${currentProfilePostCount} Chirp${currentProfilePostCount === 1 ? '' : 's'}`
+                : '';
+        }
+
+        if (data.posts.length === 0) {
+            profilePostsContainer.innerHTML = `<p style="padding: 20px; text-align: center;">${state.emptyMessage}</p>`;
+        }
+    }
+
+    data.posts.forEach(postData => {
+        profilePostsContainer.appendChild(createPostElement(postData));
+    });
+
+    state.nextCursor = data.next_cursor || null;
+
+    if (state.nextCursor && !state.observer) {
+        state.observer = setupInfiniteScroll(profilePostsContainer, loadMoreProfilePosts);
+    } else if (!state.nextCursor && state.observer) {
+        state.observer.disconnect();
+        state.observer = null;
+    }
+}
+
+/**
+ * Fetches the next page of the active profile tab.
+ */
+async function loadMoreProfilePosts() {
+    const state = profilePostsState;
+    if (!state || state.loading || !state.nextCursor) return;
+
+    state.loading = true;
+    try {
+        const response = await fetch(`${state.endpoint}?cursor=${encodeURIComponent(state.nextCursor)}`);
+        const data = await response.json();
+
+        if (state !== profilePostsState) return;
+
+        if (data.success) {
+            appendProfilePosts(data);
+        }
+    } catch (error) {
+        console.error('Error loading more profile posts:', error);
+    } finally {
+        state.loading = false;
+    }
+}
+
 // Load posts based on tab type
 async function loadProfilePosts(username, tabType) {
     const profilePostsContainer = document.getElementById(PROFILE_POSTS_CONTAINER_ID);
-    const profilePostCountElement = document.getElementById(PROFILE_POST_COUNT_ID);
     
     if (!profilePostsContainer) return;
     
     profilePostsContainer.innerHTML = '<p style="padding: 20px; text-align: center;">Loading...</p>';
     
+    const state = startProfilePosts(username, tabType);
+    
     try {
-        let endpoint = '';
-        let tabLabel = '';
-        
-        switch(tabType) {
-            case 'chirps':
-                endpoint = `/api/profile/${username}`;
-                tabLabel = 'Chirp';
-                break;
-            case 'liked':
-                endpoint = `/api/profile/${username}/liked`;
-                tabLabel = 'Liked chirp';
-                break;
-            case 'retweeted':
-                endpoint = `/api/profile/${username}/retweeted`;
-                tabLabel = 'Retweeted chirp';
-                break;
-            case 'commented':
-                endpoint = `/api/profile/${username}/commented`;
-                tabLabel = 'Commented chirp';
-                break;
-            default:
-                endpoint = `/api/profile/${username}`;
-                tabLabel = 'Chirp';
-        }
-        
-        const response = await fetch(endpoint);
+        const response = await fetch(state.endpoint);
         const data = await response.json();
         
+        if (state !== profilePostsState) return;
+        
         if (!data.success) {
             profilePostsContainer.innerHTML = `<p style="padding: 20px; text-align: center; color: red;">Error loading posts.</p>`;
             return;
         }
         
-        const posts = tabType === 'chirps' ? data.posts : data.posts;
-        
-        if (posts.length === 0) {
-            let emptyMessage = '';
-            switch(tabType) {
-                case 'chirps':
-                    emptyMessage = 'This user has not posted anything yet.';
-                    break;
-                case 'liked':
-                    emptyMessage = `${username} hasn't liked any chirps yet.`;
-                    break;
-                case 'retweeted':
-                    emptyMessage = `${username} hasn't retweeted any chirps yet.`;
-                    break;
-                case 'commented':
-                    emptyMessage = `${username} hasn't commented on any chirps yet.`;
-                    break;
-            }
-            profilePostsContainer.innerHTML = `<p style="padding: 20px; text-align: center;">${emptyMessage}</p>`;
-            if (profilePostCountElement) {
-                profilePostCountElement.textContent = '';
-            }
-        } else {
-            profilePostsContainer.innerHTML = '';
-            if (profilePostCountElement) {
-                profilePostCountElement.textContent = `${posts.length} ${tabLabel}${posts.length === 1 ? '' : 's'}`;
-            }
-            posts.forEach(postData => {
-                const postElement = createPostElement(postData);
-                profilePostsContainer.appendChild(postElement);
-            });
-        }
+        appendProfilePosts(data);
         
     } catch (error) {
         console.error('Error loading profile posts:', error);
@@ -1046,7 +1722,8 @@ function createUserElement(userData, viewType, canRemove) {
 }
 
 /**
- * Loads the list of following or followers for the target user.
+ * Loads the first page of following or followers for the target user.
+ * Further pages are fetched by loadMoreRelationships as the list scrolls.
  */
 async function loadRelationships() {
     const pathParts = window.location.pathname.split('/');
@@ -1057,41 +1734,80 @@ async function loadRelationships() {
     if (!listContainer) return;
     listContainer.innerHTML = '<p style="padding: 20px; text-align: center;">Loading list...</p>';
 
+    window.relationshipsData = {
+        users: [],
+        viewType: viewType,
+        currentUsername: null,
+        targetUsername: targetUsername,
+        query: '',
+        nextCursor: null,
+        loading: false,
+        observer: null
+    };
+
+    await loadMoreRelationships();
+
+    if (viewType === 'followers') {
+        setupFollowersSearch();
+    }
+}
+
+/**
+ * Fetches the next page of the relationships list and appends it.
+ */
+async function loadMoreRelationships() {
+    const state = window.relationshipsData;
+    const listContainer = document.getElementById('relationships-list-container');
+    if (!state || !listContainer || state.loading) return;
+
+    const isFirstPage = state.users.length === 0 && !state.nextCursor;
+    state.loading = true;
+
     try {
-        const response = await fetch(`/api/relationships/${viewType}/${targetUsername}`);
+        const params = new URLSearchParams();
+        if (state.nextCursor) params.set('cursor', state.nextCursor);
+
+        const response = await fetch(`/api/relationships/${state.viewType}/${state.targetUsername}?${params}`);
         const data = await response.json();
 
-        listContainer.innerHTML = '';
-        
         if (!data.success) {
             listContainer.innerHTML = `<p style="padding: 20px; text-align: center; color: red;">Error: ${data.message}</p>`;
             return;
         }
-        
-        const usersList = data.users;
-        const currentUsername = data.current_user; 
-        
-        if (usersList.length === 0) {
-             listContainer.innerHTML = `<p style="padding: 20px; text-align: center;">${targetUsername} has no ${viewType} yet.</p>`;
-             return;
+
+        state.currentUsername = data.current_user;
+        state.nextCursor = data.next_cursor;
+
+        if (isFirstPage) {
+            listContainer.innerHTML = '';
+
+            if (data.users.length === 0) {
+                listContainer.innerHTML = `<p style="padding: 20px; text-align: center;">${state.targetUsername} has no ${state.viewType} yet.</p>`;
+                return;
+            }
         }
 
-        window.relationshipsData = {
-            users: usersList,
-            viewType: viewType,
-            currentUsername: currentUsername,
-            targetUsername: targetUsername
-        };
+        state.users.push(...data.users);
 
-        displayRelationships(usersList, viewType, currentUsername, targetUsername);
+        const canRemove = (state.targetUsername === state.currentUsername);
+        data.users
+            .filter(user => user.username.toLowerCase().includes(state.query))
+            .forEach(user => {
+                listContainer.appendChild(createUserElement(user, state.viewType, canRemove));
+            });
 
-        if (viewType === 'followers') {
-            setupFollowersSearch();
+        if (state.nextCursor && !state.observer) {
+            state.observer = setupInfiniteScroll(listContainer, loadMoreRelationships);
+        } else if (!state.nextCursor && state.observer) {
+            state.observer.disconnect();
+            state.observer = null;
         }
 
     } catch (error) {
         console.error('Error loading relationships:', error);
         listContainer.innerHTML = '<p style="padding: 20px; text-align: center; color: red;">Network error loading list.</p>';
+    } finally {
+        state.loading = false;
     }
 }
 
@@ -1116,7 +1832,8 @@ function displayRelationships(usersList, viewType, currentUsername, targetUserna
 }
 
 /**
- * Setup search functionality for followers page
+ * Setup search functionality for followers page.
+ * Filters the pages loaded so far; pages loaded later are filtered as they arrive.
  */
 function setupFollowersSearch() {
     const searchInput = document.getElementById('followers-search-input');
@@ -1129,6 +1846,7 @@ function setupFollowersSearch() {
         
         if (!window.relationshipsData) return;
         
+        window.relationshipsData.query = query;
         const { users, viewType, currentUsername, targetUsername } = window.relationshipsData;
         
         const filteredUsers = users.filter(user => 
@@ -1297,7 +2015,10 @@ function createNotificationElement(notificationData) {
             
         case 'new_post': 
             iconHTML = '<i class="fa-solid fa-feather-alt fa-lg" style="color: var(--color-secondary);"></i>';
-            messageTextHTML = `${actorLinkHTML} published a new chirp.`;
+            // Several posts in a row are coalesced into one notification on the server
+            messageTextHTML = notificationData.group_count > 1
+                ? `${notificationData.group_count} new chirps from people you follow, latest by ${actorLinkHTML}.`
+                : `${actorLinkHTML} published a new chirp.`;
             break;
 
         default:
@@ -1323,15 +2044,117 @@ function createNotificationElement(notificationData) {
 }
 
 
+// Paging state for the notifications page
+let notificationsState = null;
+
+/**
+ * Shows the unread count on the sidebar's Notifications link.
+ */
+function renderNotificationBadge(count) {
+    const badge = document.getElementById('notification-badge');
+    if (!badge) return;
+    
+    badge.textContent = count > 99 ? '99+' : count;
+    badge.hidden = !count;
+}
+
+function renderMessageBadge(count) {
+    const badge = document.getElementById('message-badge');
+    if (!badge) return;
+    
+    badge.textContent = count > 99 ? '99+' : count;
+    badge.hidden = !count;
+}
+
+/**
+ * Refreshes the sidebar badge. This is a single counter read on the server, so every page polls it.
+ */
+async function refreshNotificationBadge() {
+    try {
+        const response = await fetch('/api/notifications/unread_count');
+        const data = await response.json();
+        
+        if (data.success) {
+            renderNotificationBadge(data.unreadCount);
+        }
+    } catch (error) {
+        console.error('Error loading unread notification count:', error);
+    }
+}
+
+// The /api/events stream while it is delivering counts; polling is skipped meanwhile
+let badgeStream = null;
+
+/**
+ * Follows the badge counts over server-sent events when the page says the server
+ * offers them (ASGI mode, see asgi.py). Falls back to polling if the stream fails.
+ */
+function openBadgeStream() {
+    const meta = document.querySelector('meta[name="event-stream"]');
+    if (!meta || !window.EventSource) return;
+    
+    const stream = new EventSource(meta.content);
+    stream.addEventListener('counts', (event) => {
+        const counts = JSON.parse(event.data);
+        badgeStream = stream;
+        renderNotificationBadge(counts.unreadNotifications);
+        renderMessageBadge(counts.unreadMessages);
+    });
+    stream.onerror = () => {
+        // EventSource reconnects by itself unless the stream is closed for good
+        if (stream.readyState === EventSource.CLOSED && badgeStream === stream) {
+            badgeStream = null;
+        }
+    };
+}
+
+function setupNotificationBadge() {
+    if (!document.getElementById('notification-badge')) return;
+    
+    // On the timeline the first count comes with /api/bootstrap
+    if (!document.getElementById(TIMELINE_ID)) {
+        refreshNotificationBadge();
+    }
+    openBadgeStream();
+    setInterval(() => {
+        if (document.visibilityState === 'visible' && !badgeStream) refreshNotificationBadge();
+    }, 60000);
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'visible' && !badgeStream) refreshNotificationBadge();
+    });
+}
+
 /**
- * Fetches and renders the current user's notifications.
- * This also triggers the backend to mark them as read.
+ * Marks everything up to the newest shown notification as read.
+ * Notifications that arrive after the page was fetched stay unread.
+ */
+async function markNotificationsRead(highWaterMark) {
+    try {
+        const response = await fetch('/api/notifications/read', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ until: highWaterMark })
+        });
+        const data = await response.json();
+        
+        if (data.success) {
+            renderNotificationBadge(data.unreadCount);
+        }
+    } catch (error) {
+        console.error('Error marking notifications as read:', error);
+    }
+}
+
+/**
+ * Fetches and renders the first page of the current user's notifications,
+ * then marks them as read.
  */
 async function loadNotifications() {
     const container = document.getElementById('notifications-list-container');
     if (!container) return;
     
     container.innerHTML = '<p class="loading-message">Loading your notifications...</p>';
+    notificationsState = { nextCursor: null, loading: false, observer: null };
 
     try {
         const response = await fetch('/api/notifications');
@@ -1339,12 +2162,8 @@ async function loadNotifications() {
         
         if (data.success && data.notifications.length > 0) {
             container.innerHTML = ''; 
-            
-            data.notifications.forEach(notifData => {
-                const notifElement = createNotificationElement(notifData);
-                container.appendChild(notifElement);
-            });
-            
+            appendNotifications(data);
+            markNotificationsRead(data.high_water_mark);
         } else {
             container.innerHTML = '<p class="empty-message">You have no new notifications.</p>';
         }
@@ -1354,9 +2173,54 @@ async function loadNotifications() {
     }
 }
 
+/**
+ * Renders one page of notifications and arms infinite scroll for the next one.
+ */
+function appendNotifications(data) {
+    const container = document.getElementById('notifications-list-container');
+    const state = notificationsState;
+    if (!container || !state) return;
+    
+    data.notifications.forEach(notifData => {
+        container.appendChild(createNotificationElement(notifData));
+    });
+    
+    state.nextCursor = data.next_cursor;
+    if (state.nextCursor && !state.observer) {
+        state.observer = setupInfiniteScroll(container, loadMoreNotifications);
+    } else if (!state.nextCursor && state.observer) {
+        state.observer.disconnect();
+        state.observer = null;
+    }
+}
+
+async function loadMoreNotifications() {
+    const state = notificationsState;
+    if (!state || state.loading || !state.nextCursor) return;
+    
+    state.loading = true;
+    try {
+        const response = await fetch(`/api/notifications?before=${encodeURIComponent(state.nextCursor)}`);
+        const data = await response.json();
+        
+        if (data.success) {
+            appendNotifications(data);
+        }
+    } catch (error) {
+        console.error('Error loading more notifications:', error);
+    } finally {
+        state.loading = false;
+    }
+}
+
 document.addEventListener('DOMContentLoaded', () => {
     setupCommentModal();
     setupChirpModal();
+    setupNotificationBadge();
+    
+    ['chirp-content', 'chirp-modal-input', 'comment-input'].forEach(id => {
+        setupMentionAutocomplete(document.getElementById(id));
+    });
     
     const notificationsContainer = document.getElementById('notifications-list-container');
     if (notificationsContainer) {
@@ -1488,6 +2352,7 @@ async function loadMessageHistory(partnerUsername) {
                 const msgElement = createMessageElement(msg);
                 messagesContainer.appendChild(msgElement);
             });
+            renderOlderMessagesButton(messagesContainer, partnerUsername, data.next_cursor);
             messagesContainer.scrollTop = messagesContainer.scrollHeight;
             
             if (sendForm) {
@@ -1502,6 +2367,39 @@ async function loadMessageHistory(partnerUsername) {
     }
 }
 
+/**
+ * Puts a "Load older messages" button above the history while the server reports older
+ * (archived) messages; each click prepends one more page and keeps the scroll position.
+ */
+function renderOlderMessagesButton(messagesContainer, partnerUsername, nextCursor) {
+    messagesContainer.querySelector(':scope > .load-older-messages')?.remove();
+    if (!nextCursor) return;
+
+    const button = document.createElement('button');
+    button.className = 'load-more-comments load-older-messages';
+    button.textContent = 'Load older messages';
+    button.onclick = async () => {
+        button.disabled = true;
+        try {
+            const response = await fetch(`/api/messages/${partnerUsername}?before=${encodeURIComponent(nextCursor)}`);
+            const data = await response.json();
+            if (!data.success) {
+                button.disabled = false;
+                return;
+            }
+
+            const previousHeight = messagesContainer.scrollHeight;
+            button.after(...data.messages.map(createMessageElement));
+            renderOlderMessagesButton(messagesContainer, partnerUsername, data.next_cursor);
+            messagesContainer.scrollTop += messagesContainer.scrollHeight - previousHeight;
+        } catch (error) {
+            console.error('Error loading older messages:', error);
+            button.disabled = false;
+        }
+    };
+    messagesContainer.prepend(button);
+}
+
 /**
  * Creates the HTML for a single message bubble.
  */
@@ -1552,7 +2450,8 @@ async function handleSendMessage(e, partnerUsername) {
 }
 
 /**
- * Handles the input event on the search box to find any user in the DB.
+ * Handles the input event on the search box to find any user to message.
+ * Completions come from the typeahead index; the fetch is debounced by the caller.
  */
 async function handleUserSearch(event) {
     const query = event.target.value.trim();
@@ -1576,12 +2475,12 @@ async function handleUserSearch(event) {
     resultsContainer.innerHTML = '<p class="loading-message">Searching...</p>';
 
     try {
-        const response = await fetch(`/api/users/search?q=${query}`);
-        const data = await response.json();
+        const users = await fetchTypeahead(query);
+        if (event.target.value.trim() !== query) return;
 
         resultsContainer.innerHTML = '';
-        if (data.success && data.users.length > 0) {
-            data.users.forEach(user => {
+        if (users.length > 0) {
+            users.forEach(user => {
                 const userElement = createSearchResultItem(user);
                 resultsContainer.appendChild(userElement);
             });
@@ -1663,7 +2562,7 @@ document.addEventListener('DOMContentLoaded', () => {
     
     if (searchForm && searchInput) {
         searchForm.onsubmit = (e) => e.preventDefault(); 
-        searchInput.addEventListener('input', handleUserSearch);
+        searchInput.addEventListener('input', debounce(handleUserSearch, TYPEAHEAD_DEBOUNCE_MS));
         
         searchInput.addEventListener('focus', () => {
              document.getElementById('search-results-list').style.display = 'block';
@@ -0,0 +1,114 @@
+from sqlalchemy import func
+from models import db, User, Post, Reaction, Follow, Comment, Notification, UserStats
+from reactions import has_reaction
+from archive import archive_store
+
+STAT_FIELDS = (
+    'follower_count',
+    'following_count',
+    'post_count',
+    'likes_received',
+    'retweets_received',
+    'comments_received',
+    'unread_notifications',
+)
+
+def compute_user_stats(user_ids):
+    """
+    Recomputes the stats for the given users from the source tables.
+    Uses one grouped query per counter, regardless of how many users are passed.
+    Returns {user_id: {field: value}}.
+    """
+    stats = {user_id: dict.fromkeys(STAT_FIELDS, 0) for user_id in user_ids}
+    if not stats:
+        return stats
+
+    def collect(field, rows):
+        for user_id, count in rows:
+            stats[user_id][field] = count
+
+    collect('follower_count', db.session.query(Follow.followed_id, func.count(Follow.id))
+            .filter(Follow.followed_id.in_(user_ids))
+            .group_by(Follow.followed_id))
+
+    collect('following_count', db.session.query(Follow.follower_id, func.count(Follow.id))
+            .filter(Follow.follower_id.in_(user_ids))
+            .group_by(Follow.follower_id))
+
+    collect('post_count', db.session.query(Post.user_id, func.count(Post.id))
+            .filter(Post.user_id.in_(user_ids))
+            .group_by(Post.user_id))
+
+    for field, reaction_type in (('likes_received', 'LIKE'), ('retweets_received', 'RETWEET')):
+        collect(field, db.session.query(Post.user_id, func.count())
+                .join(Reaction, Reaction.post_id == Post.id)
+                .filter(Post.user_id.in_(user_ids), has_reaction(reaction_type))
+                .group_by(Post.user_id))
+
+    collect('comments_received', db.session.query(Post.user_id, func.count(Comment.id))
+            .join(Comment, Comment.post_id == Post.id)
+            .filter(Post.user_id.in_(user_ids))
+            .group_by(Post.user_id))
+
+    collect('unread_notifications', db.session.query(Notification.user_id, func.count(Notification.id))
+            .filter(Notification.user_id.in_(user_ids), Notification.is_read.is_(False))
+            .group_by(Notification.user_id))
+
+    # Archived posts still count towards their authors' totals
+    for user_id, archived in archive_store.user_stats(user_ids).items():
+        for field, count in archived.items():
+            stats[user_id][field] += count
+
+    return stats
+
+def get_user_stats(user_id):
+    """
+    Returns the UserStats row for a user, backfilling it from the source tables
+    the first time it is read (e.g. for accounts created before stats existed).
+    """
+    stats = db.session.get(UserStats, user_id)
+    if stats is None:
+        stats = UserStats(user_id=user_id, **compute_user_stats([user_id])[user_id])
+        db.session.add(stats)
+        db.session.commit()
+    elif stats.unread_notifications is None:
+        stats.unread_notifications = compute_user_stats([user_id])[user_id]['unread_notifications']
+        db.session.commit()
+    return stats
+
+def bump_user_stats(user_id, **deltas):
+    """
+    Applies counter deltas (e.g. post_count=1) to a user's stats in the current transaction.
+    Call it after the change it accounts for has been added to the session; the caller commits.
+    """
+    updated = UserStats.query.filter_by(user_id=user_id).update(
+        {getattr(UserStats, field): getattr(UserStats, field) + delta for field, delta in deltas.items()},
+        synchronize_session=False
+    )
+
+    if not updated:
+        # No row yet: build it from scratch, which already includes the pending change
+        db.session.flush()
+        db.session.add(UserStats(user_id=user_id, **compute_user_stats([user_id])[user_id]))
+
+def repair_user_stats(batch_size=500):
+    """Recomputes the stats row of every user, batch_size users at a time. Returns the number of users repaired."""
+    repaired = 0
+    last_id = 0
+
+    while True:
+        user_ids = [user_id for (user_id,) in db.session.query(User.id)
+                    .filter(User.id > last_id)
+                    .order_by(User.id)
+                    .limit(batch_size)]
+        if not user_ids:
+            break
+
+        for user_id, values in compute_user_stats(user_ids).items():
+            db.session.merge(UserStats(user_id=user_id, **values))
+        db.session.commit()
+
+        repaired += len(user_ids)
+        last_id = user_ids[-1]
+
+    return repaired
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, delete, func, or_, and_
+from models import db, ChangeLog
+
+# A client further behind than this many entries reloads its timeline instead
+MAX_SYNC_CHANGES = 1000
+
+def log_change(kind, post_id=None, author_id=None, user_id=None):
+    """Appends one change_log entry in the current transaction."""
+    db.session.add(ChangeLog(kind=kind, post_id=post_id, author_id=author_id, user_id=user_id))
+
+def log_reaction_changes(user_id, post_authors):
+    """
+    Appends a 'reaction' entry per post whose reactions user_id changed, in one statement.
+    post_authors is {post_id: author_id} for those posts.
+    """
+    if not post_authors:
+        return
+
+    now = datetime.utcnow()
+    db.session.execute(insert(ChangeLog), [
+        {'kind': 'reaction', 'post_id': post_id, 'author_id': author_id, 'user_id': user_id, 'timestamp': now}
+        for post_id, author_id in sorted(post_authors.items())
+    ])
+
+def current_sync_token():
+    """The token a client holding everything committed so far should send next."""
+    return db.session.query(func.max(ChangeLog.id)).scalar() or 0
+
+def read_changes(user_id, since, timeline_author_ids):
+    """
+    Collects the changes after token `since` that matter to user_id's cached timeline.
+
+    Only the entries about posts by timeline_author_ids (the posts a cached timeline
+    can hold) and the user's own follow changes are read, so activity elsewhere on the
+    site doesn't count against the cap. Returns None when the client has to reload
+    instead: the token is unknown or older than the compacted log, more than
+    MAX_SYNC_CHANGES of those entries are pending, or the user's follows changed
+    (which adds or removes whole authors). Otherwise returns
+    {'token', 'created': [post ids by timeline_author_ids], 'deleted', 'changed', 'reacted'},
+    the last three being sets of post ids: deleted posts, posts whose counts changed
+    and posts whose reaction state for user_id changed.
+    """
+    oldest, newest = db.session.query(func.min(ChangeLog.id), func.max(ChangeLog.id)).one()
+    if since < 0 or since > (newest or 0) or (oldest is not None and since < oldest - 1):
+        return None
+
+    entries = db.session.query(ChangeLog.id, ChangeLog.kind, ChangeLog.post_id,
+                               ChangeLog.author_id, ChangeLog.user_id)\
+        .filter(
+            ChangeLog.id > since,
+            ChangeLog.id <= (newest or 0),
+            or_(
+                ChangeLog.author_id.in_(timeline_author_ids),
+                and_(ChangeLog.kind == 'follows', ChangeLog.user_id == user_id),
+                # Older entries that don't say whose post they are about
+                and_(ChangeLog.author_id.is_(None), ChangeLog.kind.in_(('counts', 'reaction')))
+            )
+        )\
+        .order_by(ChangeLog.id)\
+        .limit(MAX_SYNC_CHANGES + 1)\
+        .all()
+
+    if len(entries) > MAX_SYNC_CHANGES:
+        return None
+
+    created, deleted, changed, reacted = [], set(), set(), set()
+    for _, kind, post_id, author_id, entry_user_id in entries:
+        if kind == 'follows':
+            if entry_user_id == user_id:
+                return None
+        elif kind == 'created':
+            if author_id in timeline_author_ids:
+                created.append(post_id)
+        elif kind == 'deleted':
+            deleted.add(post_id)
+        else:
+            changed.add(post_id)
+            if kind == 'reaction' and entry_user_id == user_id:
+                reacted.add(post_id)
+
+    return {
+        # Every entry up to newest that matters here has been read
+        'token': newest or since,
+        'created': [post_id for post_id in created if post_id not in deleted],
+        'deleted': deleted,
+        'changed': changed - deleted,
+        'reacted': reacted - deleted,
+    }
+
+def compact_change_log(older_than_days, batch_size=1000):
+    """
+    Deletes change_log entries older than older_than_days, batch_size rows per
+    transaction. The newest entry is always kept so the current token stays known.
+    Clients holding a token from before the cut reload their timeline.
+    Returns the number deleted.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    newest = current_sync_token()
+    deleted = 0
+
+    while True:
+        batch = select(ChangeLog.id)\
+            .where(ChangeLog.timestamp < cutoff, ChangeLog.id < newest)\
+            .order_by(ChangeLog.id)\
+            .limit(batch_size)
+
+        result = db.session.execute(
+            delete(ChangeLog).where(ChangeLog.id.in_(batch))
+        )
+        db.session.commit()
+
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            break
+
+    return deleted
@@ -0,0 +1,355 @@
+import atexit
+import hashlib
+import heapq
+import json
+import os
+import threading
+import time
+import uuid
+import zlib
+from collections import deque
+from datetime import datetime, timedelta
+from models import db, PostHashtag, TrendingSnapshot
+
+class CountMinSketch:
+    """
+    Fixed-size approximate counter: estimates never undercount, and overcount by at most
+    ~e/width of the total with probability 1 - e^-depth. Sketches of the same shape can
+    be added and subtracted cell by cell, which is what the sliding windows rely on.
+    """
+
+    def __init__(self, width=1024, depth=4, cells=None):
+        self.width = width
+        self.depth = depth
+        self.cells = cells if cells is not None else [0] * (width * depth)
+
+    def _positions(self, key):
+        # Double hashing from one stable digest, so snapshots stay valid across processes
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [row * self.width + (h1 + row * h2) % self.width for row in range(self.depth)]
+
+    def add(self, key, count=1):
+        for position in self._positions(key):
+            self.cells[position] += count
+
+    def estimate(self, key):
+        return min(self.cells[position] for position in self._positions(key))
+
+    def merge(self, other, sign=1):
+        cells = self.cells
+        for position, value in enumerate(other.cells):
+            if value:
+                cells[position] += sign * value
+
+class SlidingWindowTrends:
+    """
+    Approximate top tags over the last window_seconds.
+
+    The window is a ring of buckets bucket_seconds wide, each with its own Count-Min
+    Sketch. A running total sketch holds the sum of the live buckets: adds go to both,
+    and a bucket that ages out is subtracted from the total. Tags whose estimate is
+    among the highest are kept as candidates (at most `capacity`) and the ranked
+    top list is rebuilt whenever counts change, so reads just return it.
+    """
+
+    def __init__(self, window_seconds, bucket_seconds, width=1024, depth=4, capacity=100):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.width = width
+        self.depth = depth
+        self.capacity = capacity
+
+        self.buckets = deque()      # (bucket_start, CountMinSketch), oldest first
+        self.total = CountMinSketch(width, depth)
+        self.candidates = {}        # tag -> estimated count in the window
+        self.ranked = []            # [(tag, count)], highest first
+
+    def _bucket_start(self, timestamp):
+        return int(timestamp // self.bucket_seconds) * self.bucket_seconds
+
+    def advance(self, now):
+        """Drops buckets that have fallen out of the window ending at `now`."""
+        expired = False
+        while self.buckets and self.buckets[0][0] + self.bucket_seconds <= now - self.window_seconds:
+            _, sketch = self.buckets.popleft()
+            self.total.merge(sketch, sign=-1)
+            expired = True
+
+        if expired:
+            self.candidates = {tag: self.total.estimate(tag) for tag in self.candidates}
+            self.candidates = {tag: count for tag, count in self.candidates.items() if count > 0}
+            self._rank()
+
+    def add(self, tag, timestamp, count=1):
+        """Counts `count` uses of tag at `timestamp` (seconds since the epoch)."""
+        if timestamp <= time.time() - self.window_seconds:
+            return
+
+        start = self._bucket_start(timestamp)
+        sketch = None
+        for bucket_start, bucket in reversed(self.buckets):
+            if bucket_start == start:
+                sketch = bucket
+                break
+            if bucket_start < start:
+                break
+
+        if sketch is None:
+            sketch = CountMinSketch(self.width, self.depth)
+            self.buckets.append((start, sketch))
+            if len(self.buckets) > 1 and self.buckets[-2][0] > start:
+                # Out-of-order event (e.g. during replay): keep the ring sorted by start
+                self.buckets = deque(sorted(self.buckets, key=lambda bucket: bucket[0]))
+
+        sketch.add(tag, count)
+        self.total.add(tag, count)
+
+        self.candidates[tag] = self.total.estimate(tag)
+        if len(self.candidates) > self.capacity:
+            weakest = min(self.candidates, key=self.candidates.get)
+            del self.candidates[weakest]
+        self._rank()
+
+    def _rank(self):
+        self.ranked = heapq.nlargest(self.capacity, self.candidates.items(), key=lambda item: item[1])
+
+    def top(self, limit):
+        return self.ranked[:limit]
+
+    def to_payload(self):
+        """Serializes the window for a snapshot."""
+        return zlib.compress(json.dumps({
+            'buckets': [[start, sketch.cells] for start, sketch in self.buckets],
+            'candidates': list(self.candidates),
+        }).encode('utf-8'))
+
+    def merge(self, other):
+        """Adds the counts of another window of the same shape into this one."""
+        buckets = dict(self.buckets)
+        for start, sketch in other.buckets:
+            if start in buckets:
+                buckets[start].merge(sketch)
+            else:
+                buckets[start] = CountMinSketch(self.width, self.depth, list(sketch.cells))
+            self.total.merge(sketch)
+        self.buckets = deque(sorted(buckets.items(), key=lambda bucket: bucket[0]))
+
+        tags = set(self.candidates) | set(other.candidates)
+        self.candidates = dict(heapq.nlargest(
+            self.capacity, ((tag, self.total.estimate(tag)) for tag in tags), key=lambda item: item[1]
+        ))
+        self._rank()
+
+    def load_payload(self, payload):
+        """Restores a window from to_payload() output, replacing the current state."""
+        data = json.loads(zlib.decompress(payload).decode('utf-8'))
+
+        self.buckets = deque()
+        self.total = CountMinSketch(self.width, self.depth)
+        for start, cells in data['buckets']:
+            sketch = CountMinSketch(self.width, self.depth, cells)
+            self.buckets.append((start, sketch))
+            self.total.merge(sketch)
+
+        self.candidates = {tag: self.total.estimate(tag) for tag in data['candidates']}
+        self._rank()
+
+# Trending windows: name -> (window seconds, bucket seconds)
+WINDOWS = {'1h': (3600, 300), '24h': (86400, 3600)}
+
+class TrendingEngine:
+    """
+    Trending hashtags over 1h and 24h sliding windows, shared by the worker processes.
+
+    create_post feeds it the tags of each new post. Each worker keeps the counts it
+    recorded itself apart (`own`), and saves only those, as its own rows of the
+    trending_worker_snapshot table, every snapshot_interval seconds from a background
+    thread and at exit. Its windows are then rebuilt from every other worker's rows
+    plus its own counts, so each worker's view catches up with the others' posts
+    within a snapshot interval, and a restart keeps the windows without counting
+    anything twice. Rows of workers that have exited are deleted once they have aged
+    out of the longest window. `flask replay-trending` rebuilds the windows from
+    post_hashtag and replaces every worker's rows with the result.
+    """
+
+    def __init__(self, snapshot_interval=300.0, width=1024, depth=4, capacity=100):
+        self.snapshot_interval = snapshot_interval
+        self.width = width
+        self.depth = depth
+        self.capacity = capacity
+
+        self.lock = threading.Lock()
+        self.windows = self._new_windows()     # Every worker's counts: what top() reads
+        self.own = self._new_windows()         # The counts this worker recorded itself
+
+        self._app = None
+        self._loaded = False
+        self._snapshotter_pid = None
+        self._worker = (None, None)
+
+    def _new_window(self, name):
+        window_seconds, bucket_seconds = WINDOWS[name]
+        return SlidingWindowTrends(window_seconds, bucket_seconds, self.width, self.depth, self.capacity)
+
+    def _new_windows(self):
+        return {name: self._new_window(name) for name in WINDOWS}
+
+    def _worker_id(self):
+        # Random rather than the pid, which a later worker may be given again
+        if self._worker[0] != os.getpid():
+            self._worker = (os.getpid(), uuid.uuid4().hex)
+        return self._worker[1]
+
+    def init_app(self, app):
+        """Reads TRENDING_* settings from the app config."""
+        self._app = app
+        self.snapshot_interval = app.config.get('TRENDING_SNAPSHOT_INTERVAL', self.snapshot_interval)
+
+    def _ensure_loaded(self):
+        # Restored lazily, inside the first request's app context
+        if self._loaded:
+            return
+
+        with self.lock:
+            if self._loaded:
+                return
+            self._loaded = True
+
+        # Posts recorded meanwhile are kept in self.own, which the refresh merges back in
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Error restoring trending snapshot: {e}")
+
+        self._ensure_snapshotter()
+
+    def record(self, tags, timestamp):
+        """Counts one post's hashtags. timestamp is the post's naive UTC datetime."""
+        if not tags:
+            return
+
+        self._ensure_loaded()
+        seconds = _epoch_seconds(timestamp)
+        with self.lock:
+            for window in (*self.windows.values(), *self.own.values()):
+                window.advance(time.time())
+                for tag in tags:
+                    window.add(tag, seconds)
+
+    def top(self, window_name, limit=10):
+        """Returns [(tag, estimated count)] for '1h' or '24h', highest first."""
+        self._ensure_loaded()
+        with self.lock:
+            window = self.windows[window_name]
+            window.advance(time.time())
+            return window.top(limit)
+
+    def snapshot(self):
+        """Saves this worker's own counts to trending_worker_snapshot. Must run inside an app context."""
+        with self.lock:
+            for window in self.own.values():
+                window.advance(time.time())
+            payloads = {name: window.to_payload() for name, window in self.own.items()}
+
+        now = datetime.utcnow()
+        worker = self._worker_id()
+        for name, payload in payloads.items():
+            db.session.merge(TrendingSnapshot(window=name, worker=worker, payload=payload, saved_at=now))
+
+        # Rows no worker has saved for longer than the longest window hold nothing that still counts
+        longest = max(window_seconds for window_seconds, _ in WINDOWS.values())
+        TrendingSnapshot.query.filter(TrendingSnapshot.saved_at < now - timedelta(seconds=longest))\
+            .delete(synchronize_session=False)
+        db.session.commit()
+
+    def refresh(self):
+        """
+        Rebuilds the windows from the other workers' latest snapshots plus this worker's
+        own counts. Must run inside an app context.
+        """
+        merged = self._new_windows()
+        snapshots = TrendingSnapshot.query.filter(
+            TrendingSnapshot.window.in_(WINDOWS), TrendingSnapshot.worker != self._worker_id()
+        )
+        for snapshot in snapshots:
+            window = self._new_window(snapshot.window)
+            window.load_payload(snapshot.payload)
+            merged[snapshot.window].merge(window)
+
+        with self.lock:
+            for name, window in merged.items():
+                window.merge(self.own[name])
+                window.advance(time.time())
+            self.windows = merged
+
+    def replay(self, since):
+        """
+        Rebuilds both windows from post_hashtag rows newer than `since` and saves the
+        result in place of every worker's snapshot. Workers that keep running save their
+        own counts again, so posts they counted before the replay are counted twice
+        until those age out. Must run inside an app context. Returns the number of tags replayed.
+        """
+        self._loaded = True
+        replayed = 0
+        rows = db.session.query(PostHashtag.tag, PostHashtag.timestamp)\
+            .filter(PostHashtag.timestamp >= since)\
+            .order_by(PostHashtag.timestamp)\
+            .yield_per(1000)
+
+        windows = self._new_windows()
+        for tag, timestamp in rows:
+            seconds = _epoch_seconds(timestamp)
+            for window in windows.values():
+                window.add(tag, seconds)
+            replayed += 1
+
+        with self.lock:
+            self.own = windows
+            self.windows = self._new_windows()
+            for name, window in windows.items():
+                window.advance(time.time())
+                self.windows[name].merge(window)
+
+        TrendingSnapshot.query.delete(synchronize_session=False)
+        self.snapshot()
+        return replayed
+
+    def _ensure_snapshotter(self):
+        # Started lazily so each forked worker gets its own thread
+        if self._snapshotter_pid == os.getpid() or self._app is None:
+            return
+
+        self._snapshotter_pid = os.getpid()
+        threading.Thread(target=self._run_snapshotter, name='trending-snapshotter', daemon=True).start()
+        atexit.register(self._snapshot_at_exit)
+
+    def _run_snapshotter(self):
+        while True:
+            time.sleep(self.snapshot_interval)
+            with self._app.app_context():
+                try:
+                    self.snapshot()
+                    self.refresh()
+                except Exception as e:
+                    print(f"Error saving trending snapshot: {e}")
+                finally:
+                    db.session.remove()
+
+    def _snapshot_at_exit(self):
+        with self._app.app_context():
+            try:
+                self.snapshot()
+            except Exception as e:
+                print(f"Error saving trending snapshot at exit: {e}")
+
+def _epoch_seconds(timestamp):
+    """Converts a naive UTC datetime (as stored by the models) to seconds since the epoch."""
+    return (timestamp - datetime(1970, 1, 1)).total_seconds()
+
+trending_engine = TrendingEngine()
+
+def replay_trending(hours=24):
+    """Rebuilds the trending windows from the last `hours` of post_hashtag rows."""
+    return trending_engine.replay(datetime.utcnow() - timedelta(hours=hours))
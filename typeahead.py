@@ -0,0 +1,163 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from sqlalchemy import func
+from models import db, User, Follow
+
+# Prefixes this short match so many names that their completions are cached
+CACHED_PREFIX_LENGTH = 2
+
+MAX_COMPLETIONS = 20
+
+class UsernameTypeahead:
+    """
+    Per-process username completion index.
+
+    Usernames are kept lowercased in one sorted list, so the names starting with a
+    prefix are a contiguous slice found with two bisects. Completions are the
+    `limit` heaviest names in the slice, weighted by follower count. Results for
+    one- and two-character prefixes (the widest slices) are cached until a name
+    under them changes.
+
+    The index is loaded from the database on first use and then kept current by
+    signup, follow and profile-image changes in this process. Every refresh_interval
+    seconds it is reloaded in the background to pick up changes made by other workers.
+    """
+
+    def __init__(self, refresh_interval=300.0):
+        self.refresh_interval = refresh_interval
+
+        self.lock = threading.Lock()
+        self.keys = []              # sorted [(lowercased username, user_id)]
+        self.users = {}             # user_id -> [username, profile_image, follower count]
+        self.prefix_cache = {}      # short prefix -> [user_id], heaviest first
+
+        self._app = None
+        self._loaded_at = None
+        self._refreshing = False
+
+    def init_app(self, app):
+        """Reads TYPEAHEAD_* settings from the app config."""
+        self._app = app
+        self.refresh_interval = app.config.get('TYPEAHEAD_REFRESH_INTERVAL', self.refresh_interval)
+
+    def load(self):
+        """(Re)builds the index from the user table. Must run inside an app context."""
+        follower_counts = db.session.query(Follow.followed_id, func.count(Follow.id).label('followers'))\
+            .group_by(Follow.followed_id)\
+            .subquery()
+
+        rows = db.session.query(User.id, User.username, User.profile_image, follower_counts.c.followers)\
+            .outerjoin(follower_counts, follower_counts.c.followed_id == User.id)\
+            .filter(User.deleted_at.is_(None))
+
+        users = {}
+        keys = []
+        for user_id, username, profile_image, followers in rows:
+            users[user_id] = [username, profile_image, followers or 0]
+            keys.append((username.lower(), user_id))
+        keys.sort()
+
+        with self.lock:
+            self.keys = keys
+            self.users = users
+            self.prefix_cache = {}
+            self._loaded_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        if self._loaded_at is None:
+            self.load()
+        elif time.monotonic() - self._loaded_at > self.refresh_interval and not self._refreshing and self._app:
+            self._refreshing = True
+            threading.Thread(target=self._refresh, name='typeahead-refresh', daemon=True).start()
+
+    def _refresh(self):
+        with self._app.app_context():
+            try:
+                self.load()
+            except Exception as e:
+                print(f"Error refreshing typeahead index: {e}")
+            finally:
+                self._refreshing = False
+                db.session.remove()
+
+    def _invalidate(self, username):
+        lowered = username.lower()
+        for length in range(1, CACHED_PREFIX_LENGTH + 1):
+            self.prefix_cache.pop(lowered[:length], None)
+
+    def add_user(self, user_id, username, profile_image=None, followers=0):
+        """Adds a newly created user."""
+        if self._loaded_at is None:
+            return  # Not loaded yet; the first load will include them
+
+        with self.lock:
+            if user_id in self.users:
+                return
+            self.users[user_id] = [username, profile_image, followers]
+            insort(self.keys, (username.lower(), user_id))
+            self._invalidate(username)
+
+    def remove_user(self, user_id):
+        """Drops a deleted account."""
+        with self.lock:
+            entry = self.users.pop(user_id, None)
+            if entry is None:
+                return
+            self.keys.remove((entry[0].lower(), user_id))
+            self._invalidate(entry[0])
+
+    def update_user(self, user_id, profile_image=None, follower_delta=0):
+        """Records a profile image change and/or a follower count change for a user."""
+        with self.lock:
+            entry = self.users.get(user_id)
+            if entry is None:
+                return
+            if profile_image is not None:
+                entry[1] = profile_image
+            if follower_delta:
+                entry[2] = max(0, entry[2] + follower_delta)
+                self._invalidate(entry[0])
+
+    def complete(self, prefix, limit=8, exclude_user_id=None):
+        """
+        Returns up to `limit` (at most MAX_COMPLETIONS) users whose username starts with
+        prefix (case-insensitive), most followed first, as [{'id', 'username', 'profile_image'}].
+        """
+        limit = min(limit, MAX_COMPLETIONS)
+        prefix = prefix.lower()
+        if not prefix:
+            return []
+
+        self._ensure_fresh()
+
+        with self.lock:
+            user_ids = self.prefix_cache.get(prefix) if len(prefix) <= CACHED_PREFIX_LENGTH else None
+
+            if user_ids is None:
+                start = bisect_left(self.keys, (prefix,))
+                end = bisect_left(self.keys, (prefix[:-1] + chr(ord(prefix[-1]) + 1),))
+                # One spare result, so excluding the searcher still fills the list
+                user_ids = [
+                    user_id for _, user_id in heapq.nlargest(
+                        MAX_COMPLETIONS + 1, self.keys[start:end], key=lambda key: self.users[key[1]][2]
+                    )
+                ]
+                if len(prefix) <= CACHED_PREFIX_LENGTH:
+                    self.prefix_cache[prefix] = user_ids
+
+            results = []
+            for user_id in user_ids:
+                if user_id == exclude_user_id:
+                    continue
+                username, profile_image, _ = self.users[user_id]
+                results.append({
+                    'id': user_id,
+                    'username': username,
+                    'profile_image': profile_image or 'uploads/default-avatar.jpg',
+                })
+
+        return results[:limit]
+
+username_typeahead = UsernameTypeahead()
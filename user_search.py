@@ -0,0 +1,102 @@
+from sqlalchemy import func, case, select, delete, update, bindparam
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, User, UserTrigram
+
+def username_trigrams(username):
+    """
+    Returns the trigrams stored for a username: those of '^name$', lowercased.
+    The padding adds start/end trigrams, so 'ab' still gets '^ab' and 'ab$'.
+    """
+    padded = f"^{username.lower()}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def index_users(users):
+    """Writes the trigram rows for the given users in the current transaction; the caller commits."""
+    rows = [
+        {'trigram': trigram, 'user_id': user.id}
+        for user in users
+        for trigram in username_trigrams(user.username)
+    ]
+    if rows:
+        db.session.execute(sqlite_insert(UserTrigram).on_conflict_do_nothing(), rows)
+
+def backfill_lowered_usernames(batch_size=1000):
+    """
+    Fills in user.lowered_username on rows from before the column existed, batch_size
+    users per transaction. Returns the number filled in.
+    """
+    filled = 0
+
+    while True:
+        rows = db.session.query(User.id, User.username)\
+            .filter(User.lowered_username.is_(None))\
+            .limit(batch_size)\
+            .all()
+        if not rows:
+            break
+
+        users = User.__table__
+        db.session.connection().execute(
+            update(users).where(users.c.id == bindparam('user_id')).values(lowered_username=bindparam('lowered')),
+            [{'user_id': user_id, 'lowered': username.lower()} for user_id, username in rows]
+        )
+        db.session.commit()
+        filled += len(rows)
+
+    return filled
+
+def rebuild_user_search_index(batch_size=1000):
+    """Rebuilds the trigram rows of every user, batch_size users per transaction. Returns the number indexed."""
+    indexed = 0
+    last_id = 0
+
+    while True:
+        users = User.query.filter(User.id > last_id, User.deleted_at.is_(None)).order_by(User.id).limit(batch_size).all()
+        if not users:
+            break
+
+        user_ids = [user.id for user in users]
+        db.session.execute(delete(UserTrigram).where(UserTrigram.user_id.in_(user_ids)))
+        index_users(users)
+        db.session.commit()
+
+        indexed += len(users)
+        last_id = user_ids[-1]
+
+    return indexed
+
+def search_usernames(query, exclude_user_id=None, limit=20):
+    """
+    Finds users whose username contains query (case-insensitive), ranked exact match,
+    then prefix, then substring, shorter names first within each.
+    Queries of three or more characters intersect the posting lists of their trigrams;
+    shorter ones have no trigram and scan lowered_username. Both sides are lowercased
+    by Python, so non-ASCII usernames match regardless of case too.
+    """
+    query = query.lower()
+    name = User.lowered_username
+
+    if len(query) >= 3:
+        trigrams = {query[i:i + 3] for i in range(len(query) - 2)}
+        candidate_ids = select(UserTrigram.user_id)\
+            .where(UserTrigram.trigram.in_(trigrams))\
+            .group_by(UserTrigram.user_id)\
+            .having(func.count() == len(trigrams))
+        # Having every trigram doesn't guarantee they are contiguous, so confirm the substring
+        matches = User.query.filter(User.id.in_(candidate_ids), func.instr(name, query) > 0)
+    else:
+        matches = User.query.filter(func.instr(name, query) > 0)
+
+    # Deleted accounts lose their trigrams at once, but the short-query path reads the user table
+    matches = matches.filter(User.deleted_at.is_(None))
+
+    if exclude_user_id is not None:
+        matches = matches.filter(User.id != exclude_user_id)
+
+    rank = case(
+        (name == query, 0),
+        (func.substr(name, 1, len(query)) == query, 1),
+        else_=2
+    )
+
+    return matches.order_by(rank, func.length(User.username), User.username).limit(limit).all()